@@ -0,0 +1,200 @@
+"""End-to-end conversion benchmark on synthetic Augias databases.
+
+Generates (or reuses) a synthetic database and converts it to CSV with every
+selected extraction mode, using the stage timings of the built-in
+instrumentation. Each run is appended to a JSON Lines results file in the data
+directory and compared to the previous run with the same parameters, e.g.
+
+    python -m benchmarks.bench --scale medium --modes TABLES LITE
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any
+
+from benchmarks.synthetic import flavors, generate
+from modules.convert import convert
+from modules.logger import Logger
+from modules.processors.augias_processor import AugiasProcessor, ExtractionMode
+from modules.writers.compression import Compression
+from modules.writers.write import OutputVariant
+
+scales: dict[str, tuple[int, int, int]] = {
+    "small": (10, 200, 10_000),
+    "medium": (50, 2_000, 500_000),
+    "large": (200, 20_000, 10_000_000),
+}
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+# Slowdowns above this factor compared to the previous run are reported
+regression_factor = 1.1
+
+
+def prepare_database(
+    data_dir: str, flavor: str, parishes: int, registers: int, images: int
+) -> str:
+    """Return the path of the synthetic database, generating it if needed"""
+    os.makedirs(data_dir, exist_ok=True)
+    name = f"augias_{flavor}_{parishes}_{registers}_{images}"
+    database = os.path.join(data_dir, f"{name}.db")
+    if not os.path.exists(database):
+        print(f"Generating {database}")
+        start = time.perf_counter()
+        generate(database, flavor, parishes, registers, images)
+        print(f"Generated in {time.perf_counter() - start:.1f} s")
+    return database
+
+
+def connect(database: str) -> sqlite3.Connection:
+    # The pipeline fetches the streamed queries on its own thread
+    return sqlite3.connect(database, check_same_thread=False)
+
+
+def run_mode(
+    database: str,
+    flavor: str,
+    mode: ExtractionMode,
+    output_dir: str,
+    output_variant: OutputVariant = OutputVariant.CSV,
+    compression: Compression = Compression.NONE,
+    compression_level: int | None = None,
+    pipelined: bool = False,
+) -> dict[str, dict[str, Any]]:
+    processor: AugiasProcessor = flavors[flavor](
+        database, lambda _: None, mode=mode, connection_factory=connect
+    )
+    instrumentation = convert(
+        processor,
+        "bench",
+        output_variant,
+        output_dir,
+        compression=compression,
+        compression_level=compression_level,
+        pipelined=pipelined,
+    )
+    processor.connection.close()
+    stages = instrumentation.report()["stages"]
+    stages["total"] = {
+        "wall_seconds": instrumentation.report()["wall_seconds"],
+        "rows_per_second": None,
+    }
+    return stages
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=benchmark_dir,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_result(results_path: str, key: dict[str, Any]) -> dict[str, Any] | None:
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            if all(result.get(k) == v for k, v in key.items()):
+                previous = result
+    return previous
+
+
+def print_result(result: dict[str, Any], previous: dict[str, Any] | None):
+    print(f"\n{result['flavor']} / {result['mode']}")
+    for stage, values in result["stages"].items():
+        line = f"  {stage:<22} {values['wall_seconds']:>10.3f} s"
+        if values["rows_per_second"]:
+            line += f" {values['rows_per_second']:>12,} rows/s"
+        old = previous["stages"].get(stage) if previous else None
+        if old and old.get("wall_seconds"):
+            factor = values["wall_seconds"] / old["wall_seconds"]
+            line += f"  {factor - 1:+.0%}"
+            if factor > regression_factor:
+                line += "  REGRESSION"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--flavor", choices=list(flavors), default="x")
+    parser.add_argument("--scale", choices=list(scales), default="small")
+    parser.add_argument("--parishes", type=int)
+    parser.add_argument("--registers", type=int)
+    parser.add_argument("--images", type=int)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=[m.name for m in ExtractionMode if m != ExtractionMode.AUTO],
+        default=[m.name for m in ExtractionMode if m != ExtractionMode.AUTO],
+    )
+    parser.add_argument("--data-dir", default=os.path.join(benchmark_dir, "data"))
+    parser.add_argument(
+        "--results", help="Results file, results.jsonl in the data directory if unset"
+    )
+    parser.add_argument(
+        "--log-dir", help="Directory of the log file, the data directory if unset"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Transform the partitions on a thread while the previous ones are written",
+    )
+    args = parser.parse_args()
+    results_path = args.results or os.path.join(args.data_dir, "results.jsonl")
+    Logger().set_log_dir(args.log_dir or args.data_dir)
+
+    parishes, registers, images = scales[args.scale]
+    parishes = args.parishes or parishes
+    registers = args.registers or registers
+    images = args.images or images
+    database = prepare_database(args.data_dir, args.flavor, parishes, registers, images)
+    name = os.path.splitext(os.path.basename(database))[0]
+
+    for mode_name in args.modes:
+        output_dir = os.path.join(args.data_dir, f"{name}_{mode_name.lower()}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+        key = {
+            "flavor": args.flavor,
+            "parishes": parishes,
+            "registers": registers,
+            "images": images,
+            "mode": mode_name,
+            "pipelined": args.pipeline,
+        }
+        stages = run_mode(
+            database,
+            args.flavor,
+            ExtractionMode[mode_name],
+            output_dir,
+            pipelined=args.pipeline,
+        )
+        result = {
+            **key,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "stages": stages,
+        }
+        print_result(result, previous_result(results_path, key))
+        with open(results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Write throughput and file size of the compression levels.
+
+Converts a synthetic Augias database once uncompressed and once per selected
+compression level, and reports the throughput of the write stages, the total
+wall time and the size of the written files relative to the uncompressed
+output (for Parquet the default zstd page compression). The first run is a
+warm-up that is not reported. Runs are appended to the results file like the conversion benchmark,
+e.g.
+
+    python -m benchmarks.compression --scale medium --gzip-levels 1 6 9
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+from datetime import datetime
+from typing import Any
+
+from benchmarks.bench import (
+    benchmark_dir,
+    git_revision,
+    prepare_database,
+    previous_result,
+    run_mode,
+    scales,
+)
+from benchmarks.synthetic import flavors
+from modules.processors.augias_processor import ExtractionMode
+from modules.writers.compression import Compression
+from modules.writers.write import OutputVariant
+
+
+def output_size(output_dir: str) -> int:
+    return sum(
+        entry.stat().st_size
+        for entry in os.scandir(output_dir)
+        if entry.is_file() and not entry.name.startswith(("conversion_", "profile"))
+    )
+
+
+def write_throughput(stages: dict[str, dict[str, Any]]) -> tuple[float, int]:
+    wall_time = 0.0
+    rows = 0
+    for name, values in stages.items():
+        if name.startswith("write "):
+            wall_time += values["wall_seconds"]
+            rows += values["rows"]
+    return wall_time, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--flavor", choices=list(flavors), default="x")
+    parser.add_argument("--scale", choices=list(scales), default="small")
+    parser.add_argument(
+        "--format",
+        choices=[v.name.lower() for v in OutputVariant],
+        default=OutputVariant.CSV.name.lower(),
+    )
+    parser.add_argument("--gzip-levels", nargs="*", type=int, default=[1, 6, 9])
+    parser.add_argument("--zstd-levels", nargs="*", type=int, default=[1, 3, 9, 19])
+    parser.add_argument("--data-dir", default=os.path.join(benchmark_dir, "data"))
+    parser.add_argument(
+        "--results", default=os.path.join(benchmark_dir, "results.jsonl")
+    )
+    args = parser.parse_args()
+
+    parishes, registers, images = scales[args.scale]
+    database = prepare_database(args.data_dir, args.flavor, parishes, registers, images)
+    name = os.path.splitext(os.path.basename(database))[0]
+    output_variant = OutputVariant[args.format.upper()]
+    runs: list[tuple[Compression, int | None]] = [(Compression.NONE, None)] * 2
+    runs += [(Compression.GZIP, level) for level in args.gzip_levels]
+    runs += [(Compression.ZSTD, level) for level in args.zstd_levels]
+
+    uncompressed_size = None
+    warm_up = True
+    print(
+        f"{'compression':<12} {'level':>5} {'write s':>9} {'rows/s':>12}"
+        f" {'total s':>9} {'KiB':>9} {'ratio':>7}"
+    )
+    for compression, level in runs:
+        output_dir = os.path.join(
+            args.data_dir, f"{name}_{compression.name.lower()}_{level}"
+        )
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+        try:
+            stages = run_mode(
+                database,
+                args.flavor,
+                ExtractionMode.LITE,
+                output_dir,
+                output_variant,
+                compression,
+                level,
+            )
+        except ValueError as e:
+            print(f"{compression.name.lower():<12} {level!s:>5} skipped: {e}")
+            continue
+        size = output_size(output_dir)
+        shutil.rmtree(output_dir)
+        if warm_up:
+            warm_up = False
+            continue
+        if uncompressed_size is None:
+            uncompressed_size = size
+        write_time, rows = write_throughput(stages)
+        key = {
+            "benchmark": "compression",
+            "flavor": args.flavor,
+            "parishes": parishes,
+            "registers": registers,
+            "images": images,
+            "format": output_variant.name,
+            "compression": compression.name,
+            "level": level,
+        }
+        result = {
+            **key,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "bytes": size,
+            "ratio": round(uncompressed_size / size, 2) if size else None,
+            "stages": stages,
+        }
+        line = (
+            f"{compression.name.lower():<12} {level!s:>5} {write_time:>9.3f}"
+            f" {rows / write_time if write_time else 0:>12,.0f}"
+            f" {stages['total']['wall_seconds']:>9.3f} {size / 2**10:>9,.0f}"
+            f" {result['ratio']:>7}"
+        )
+        previous = previous_result(args.results, key)
+        if previous:
+            old_time, _ = write_throughput(previous["stages"])
+            if old_time:
+                line += f"  {write_time / old_time - 1:+.0%}"
+        print(line)
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Generates synthetic Augias 9.2 and Augias X shaped databases in SQLite.
+
+The generated file can be read by the Augias processors by passing
+`sqlite3.connect` as connection factory, e.g.
+
+    python -m benchmarks.synthetic --flavor x --parishes 10 --images 100000 out.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict
+from typing import Any
+
+from modules.processors.augias_9_2_processor import Augias92Processor
+from modules.processors.augias_processor import AugiasProcessor, KeyMap
+from modules.processors.augias_x_processor import AugiasXProcessor
+
+flavors: dict[str, type[AugiasProcessor]] = {
+    "9.2": Augias92Processor,
+    "x": AugiasXProcessor,
+}
+
+saints = ["Stephan", "Ägidius", "Martin", "Veit", "Laurenz", "Maria", "Jakob", "Öd"]
+places = ["Wien", "Graz", "Sankt Pölten", "Linz", "Krems", "Melk", "Tulln", "Baden"]
+register_kinds = [
+    "Taufbuch",
+    "Trauungsbuch",
+    "Sterbebuch",
+    "Index zum Taufbuch",
+    "Tauf-, Trauungs- und Sterbebuch",
+    "Heiratsregister",
+    "Totenbuch",
+    "Firmungsbuch",
+]
+# Augias tables have many more columns than the processors need
+filler_columns = 10
+batch_size = 50_000
+
+
+def get_key_map(flavor: str) -> KeyMap:
+    processor_class = flavors[flavor]
+    # _get_key_map does not depend on any instance state
+    return processor_class.__new__(processor_class)._get_key_map()
+
+
+def generate(
+    path: str,
+    flavor: str = "x",
+    parishes: int = 10,
+    registers: int = 200,
+    images: int = 10_000,
+    seed: int = 0,
+) -> dict[str, int]:
+    """Write a synthetic database and return the number of rows per table"""
+    key_map = get_key_map(flavor)
+    rnd = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+
+    parish_cols = asdict(key_map.parish_cols)
+    register_cols = asdict(key_map.register_cols)
+    image_cols = asdict(key_map.image_cols)
+    integer_cols = {
+        key_map.parish_cols.augias_id,
+        key_map.register_cols.identifier,
+        key_map.register_cols.date_start,
+        key_map.register_cols.date_end,
+        key_map.register_parent_col,
+        key_map.image_cols.augias_id,
+        key_map.img_parent_col,
+    }
+    parish_table = [*parish_cols.values()]
+    register_table = [key_map.register_parent_col, *register_cols.values()]
+    image_table = [key_map.img_parent_col, *image_cols.values()]
+
+    _create_table(connection, key_map.version_table_name, [key_map.version_col_name])
+    connection.execute(
+        f"INSERT INTO [{key_map.version_table_name}] "
+        f"([{key_map.version_col_name}]) VALUES (?)",
+        (key_map.valid_versions[-1],),
+    )
+    _create_table(connection, key_map.parish_table_name, parish_table, integer_cols)
+    _create_table(connection, key_map.register_table_name, register_table, integer_cols)
+    _create_table(connection, key_map.imgs_table_name, image_table, integer_cols)
+
+    parish_rows: list[list[Any]] = []
+    register_rows: list[list[Any]] = []
+    for parish_id in range(1, parishes + 1):
+        values = _parish_values(rnd, parish_id)
+        parish_rows.append([values[field] for field in parish_cols])
+    for register_id in range(1, registers + 1):
+        parish_id = rnd.randint(1, parishes)
+        values = _register_values(rnd, register_id)
+        register_rows.append([parish_id, *(values[field] for field in register_cols)])
+    _insert(connection, key_map.parish_table_name, parish_rows)
+    _insert(connection, key_map.register_table_name, register_rows)
+    _insert(
+        connection,
+        key_map.imgs_table_name,
+        _image_rows(rnd, register_rows, images, list(image_cols)),
+    )
+    connection.commit()
+    connection.close()
+    return {"parishes": parishes, "registers": registers, "images": images}
+
+
+def _create_table(
+    connection: sqlite3.Connection,
+    table: str,
+    columns: list[str],
+    integer_cols: set[str] | None = None,
+):
+    integer_cols = integer_cols or {columns[0]}
+    definitions = [
+        f"[{column}] {'INTEGER' if column in integer_cols else 'TEXT'}"
+        for column in columns
+    ]
+    definitions += [f"[Filler{i}] TEXT" for i in range(filler_columns)]
+    connection.execute(f"CREATE TABLE [{table}] ({', '.join(definitions)})")
+
+
+def _insert(connection: sqlite3.Connection, table: str, rows: Iterable[list[Any]]):
+    placeholders = None
+    batch: list[list[Any]] = []
+    for row in rows:
+        if placeholders is None:
+            placeholders = ", ".join("?" * (len(row) + filler_columns))
+        batch.append(row + ["Lorem ipsum dolor sit amet"] * filler_columns)
+        if len(batch) >= batch_size:
+            connection.executemany(
+                f"INSERT INTO [{table}] VALUES ({placeholders})", batch
+            )
+            batch = []
+    if batch:
+        connection.executemany(f"INSERT INTO [{table}] VALUES ({placeholders})", batch)
+
+
+def _parish_values(rnd: random.Random, parish_id: int) -> dict[str, Any]:
+    title = f"{rnd.choice(places)}-{rnd.choice(saints)} {parish_id}"
+    has_location = rnd.random() < 0.8
+    return {
+        "augias_id": parish_id,
+        "title": title,
+        "matricula_identifier": f"{parish_id:05d}",
+        "location": (
+            f"{rnd.uniform(46.5, 49):.5f}, {rnd.uniform(9.5, 17):.5f}"
+            if has_location
+            else None
+        ),
+        "parish_church_link": None,
+        "image_url": None,
+        "date_range": f"{rnd.randint(1580, 1700)}-{rnd.randint(1850, 1950)}",
+        "description": rnd.choice([None, "", f"Pfarre {title}"]),
+    }
+
+
+def _register_values(rnd: random.Random, register_id: int) -> dict[str, Any]:
+    start = rnd.randint(1600, 1900)
+    end = start + rnd.randint(1, 60)
+    kind = rnd.choice(register_kinds)
+    return {
+        "identifier": register_id,
+        "title": f"{kind}\r\n{start}-{end}" if rnd.random() < 0.1 else kind,
+        "description": rnd.choice([None, "", f"{kind} {start}-{end}"]),
+        "comment": rnd.choice([None, None, "Mikrofilm vorhanden"]),
+        "archival_identifier": f"{register_id // 100:03d}/{register_id:06d}",
+        "storage_location": f"Regal {rnd.randint(1, 40)}",
+        "microfilm_identifier": rnd.choice([None, f"MF {register_id}"]),
+        "date_range": f"{start}-{end}",
+        "date_start": start * 10000 + 101 if rnd.random() < 0.9 else None,
+        "date_end": end * 10000 + 1231 if rnd.random() < 0.9 else None,
+    }
+
+
+def _image_rows(
+    rnd: random.Random,
+    register_rows: list[list[Any]],
+    images: int,
+    fields: list[str],
+) -> Iterator[list[Any]]:
+    # Images are distributed over the registers and inserted in a shuffled
+    # register order, like in tables that grew over several import runs
+    register_count = len(register_rows)
+    base, remainder = divmod(images, register_count) if register_count else (0, 0)
+    order = list(range(register_count))
+    rnd.shuffle(order)
+    image_id = 0
+    for position, index in enumerate(order):
+        parish_id, register_id = register_rows[index][0], register_rows[index][1]
+        for page in range(1, base + (1 if position < remainder else 0) + 1):
+            image_id += 1
+            file_name = f"{register_id:06d}_{page:04d}.jpg"
+            values = {
+                "augias_id": image_id,
+                "file_path": f"\\\\fileserver\\scans\\{parish_id:04d}\\"
+                f"{register_id:06d}\\{file_name}",
+                "label": f"Seite {page}",
+                "file_name": file_name,
+            }
+            yield [register_id, *(values[field] for field in fields)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("path", help="SQLite file to create")
+    parser.add_argument("--flavor", choices=list(flavors), default="x")
+    parser.add_argument("--parishes", type=int, default=10)
+    parser.add_argument("--registers", type=int, default=200)
+    parser.add_argument("--images", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate(
+        args.path, args.flavor, args.parishes, args.registers, args.images, args.seed
+    )
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
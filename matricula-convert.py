@@ -1,16 +1,29 @@
+import multiprocessing
 import sys
 
-from PySide6.QtWidgets import QApplication
-
-from modules.gui.main_window import MainWindow
+from modules.cli import main
 from modules.logger import Logger
 
 log = Logger()
 
 
-if __name__ == "__main__":
+def run_gui() -> int:
+    # Imported here so that the command line and the worker processes, which
+    # import this module again, do not load Qt
+    from PySide6.QtWidgets import QApplication
+
+    from modules.gui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.resize(600, 800)
     window.show()
-    sys.exit(app.exec())
+    return app.exec()
+
+
+if __name__ == "__main__":
+    # Needed for the worker processes of the frozen executable
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
+    sys.exit(run_gui())
@@ -0,0 +1,276 @@
+import argparse
+import logging
+import os
+
+from modules.convert import convert
+from modules.diff import diff_outputs
+from modules.external_sort import default_memory_budget
+from modules.logger import Logger
+from modules.merge import merge_inputs
+from modules.processors.augias_processor import AugiasProcessor, ExtractionMode
+from modules.processors.registry import find_processor
+from modules.profiling import ProfileMode
+from modules.writers.compression import Compression
+from modules.writers.write import OutputVariant
+
+log = Logger()
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="matricula-convert",
+        description="Convert an archival database export into Matricula import files."
+        " Without arguments, the graphical interface is started. Use"
+        " 'matricula-convert diff' to compare two conversions and"
+        " 'matricula-convert merge' to merge several databases.",
+    )
+    parser.add_argument("input_file", help="File to convert")
+    parser.add_argument("output_dir", help="Directory to write the output files to")
+    parser.add_argument(
+        "--diocese", required=True, help="Diocese ID as configured in Matricula"
+    )
+    parser.add_argument(
+        "--format",
+        choices=[v.name.lower() for v in OutputVariant],
+        default=OutputVariant.CSV.name.lower(),
+        help="Output format",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=[c.name.lower() for c in Compression if c != Compression.NONE],
+        help="Compress the output files while they are written",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        help="Compression level, defaults to 6 for gzip and 3 for zstd",
+    )
+    parser.add_argument(
+        "--shard-rows",
+        type=int,
+        help="Split images.csv into shards of about this many rows",
+    )
+    parser.add_argument(
+        "--shard-bytes",
+        type=int,
+        help="Split images.csv into shards of about this many uncompressed bytes",
+    )
+    parser.add_argument(
+        "--verify-images",
+        action="store_true",
+        help="Check that the image files exist and report missing and extra files",
+    )
+    parser.add_argument(
+        "--image-metadata",
+        action="store_true",
+        help="Write the size, dimensions and checksum of the images",
+    )
+    parser.add_argument(
+        "--delta",
+        metavar="STORE",
+        help="Only write rows that changed since the run that used the same"
+        " fingerprint store file",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Report duplicate keys, orphaned references, malformed dates and"
+        " coordinates and empty titles",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Fetch, transform and write on separate threads at the same time",
+    )
+    parser.add_argument(
+        "--diocese-map",
+        metavar="FILE",
+        help="CSV file with the diocese_id of every parish_id, writes each"
+        " diocese into its own subdirectory in a single pass",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=[m.name.lower() for m in ExtractionMode],
+        default=ExtractionMode.AUTO.name.lower(),
+        help="How Augias databases are read",
+    )
+    parser.add_argument(
+        "--sort-memory",
+        type=int,
+        default=default_memory_budget // 2**20,
+        help="Memory in MiB used for sorting the images of the lite mode before"
+        " spilling to disk",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes transforming the parishes in the tables mode",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record the peak memory of each stage in the conversion report",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=ProfileMode.CPROFILE.name.lower(),
+        choices=[m.name.lower() for m in ProfileMode if m != ProfileMode.OFF],
+        help="Profile the conversion and write the profile to the output directory",
+    )
+    return parser
+
+
+def create_diff_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="matricula-convert diff",
+        description="Compare the CSV files of two conversions.",
+    )
+    parser.add_argument("old_dir", help="Output directory of the previous conversion")
+    parser.add_argument("new_dir", help="Output directory of the new conversion")
+    parser.add_argument(
+        "output_dir", help="Directory to write the summary and the changed rows to"
+    )
+    parser.add_argument(
+        "--memory",
+        type=int,
+        default=default_memory_budget // 2**20,
+        help="Memory in MiB used for sorting the images before spilling to disk",
+    )
+    return parser
+
+
+def create_merge_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="matricula-convert merge",
+        description="Convert several databases of one diocese and merge them into"
+        " one set of CSV files.",
+    )
+    parser.add_argument("output_dir", help="Directory to write the output files to")
+    parser.add_argument("input_files", nargs="+", help="Files to merge")
+    parser.add_argument(
+        "--diocese", required=True, help="Diocese ID as configured in Matricula"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=[m.name.lower() for m in ExtractionMode],
+        default=ExtractionMode.AUTO.name.lower(),
+        help="How Augias databases are read",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=[c.name.lower() for c in Compression if c != Compression.NONE],
+        help="Compress the output files while they are written",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        help="Compression level, defaults to 6 for gzip and 3 for zstd",
+    )
+    parser.add_argument(
+        "--memory",
+        type=int,
+        default=default_memory_budget // 2**20,
+        help="Memory in MiB used for sorting the rows before spilling to disk",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of databases converted at the same time, defaults to the"
+        " number of CPUs",
+    )
+    return parser
+
+
+def main(argv: list[str]) -> int:
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.add_handler(console_handler)
+    if argv and argv[0] == "diff":
+        return diff(argv[1:])
+    if argv and argv[0] == "merge":
+        return merge(argv[1:])
+    args = create_parser().parse_args(argv)
+
+    if not os.path.isdir(args.output_dir):
+        log.error(f"Output directory '{args.output_dir}' does not exist")
+        return 1
+    processor = find_processor(args.input_file, lambda _: None)
+    if processor is None:
+        log.error("Unsupported file format or unable to create a valid processor")
+        return 1
+    log.info(f"Processor '{processor.name}' initialized successfully")
+    if isinstance(processor, AugiasProcessor):
+        processor.mode = ExtractionMode[args.mode.upper()]
+        processor.memory_budget = args.sort_memory * 2**20
+        processor.workers = args.workers
+    try:
+        convert(
+            processor,
+            args.diocese,
+            OutputVariant[args.format.upper()],
+            args.output_dir,
+            trace_memory=args.trace_memory,
+            profile=(
+                ProfileMode[args.profile.upper()] if args.profile else ProfileMode.OFF
+            ),
+            compression=(
+                Compression[args.compress.upper()]
+                if args.compress
+                else Compression.NONE
+            ),
+            compression_level=args.compression_level,
+            shard_rows=args.shard_rows,
+            shard_bytes=args.shard_bytes,
+            verify_images=args.verify_images,
+            image_metadata=args.image_metadata,
+            delta_store=args.delta,
+            validate=args.validate,
+            diocese_map=args.diocese_map,
+            pipelined=args.pipeline,
+        )
+    except Exception as e:
+        log.error(f"Error during extraction: {e}")
+        return 1
+    log.info("Conversion completed successfully")
+    return 0
+
+
+def diff(argv: list[str]) -> int:
+    args = create_diff_parser().parse_args(argv)
+    for directory in (args.old_dir, args.new_dir, args.output_dir):
+        if not os.path.isdir(directory):
+            log.error(f"Directory '{directory}' does not exist")
+            return 1
+    try:
+        diff_outputs(args.old_dir, args.new_dir, args.output_dir, args.memory * 2**20)
+    except (OSError, ValueError) as e:
+        log.error(f"Error comparing the conversions: {e}")
+        return 1
+    log.info(f"Changed rows written to {args.output_dir}")
+    return 0
+
+
+def merge(argv: list[str]) -> int:
+    args = create_merge_parser().parse_args(argv)
+    if not os.path.isdir(args.output_dir):
+        log.error(f"Output directory '{args.output_dir}' does not exist")
+        return 1
+    try:
+        merge_inputs(
+            args.input_files,
+            args.diocese,
+            args.output_dir,
+            ExtractionMode[args.mode.upper()],
+            Compression[args.compress.upper()] if args.compress else Compression.NONE,
+            args.compression_level,
+            args.memory * 2**20,
+            args.workers,
+        )
+    except Exception as e:
+        log.error(f"Error merging the databases: {e}")
+        return 1
+    log.info(f"Merged output written to {args.output_dir}")
+    return 0
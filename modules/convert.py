@@ -0,0 +1,166 @@
+from modules.image_metadata import ImageMetadataExtractor
+from modules.instrumentation import Instrumentation
+from modules.logger import Logger
+from modules.pipeline import Pipeline
+from modules.processors.base_processor import BaseProcessor
+from modules.profiling import ProfileMode, Profiler
+from modules.validation import Validator
+from modules.verification import ImageVerifier
+from modules.writers.base_writer import BaseWriter
+from modules.writers.compression import Compression
+from modules.writers.delta_writer import DeltaWriter
+from modules.writers.fan_out_writer import FanOutWriter, read_diocese_map
+from modules.writers.write import OutputVariant, get_writer
+
+log = Logger()
+
+
+def convert(
+    processor: BaseProcessor,
+    diocese_id: str,
+    output_variant: OutputVariant,
+    output_dir: str,
+    *,
+    trace_memory: bool = False,
+    profile: ProfileMode = ProfileMode.OFF,
+    compression: Compression = Compression.NONE,
+    compression_level: int | None = None,
+    shard_rows: int | None = None,
+    shard_bytes: int | None = None,
+    verify_images: bool = False,
+    image_metadata: bool = False,
+    delta_store: str | None = None,
+    validate: bool = False,
+    diocese_map: str | None = None,
+    pipelined: bool = False,
+) -> Instrumentation:
+    """Stream the extracted partitions into the writer and write a run report"""
+    instrumentation = Instrumentation(trace_memory)
+    instrumentation.metadata.update(
+        processor=processor.name,
+        input_file=processor.input_file,
+        diocese_id=diocese_id,
+        output_variant=output_variant.name,
+        compression=compression.name,
+        compression_level=compression_level,
+        shard_rows=shard_rows,
+        shard_bytes=shard_bytes,
+        delta_store=delta_store,
+        diocese_map=diocese_map,
+        pipelined=pipelined,
+    )
+
+    diocese_ids: list[str] | None = None
+    if diocese_map is not None:
+        processor.parish_dioceses = read_diocese_map(diocese_map)
+        diocese_ids = list(
+            dict.fromkeys([diocese_id, *processor.parish_dioceses.values()])
+        )
+
+    def create_variant_writer(directory: str) -> BaseWriter:
+        return get_writer(
+            output_variant,
+            directory,
+            compression,
+            compression_level,
+            shard_rows,
+            shard_bytes,
+        )
+
+    def create_writer(directory: str) -> BaseWriter:
+        if diocese_ids is not None:
+            return FanOutWriter(directory, diocese_ids, create_variant_writer)
+        return create_variant_writer(directory)
+
+    writer = (
+        DeltaWriter(output_dir, delta_store, create_writer)
+        if delta_store is not None
+        else create_writer(output_dir)
+    )
+    processor.instrumentation = instrumentation
+    writer.instrumentation = instrumentation
+    verifier = ImageVerifier() if verify_images else None
+    metadata = ImageMetadataExtractor(output_dir) if image_metadata else None
+    validator = Validator() if validate else None
+    pipeline = Pipeline() if pipelined else None
+    processor.pipeline = pipeline
+    profiler = None
+    if profile != ProfileMode.OFF:
+        profiler = Profiler(profile, output_dir)
+        profiler.count_calls(processor, processor.hot_paths)
+        processor.profiler = profiler
+        profiler.count_calls(writer, writer.hot_paths)
+        profiler.start()
+    instrumentation.start()
+    try:
+        if verifier is not None:
+            verifier.start()
+        if metadata is not None:
+            metadata.start()
+        writer.open()
+        try:
+            partitions = processor.iter_partitions(diocese_id)
+            if pipeline is not None:
+                # Partitions are transformed on their own thread while the
+                # previous ones are written
+                pipeline.start()
+                partitions = pipeline.consume(
+                    "write", pipeline.threaded("transform", partitions)
+                )
+            while True:
+                with instrumentation.stage("extract") as stage:
+                    partition = next(partitions, None)
+                    if partition is not None:
+                        stage.rows = len(partition.registers) + len(partition.images)
+                if partition is None:
+                    break
+                writer.write_partition(partition)
+                if verifier is not None:
+                    verifier.add(partition)
+                if metadata is not None:
+                    with instrumentation.stage("image metadata", len(partition.images)):
+                        metadata.add(partition)
+                if validator is not None:
+                    with instrumentation.stage("validate", len(partition.images)):
+                        validator.add(partition)
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            if pipeline is not None:
+                pipeline.stop()
+                instrumentation.metadata["pipeline"] = pipeline.report()
+            if metadata is not None:
+                instrumentation.metadata["image_metadata"] = metadata.finish()
+        writer.close()
+        if isinstance(writer, DeltaWriter):
+            instrumentation.metadata["delta"] = writer.counts
+        if isinstance(writer, FanOutWriter):
+            instrumentation.metadata["dioceses"] = writer.counts
+        if validator is not None:
+            validation = validator.finish(processor.issues)
+            instrumentation.metadata["validation"] = validation["counts"]
+        if verifier is not None:
+            with instrumentation.stage("verify images"):
+                verification = verifier.finish()
+            instrumentation.metadata["image_verification"] = {
+                k: v for k, v in verification.items() if k != "registers"
+            }
+    finally:
+        instrumentation.stop()
+        if profiler is not None:
+            profiler.stop()
+    report_path = instrumentation.write_report(output_dir)
+    instrumentation.log_summary()
+    if pipeline is not None:
+        pipeline.log_summary()
+    log.info(f"Conversion report written to {report_path}")
+    if metadata is not None:
+        metadata.log_summary()
+    if validator is not None:
+        validator.log_summary()
+        log.info(f"Validation report written to {validator.write_report(output_dir)}")
+    if verifier is not None:
+        verifier.log_summary()
+        log.info(f"Image verification written to {verifier.write_report(output_dir)}")
+    return instrumentation
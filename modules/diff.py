@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import os
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from modules.external_sort import default_memory_budget, external_sort
+from modules.logger import Logger
+from modules.writers.compression import find_compressed, open_decompressed
+from modules.writers.sharded_writer import manifest_file_name
+
+log = Logger()
+
+summary_file_name = "diff_summary.json"
+# Columns identifying a row across conversions
+key_columns = {
+    "parishes": ["identifier"],
+    "registers": ["parish", "archival_identifier"],
+    "images": ["register", "file_path"],
+}
+# Files small enough to be compared with an in-memory hash join
+hash_join_files = {"parishes", "registers"}
+listing_header = ["change"]
+
+type Row = list[str]
+
+
+class FileDiff:
+    """Counts the changes of one file and lists the changed rows"""
+
+    def __init__(self, name: str, header: Row, output_dir: str):
+        self.name = name
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+        self.unchanged = 0
+        self._file = open(
+            os.path.join(output_dir, f"{name}_diff.csv"),
+            "w",
+            newline="",
+            encoding="utf-8",
+        )
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(listing_header + header)
+
+    def add(self, row: Row):
+        self.added += 1
+        self._writer.writerow(["added", *row])
+
+    def remove(self, row: Row):
+        self.removed += 1
+        self._writer.writerow(["removed", *row])
+
+    def compare(self, old: Row, new: Row):
+        if old == new:
+            self.unchanged += 1
+        else:
+            self.changed += 1
+            self._writer.writerow(["changed_from", *old])
+            self._writer.writerow(["changed_to", *new])
+
+    def close(self):
+        self._file.close()
+
+    def summary(self) -> dict[str, int]:
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+        }
+
+
+def diff_outputs(
+    old_dir: str,
+    new_dir: str,
+    output_dir: str,
+    memory_budget: int = default_memory_budget,
+) -> dict[str, dict[str, int]]:
+    """Compare the CSV files of two conversions by their key columns and write a
+    listing of the changed rows per file and a summary to the output directory"""
+    summary = {}
+    for name, columns in key_columns.items():
+        with (
+            read_rows(old_dir, name) as (old_header, old_rows),
+            read_rows(new_dir, name) as (new_header, new_rows),
+        ):
+            if old_header != new_header:
+                raise ValueError(f"The columns of {name}.csv differ")
+            key_indices = [new_header.index(column) for column in columns]
+            diff = FileDiff(name, new_header, output_dir)
+            try:
+                if name in hash_join_files:
+                    _hash_join(old_rows, new_rows, key_indices, diff)
+                else:
+                    _merge_join(old_rows, new_rows, key_indices, diff, memory_budget)
+            finally:
+                diff.close()
+        summary[name] = diff.summary()
+        log.info(
+            f"{name}.csv: {diff.added} added, {diff.removed} removed, "
+            f"{diff.changed} changed, {diff.unchanged} unchanged"
+        )
+    with open(os.path.join(output_dir, summary_file_name), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+@contextmanager
+def read_rows(output_dir: str, name: str) -> Iterator[tuple[Row, Iterator[Row]]]:
+    """Stream the rows of a CSV output file, which may be compressed or sharded"""
+    paths = _file_paths(output_dir, name)
+    files: list[Any] = []
+
+    def rows() -> Iterator[Row]:
+        first = True
+        for file_path in paths:
+            f = io.TextIOWrapper(
+                open_decompressed(file_path), encoding="utf-8", newline=""
+            )
+            files.append(f)
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if first:
+                yield header or []
+                first = False
+            yield from reader
+            f.close()
+
+    try:
+        iterator = rows()
+        yield next(iterator), iterator
+    finally:
+        for f in files:
+            f.close()
+
+
+def _file_paths(output_dir: str, name: str) -> list[str]:
+    manifest_path = os.path.join(output_dir, manifest_file_name)
+    if name == "images" and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        return [os.path.join(output_dir, shard["file"]) for shard in manifest["shards"]]
+    file_path = find_compressed(os.path.join(output_dir, f"{name}.csv"))
+    if file_path is None:
+        raise ValueError(f"{name}.csv not found in {output_dir}")
+    return [file_path]
+
+
+def row_key(row: Row, key_indices: list[int]) -> tuple[str, ...]:
+    return tuple(row[i] for i in key_indices)
+
+
+def _hash_join(
+    old_rows: Iterator[Row],
+    new_rows: Iterator[Row],
+    key_indices: list[int],
+    diff: FileDiff,
+):
+    # Rows with a duplicate key are paired in file order
+    old: dict[tuple[str, ...], deque[Row]] = {}
+    for row in old_rows:
+        old.setdefault(row_key(row, key_indices), deque()).append(row)
+    for row in new_rows:
+        matches = old.get(row_key(row, key_indices))
+        if matches:
+            diff.compare(matches.popleft(), row)
+        else:
+            diff.add(row)
+    for matches in old.values():
+        for row in matches:
+            diff.remove(row)
+
+
+def _merge_join(
+    old_rows: Iterator[Row],
+    new_rows: Iterator[Row],
+    key_indices: list[int],
+    diff: FileDiff,
+    memory_budget: int,
+):
+    # Both sides are sorted by key, the budget is shared between them
+    def sort(rows: Iterator[Row]) -> Iterator[Row]:
+        return external_sort(
+            rows,
+            key=lambda row: row_key(row, key_indices),
+            memory_budget=memory_budget // 2,
+            size=row_size,
+        )
+
+    old_sorted = sort(old_rows)
+    new_sorted = sort(new_rows)
+    old = next(old_sorted, None)
+    new = next(new_sorted, None)
+    while old is not None or new is not None:
+        if new is None or (
+            old is not None and row_key(old, key_indices) < row_key(new, key_indices)
+        ):
+            diff.remove(old)  # type: ignore[arg-type]
+            old = next(old_sorted, None)
+        elif old is None or row_key(new, key_indices) < row_key(old, key_indices):
+            diff.add(new)
+            new = next(new_sorted, None)
+        else:
+            diff.compare(old, new)
+            old = next(old_sorted, None)
+            new = next(new_sorted, None)
+
+
+def row_size(row: Row) -> int:
+    # Approximate size of the list and its strings in memory
+    return 56 + 8 * len(row) + sum(49 + len(value) for value in row)
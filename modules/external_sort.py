@@ -0,0 +1,97 @@
+import heapq
+import pickle
+import sys
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from _typeshed import SupportsRichComparison
+
+default_memory_budget = 64 * 2**20
+# Items pickled together in a run file
+block_size = 1024
+# Runs merged at once, more runs are first merged into intermediate runs
+max_fan_in = 128
+
+
+def external_sort[T](
+    items: Iterable[T],
+    key: "Callable[[T], SupportsRichComparison] | None" = None,
+    memory_budget: int = default_memory_budget,
+    size: Callable[[T], int] = sys.getsizeof,
+    temp_dir: str | None = None,
+) -> Iterator[T]:
+    """Sort items that may not fit into memory. Items are collected until their
+    estimated size reaches the memory budget, then sorted and spilled to a
+    temporary run file, and the runs are merged while iterating. The sort is
+    stable, and done in memory if all items fit into the budget."""
+    if key is None:
+        key = _identity
+    runs: list[IO[bytes]] = []
+    buffer: list[T] = []
+    used = 0
+    try:
+        for item in items:
+            buffer.append(item)
+            used += size(item)
+            if used >= memory_budget:
+                buffer.sort(key=key)
+                runs.append(_write_run(buffer, temp_dir))
+                buffer = []
+                used = 0
+        buffer.sort(key=key)
+        if not runs:
+            yield from buffer
+            return
+        if buffer:
+            runs.append(_write_run(buffer, temp_dir))
+            buffer = []
+        while len(runs) > max_fan_in:
+            merged = heapq.merge(*map(_read_run, runs[:max_fan_in]), key=key)
+            run = _write_run(merged, temp_dir)
+            for f in runs[:max_fan_in]:
+                f.close()
+            # The merged run replaces the earliest runs to keep the sort stable
+            runs = [run, *runs[max_fan_in:]]
+        yield from heapq.merge(*map(_read_run, runs), key=key)
+    finally:
+        for f in runs:
+            f.close()
+
+
+def _identity(item: Any) -> Any:
+    return item
+
+
+def item_size(item: Any) -> int:
+    """Approximate size of an item in memory, including the values of nested
+    tuples and lists"""
+    size = sys.getsizeof(item)
+    if isinstance(item, tuple | list):
+        size += sum(map(item_size, item))
+    return size
+
+
+def _write_run(items: Iterable[Any], temp_dir: str | None) -> IO[bytes]:
+    # Deleted by the operating system once closed
+    f = tempfile.TemporaryFile(dir=temp_dir)
+    block: list[Any] = []
+    for item in items:
+        block.append(item)
+        if len(block) == block_size:
+            pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+            block = []
+    if block:
+        pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+
+def _read_run(f: IO[bytes]) -> Iterator[Any]:
+    while True:
+        try:
+            block = pickle.load(f)
+        except EOFError:
+            return
+        yield from block
@@ -1,3 +1,7 @@
+import logging
+from typing import override
+
+from PySide6.QtCore import QObject, Signal
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
     QDialog,
@@ -29,3 +33,18 @@ class LogWindow(QDialog):
 
     def append_log(self, message: str):
         self.log_text.append(message)
+
+
+class LogEmitter(QObject):
+    log_signal = Signal(str)
+
+
+class SignalLogHandler(logging.Handler):
+    def __init__(self, emitter: LogEmitter):
+        super().__init__()
+        self.emitter = emitter
+
+    @override
+    def emit(self, record: logging.LogRecord):
+        message = self.format(record)
+        self.emitter.log_signal.emit(message)
@@ -7,6 +7,7 @@ from typing import Callable, override
 from PySide6.QtCore import QSettings, QThread
 from PySide6.QtGui import QCloseEvent, QIcon
 from PySide6.QtWidgets import (
+    QComboBox,
     QFileDialog,
     QHBoxLayout,
     QLabel,
@@ -19,12 +20,13 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from modules.gui.log_window import LogWindow
+from modules.gui.log_window import LogEmitter, LogWindow, SignalLogHandler
 from modules.gui.ui_helper import UIHelper
-from modules.logger import LogEmitter, Logger, SignalLogHandler
-from modules.models.matricula_data import MatriculaData
+from modules.logger import Logger
+from modules.processors.augias_processor import ExtractionMode
 from modules.processors.process import ProcessorWorker
-from modules.writers.csv_writer import CSVWriter
+from modules.profiling import ProfileMode
+from modules.writers.compression import Compression
 from modules.writers.write import OutputVariant
 
 import_site_url = "https://data.matricula-online.eu/en/admin/serialized/importrequest/"
@@ -125,12 +127,27 @@ class MainWindow(QWidget):
         self.file_input: QLineEdit
         self.diocese_id_input: QLineEdit
         self.output_dir_input: QLineEdit
+        self.output_variant_input: QComboBox
         self.selected_file_path: str = ""
         self.output_dir: str = ""
-        self.data: MatriculaData | None = None
         self.worker: ProcessorWorker | None = None
         self.worker_thread: QThread | None = None
         self.output_variant: OutputVariant = OutputVariant.CSV
+        self.extraction_mode: ExtractionMode = ExtractionMode.AUTO
+        self.trace_memory: bool = False
+        self.profile: ProfileMode = ProfileMode.OFF
+        self.compression: Compression = Compression.NONE
+        self.compression_level: int | None = None
+        self.shard_rows: int | None = None
+        self.shard_bytes: int | None = None
+        self.verify_images: bool = False
+        self.image_metadata: bool = False
+        self.delta_store: str | None = None
+        self.validate: bool = False
+        self.diocese_map: str | None = None
+        self.memory_budget: int | None = None
+        self.pipelined: bool = False
+        self.workers: int = 1
 
         self._initialize_ui()
         self._setup_logging()
@@ -269,9 +286,18 @@ class MainWindow(QWidget):
         return intro_widget
 
     def _create_output_dir_layout(self):
-        layout = QHBoxLayout()
-        layout.addWidget(self.output_dir_input)
-        layout.addWidget(self._create_button("Browse", self._browse_output_directory))
+        layout = QVBoxLayout()
+        dir_layout = QHBoxLayout()
+        dir_layout.addWidget(self.output_dir_input)
+        dir_layout.addWidget(
+            self._create_button("Browse", self._browse_output_directory)
+        )
+        layout.addLayout(dir_layout)
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(QLabel("Format:"))
+        format_layout.addWidget(self.output_variant_input)
+        format_layout.addStretch()
+        layout.addLayout(format_layout)
         return layout
 
     def _create_upload_layout(self):
@@ -282,10 +308,11 @@ class MainWindow(QWidget):
         layout.addStretch()
         return layout
 
-    def _handle_result(self, data: MatriculaData):
+    def _handle_result(self, output_dir: str):
         log.info("Conversion completed successfully")
-        self.data = data
-        self._write_output_files()
+        QMessageBox.information(
+            self, "Success", f"Conversion completed successfully.\n\n{output_dir}"
+        )
 
     def _initialize_ui(self):
         icon_path = self.ui_helper.get_resource_path("icon.ico")
@@ -296,6 +323,12 @@ class MainWindow(QWidget):
         self.file_input = self.ui_helper.create_input()
         self.diocese_id_input = self.ui_helper.create_input()
         self.output_dir_input = self.ui_helper.create_input()
+        self.output_variant_input = self.ui_helper.create_combo_box(
+            [variant.name for variant in OutputVariant]
+        )
+        self.output_variant_input.currentTextChanged.connect(
+            self._select_output_variant
+        )
 
     def _load_settings(self):
         settings_path = os.path.join(
@@ -307,6 +340,50 @@ class MainWindow(QWidget):
         self.file_input.setText(self.selected_file_path)
         self.output_dir_input.setText(self.output_dir)
         self.diocese_id_input.setText(str(self.settings.value("last_diocese_id", "")))
+        output_variant = str(self.settings.value("last_output_variant", "CSV"))
+        if output_variant in OutputVariant.__members__:
+            self.output_variant_input.setCurrentText(output_variant)
+        # Not exposed in the UI, can be set manually in the ini file
+        extraction_mode = str(self.settings.value("extraction_mode", "AUTO")).upper()
+        if extraction_mode in ExtractionMode.__members__:
+            self.extraction_mode = ExtractionMode[extraction_mode]
+        else:
+            log.warn(f"Unknown extraction mode '{extraction_mode}', using AUTO")
+        self.trace_memory = (
+            str(self.settings.value("trace_memory", "false")).lower() == "true"
+        )
+        profile = str(self.settings.value("profile", "OFF")).upper()
+        if profile in ProfileMode.__members__:
+            self.profile = ProfileMode[profile]
+        else:
+            log.warn(f"Unknown profile mode '{profile}', profiling is disabled")
+        compression = str(self.settings.value("compression", "NONE")).upper()
+        if compression in Compression.__members__:
+            self.compression = Compression[compression]
+        else:
+            log.warn(f"Unknown compression '{compression}', files are not compressed")
+        compression_level = str(self.settings.value("compression_level", ""))
+        self.compression_level = (
+            int(compression_level) if compression_level.isdigit() else None
+        )
+        shard_rows = str(self.settings.value("shard_rows", ""))
+        self.shard_rows = int(shard_rows) if shard_rows.isdigit() else None
+        shard_bytes = str(self.settings.value("shard_bytes", ""))
+        self.shard_bytes = int(shard_bytes) if shard_bytes.isdigit() else None
+        self.verify_images = (
+            str(self.settings.value("verify_images", "false")).lower() == "true"
+        )
+        self.image_metadata = (
+            str(self.settings.value("image_metadata", "false")).lower() == "true"
+        )
+        self.delta_store = str(self.settings.value("delta_store", "")) or None
+        self.validate = str(self.settings.value("validate", "false")).lower() == "true"
+        self.diocese_map = str(self.settings.value("diocese_map", "")) or None
+        sort_memory = str(self.settings.value("sort_memory", ""))
+        self.memory_budget = int(sort_memory) * 2**20 if sort_memory.isdigit() else None
+        self.pipelined = str(self.settings.value("pipeline", "false")).lower() == "true"
+        workers = str(self.settings.value("workers", ""))
+        self.workers = int(workers) if workers.isdigit() and int(workers) > 0 else 1
 
     def _on_log_signal(self, message: str):
         if hasattr(self, "log_window"):
@@ -325,6 +402,13 @@ class MainWindow(QWidget):
     def _processor_initialized(self, processor_name: str):
         log.info(f"Processor '{processor_name}' initialized successfully")
 
+    def _select_output_variant(self, name: str):
+        self.output_variant = OutputVariant[name]
+        if hasattr(self, "settings"):
+            self.settings.setValue("last_output_variant", name)
+        if self.worker is not None:
+            self.worker.output_variant = self.output_variant
+
     def _setup_logging(self):
         self.log_emitter = LogEmitter()
         self.log_handler = SignalLogHandler(self.log_emitter)
@@ -356,7 +440,7 @@ class MainWindow(QWidget):
             self._update_processor()
 
         if self.worker:
-            self.worker.start_extraction.emit(diocese_id)
+            self.worker.start_extraction.emit(diocese_id, self.output_dir)
 
     def _update_processor(self):
         # Clean up existing worker and thread if they exist
@@ -369,7 +453,25 @@ class MainWindow(QWidget):
         if self.selected_file_path:
             log.info(f"Initializing processor for '{self.selected_file_path}'")
             # Create a new ProcessorWorker and thread
-            self.worker = ProcessorWorker(self.selected_file_path)
+            self.worker = ProcessorWorker(
+                self.selected_file_path,
+                self.output_variant,
+                extraction_mode=self.extraction_mode,
+                trace_memory=self.trace_memory,
+                profile=self.profile,
+                compression=self.compression,
+                compression_level=self.compression_level,
+                shard_rows=self.shard_rows,
+                shard_bytes=self.shard_bytes,
+                verify_images=self.verify_images,
+                image_metadata=self.image_metadata,
+                delta_store=self.delta_store,
+                validate=self.validate,
+                diocese_map=self.diocese_map,
+                memory_budget=self.memory_budget,
+                pipelined=self.pipelined,
+                workers=self.workers,
+            )
             self.worker_thread = QThread()
             self.worker.moveToThread(self.worker_thread)
 
@@ -389,19 +491,3 @@ class MainWindow(QWidget):
     def _update_progress(self, percent: float):
         percent = round(percent)
         self.progress_bar.setValue(percent)
-
-    def _write_output_files(self):
-        if not self.output_dir:
-            QMessageBox.warning(self, "Error", "No output directory selected.")
-            return
-        if not self.data:
-            return
-        if self.output_variant == OutputVariant.CSV:
-            log.info(f"Writing output files to {self.output_dir}")
-            writer = CSVWriter(self.output_dir)
-            writer.write(self.data)
-            log.info("Output files written successfully")
-            log.info("Conversion completed successfully")
-            QMessageBox.information(
-                self, "Success", "Conversion completed successfully."
-            )
@@ -3,6 +3,7 @@ import sys
 
 from PySide6.QtGui import QPalette
 from PySide6.QtWidgets import (
+    QComboBox,
     QLabel,
     QLineEdit,
     QProgressBar,
@@ -107,6 +108,14 @@ class UIHelper:
         input_field.setFixedHeight(self.ele_height)
         return input_field
 
+    def create_combo_box(self, items: list[str]) -> QComboBox:
+        combo_box = QComboBox(self.parent)
+        combo_box.addItems(items)
+        combo_box.setStyleSheet(self.input_style)
+        combo_box.setFixedHeight(self.ele_height)
+        combo_box.setFixedWidth(self.button_width)
+        return combo_box
+
     def create_progress_bar(self) -> QProgressBar:
         progress_bar = QProgressBar(self.parent)
         progress_bar.setStyleSheet(self.progress_bar_style)
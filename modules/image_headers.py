@@ -0,0 +1,103 @@
+"""Image dimensions from the file headers and checksums of memory mapped files.
+
+Kept free of Qt and logging imports, since the functions run in worker processes.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from typing import Any
+
+# Size, width, height, format and SHA-256 of an image file
+type ImageMetadata = tuple[int, int | None, int | None, str | None, str]
+
+# JPEG start of frame markers, the ones holding the image dimensions
+jpeg_sof_markers = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}  # fmt: skip
+# JPEG markers without a length field
+jpeg_standalone_markers = {0x01, *range(0xD0, 0xDA)}
+
+
+def read_metadata(file_path: str) -> ImageMetadata | None:
+    """Read the dimensions from the header and checksum the whole file, None if
+    the file cannot be read"""
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 0, None, None, None, hashlib.sha256().hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                width, height, image_format = read_dimensions(data)
+                checksum = hashlib.sha256(data).hexdigest()
+    except (OSError, ValueError):
+        return None
+    return size, width, height, image_format, checksum
+
+
+def read_dimensions(data: Any) -> tuple[int | None, int | None, str | None]:
+    """Width, height and format of a JPEG, PNG, TIFF, GIF or BMP image"""
+    try:
+        if data[:2] == b"\xff\xd8":
+            return *_jpeg_dimensions(data), "jpeg"
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            width, height = struct.unpack(">II", data[16:24])
+            return width, height, "png"
+        if data[:4] in (b"II*\x00", b"MM\x00*"):
+            return *_tiff_dimensions(data), "tiff"
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack("<HH", data[6:10])
+            return width, height, "gif"
+        if data[:2] == b"BM":
+            width, height = struct.unpack("<ii", data[18:26])
+            return width, abs(height), "bmp"
+    except (struct.error, IndexError):
+        pass
+    return None, None, None
+
+
+def _jpeg_dimensions(data: Any) -> tuple[int | None, int | None]:
+    offset = 2
+    end = len(data)
+    while offset + 4 <= end:
+        if data[offset] != 0xFF:
+            return None, None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in jpeg_standalone_markers:
+            offset += 2
+            continue
+        length = struct.unpack(">H", data[offset + 2 : offset + 4])[0]
+        if marker in jpeg_sof_markers:
+            height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+            return width, height
+        if marker == 0xDA:
+            # Start of the compressed data, no frame header before it
+            return None, None
+        offset += 2 + length
+    return None, None
+
+
+def _tiff_dimensions(data: Any) -> tuple[int | None, int | None]:
+    order = "<" if data[:2] == b"II" else ">"
+    ifd_offset = struct.unpack(f"{order}I", data[4:8])[0]
+    count = struct.unpack(f"{order}H", data[ifd_offset : ifd_offset + 2])[0]
+    width = height = None
+    for i in range(count):
+        entry = ifd_offset + 2 + i * 12
+        tag, field_type = struct.unpack(f"{order}HH", data[entry : entry + 4])
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:  # SHORT
+            value = struct.unpack(f"{order}H", data[entry + 8 : entry + 10])[0]
+        else:  # LONG
+            value = struct.unpack(f"{order}I", data[entry + 8 : entry + 12])[0]
+        if tag == 256:
+            width = value
+        else:
+            height = value
+    return width, height
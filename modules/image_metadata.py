@@ -0,0 +1,198 @@
+import csv
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TextIO
+
+from modules.image_headers import ImageMetadata, read_metadata
+from modules.logger import Logger
+from modules.models.matricula_data import MatriculaData
+
+log = Logger()
+
+metadata_file_name = "image_metadata.csv"
+metadata_header = [
+    "register",
+    "file_path",
+    "size",
+    "width",
+    "height",
+    "format",
+    "sha256",
+]
+default_cache_path = os.path.join(
+    os.path.expanduser("~"), ".matricula-convert", "image_metadata.sqlite"
+)
+
+# Modification time in nanoseconds and size of a file
+type FileStat = tuple[int, int]
+
+
+class ImageMetadataExtractor:
+    """Writes the size, pixel dimensions and checksum of every image to
+    image_metadata.csv. The directories of a partition are listed on a thread
+    pool, and only files whose path, mtime or size are not in the persistent
+    cache are read, on a pool of processes."""
+
+    # Directory listings mostly wait for the file server
+    listing_workers = 16
+    # Files handed to a worker process at once
+    chunk_size = 32
+    # Paths per cache lookup query, below the SQLite variable limit
+    lookup_size = 500
+
+    def __init__(
+        self,
+        output_dir: str,
+        cache_path: str = default_cache_path,
+        max_workers: int | None = None,
+    ):
+        self.output_dir = output_dir
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.images = 0
+        self.cached = 0
+        self.extracted = 0
+        self.missing = 0
+        self._cache: sqlite3.Connection | None = None
+        self._file: TextIO | None = None
+        self._writer: Any = None
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        self._cache = sqlite3.connect(self.cache_path)
+        self._cache.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY,"
+            " mtime INTEGER, size INTEGER, width INTEGER, height INTEGER,"
+            " format TEXT, sha256 TEXT) WITHOUT ROWID"
+        )
+        self._file = open(
+            os.path.join(self.output_dir, metadata_file_name),
+            "w",
+            newline="",
+            encoding="utf-8",
+        )
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(metadata_header)
+        self._threads = ThreadPoolExecutor(
+            self.listing_workers, thread_name_prefix="image-metadata"
+        )
+        self._processes = ProcessPoolExecutor(self.max_workers)
+
+    def add(self, data: MatriculaData):
+        """Write the metadata of the images of a partition"""
+        if not data.images:
+            return
+        assert self._cache is not None and self._processes is not None
+        paths = [image.file_path for image in data.images]
+        stats = self.__stat(paths)
+        cached = self.__lookup(paths)
+        metadata: dict[str, ImageMetadata | None] = {}
+        changed = []
+        for file_path in set(paths):
+            stat = stats.get(file_path)
+            if stat is None:
+                metadata[file_path] = None
+                continue
+            entry = cached.get(file_path)
+            if entry is not None and entry[0] == stat:
+                metadata[file_path] = entry[1]
+            else:
+                changed.append((file_path, stat))
+        extracted = self._processes.map(
+            read_metadata, [p for p, _ in changed], chunksize=self.chunk_size
+        )
+        updates = []
+        for (file_path, (mtime, _)), result in zip(changed, extracted, strict=True):
+            metadata[file_path] = result
+            if result is not None:
+                updates.append((file_path, mtime, *result))
+        self._cache.executemany(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)", updates
+        )
+        self._cache.commit()
+        self.images += len(paths)
+        self.extracted += len(changed)
+        for image in data.images:
+            result = metadata[image.file_path]
+            if result is None:
+                self.missing += 1
+                self._writer.writerow([image.register, image.file_path])
+            else:
+                self._writer.writerow([image.register, image.file_path, *result])
+        self.cached = self.images - self.extracted - self.missing
+
+    def finish(self) -> dict[str, int]:
+        if self._threads is not None:
+            self._threads.shutdown()
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown()
+            self._processes = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        return {
+            "images": self.images,
+            "cached": self.cached,
+            "extracted": self.extracted,
+            "missing": self.missing,
+        }
+
+    def log_summary(self):
+        log.info(
+            f"Image metadata of {self.images} images: {self.cached} from the cache,"
+            f" {self.extracted} read, {self.missing} missing"
+        )
+
+    def __stat(self, paths: list[str]) -> dict[str, FileStat]:
+        """Stat the files by listing their directories, which is a single request
+        per directory on network shares"""
+        assert self._threads is not None
+        # The listings are only kept for the partition, the images of a register
+        # directory are extracted together
+        directories = list({os.path.dirname(p) for p in paths})
+        listings = dict(
+            zip(directories, self._threads.map(self.__list, directories), strict=True)
+        )
+        stats = {}
+        for file_path in paths:
+            directory, name = os.path.split(file_path)
+            stat = listings[directory].get(os.path.normcase(name))
+            if stat is not None:
+                stats[file_path] = stat
+        return stats
+
+    @staticmethod
+    def __list(directory: str) -> dict[str, FileStat]:
+        listing = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        listing[os.path.normcase(entry.name)] = (
+                            stat.st_mtime_ns,
+                            stat.st_size,
+                        )
+        except OSError:
+            pass
+        return listing
+
+    def __lookup(self, paths: list[str]) -> dict[str, tuple[FileStat, ImageMetadata]]:
+        assert self._cache is not None
+        unique = list(set(paths))
+        cached = {}
+        for i in range(0, len(unique), self.lookup_size):
+            chunk = unique[i : i + self.lookup_size]
+            placeholders = ", ".join("?" * len(chunk))
+            for file_path, mtime, size, *metadata in self._cache.execute(
+                f"SELECT * FROM metadata WHERE path IN ({placeholders})", chunk
+            ):
+                cached[file_path] = ((mtime, size), (size, *metadata))
+        return cached
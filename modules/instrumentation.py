@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any
+
+from modules.logger import Logger
+
+log = Logger()
+
+report_file_name = "conversion_report.json"
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.rows = 0
+        self.peak_memory = 0
+
+    def dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_time, 4),
+            "cpu_seconds": round(self.cpu_time, 4),
+            "rows": self.rows,
+            "rows_per_second": (
+                round(self.rows / self.wall_time) if self.wall_time > 0 else None
+            ),
+            "peak_memory_bytes": self.peak_memory or None,
+        }
+
+
+class StageRecord:
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.peak_memory = 0
+
+
+class Instrumentation:
+    """Collects wall time, CPU time, row counts and optionally the peak traced
+    memory of named conversion stages. Stages can be nested, the numbers of a
+    stage include the ones of the stages running inside of it. Stages can run
+    on several threads, they are nested per thread. The CPU time of a stage is
+    the one of its thread, the total CPU time the one of the whole process."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: dict[str, StageStats] = {}
+        self.metadata: dict[str, Any] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started: datetime | None = None
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+        self._wall_time = 0.0
+        self._cpu_time = 0.0
+        self._peak_memory = 0
+        self._owns_tracing = False
+
+    def start(self):
+        self._started = datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    def stop(self):
+        self._wall_time = time.perf_counter() - self._wall_start
+        self._cpu_time = time.process_time() - self._cpu_start
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._peak_memory = max(
+                self._peak_memory, tracemalloc.get_traced_memory()[1]
+            )
+            if self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+    @property
+    def _open(self) -> list[StageRecord]:
+        # The stages open on the current thread
+        records = getattr(self._local, "open", None)
+        if records is None:
+            records = []
+            self._local.open = records
+        return records
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[StageRecord]:
+        """Measure the enclosed block, rows can still be set on the yielded record"""
+        record = StageRecord(rows)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            self.__reset_peak()
+        self._open.append(record)
+        wall_start = time.perf_counter()
+        # A stage runs on one thread, other threads are not counted
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.thread_time() - cpu_start
+            self._open.pop()
+            if tracing:
+                record.peak_memory = max(
+                    record.peak_memory, tracemalloc.get_traced_memory()[1]
+                )
+                if self._open:
+                    parent = self._open[-1]
+                    parent.peak_memory = max(parent.peak_memory, record.peak_memory)
+                self._peak_memory = max(self._peak_memory, record.peak_memory)
+            with self._lock:
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = StageStats()
+                    self.stages[name] = stats
+                stats.calls += 1
+                stats.wall_time += wall_time
+                stats.cpu_time += cpu_time
+                stats.rows += record.rows
+                stats.peak_memory = max(stats.peak_memory, record.peak_memory)
+
+    def merge(self, stages: dict[str, StageStats]):
+        """Add the stages measured by another instrumentation, e.g. the one of a
+        worker process. Their times add up with the ones of this process."""
+        with self._lock:
+            for name, other in stages.items():
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = StageStats()
+                    self.stages[name] = stats
+                stats.calls += other.calls
+                stats.wall_time += other.wall_time
+                stats.cpu_time += other.cpu_time
+                stats.rows += other.rows
+                stats.peak_memory = max(stats.peak_memory, other.peak_memory)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            **self.metadata,
+            "started": (
+                self._started.isoformat(timespec="seconds") if self._started else None
+            ),
+            "wall_seconds": round(self._wall_time, 4),
+            "cpu_seconds": round(self._cpu_time, 4),
+            "peak_memory_bytes": self._peak_memory or None,
+            "stages": {name: stats.dict() for name, stats in self.stages.items()},
+        }
+
+    def write_report(self, output_dir: str) -> str:
+        report_path = os.path.join(output_dir, report_file_name)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        return report_path
+
+    def log_summary(self):
+        log.info(
+            f"Conversion took {self._wall_time:.2f} s wall time, "
+            f"{self._cpu_time:.2f} s CPU time"
+        )
+        if self._peak_memory:
+            log.info(f"Peak traced memory: {self._peak_memory / 2**20:.1f} MiB")
+        for name, stats in self.stages.items():
+            message = f"{name}: {stats.wall_time:.3f} s in {stats.calls} call(s)"
+            if stats.rows:
+                message += f", {stats.rows} rows"
+                if stats.wall_time > 0:
+                    message += f" ({stats.rows / stats.wall_time:,.0f} rows/s)"
+            if stats.peak_memory:
+                message += f", peak {stats.peak_memory / 2**20:.1f} MiB"
+            log.info(message)
+
+    def __reset_peak(self):
+        # The parent stages keep the peak reached so far before it is reset
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self._open:
+            record.peak_memory = max(record.peak_memory, peak)
+        self._peak_memory = max(self._peak_memory, peak)
+        tracemalloc.reset_peak()
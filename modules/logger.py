@@ -1,9 +1,8 @@
 # logger.py
 import logging
+import multiprocessing
+import os
 from datetime import datetime
-from typing import override
-
-from PySide6.QtCore import QObject, Signal
 
 
 class Logger:
@@ -11,13 +10,34 @@ class Logger:
 
     def __init__(self):
         if not self._logger.handlers:
+            if multiprocessing.parent_process() is not None:
+                # Worker processes do not write log files of their own
+                self._logger.addHandler(logging.NullHandler())
+                return
             self._logger.setLevel(logging.DEBUG)
-            file_handler = logging.FileHandler(
-                f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
-            )
-            formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-            file_handler.setFormatter(formatter)
-            self._logger.addHandler(file_handler)
+            self.__add_file_handler(".")
+
+    def set_log_dir(self, log_dir: str):
+        """Write the log file into log_dir instead of the working directory"""
+        for handler in list(self._logger.handlers):
+            if isinstance(handler, logging.FileHandler):
+                self._logger.removeHandler(handler)
+                handler.close()
+        os.makedirs(log_dir, exist_ok=True)
+        self.__add_file_handler(log_dir)
+
+    def __add_file_handler(self, log_dir: str):
+        # The file is only created with the first record, so that it can still
+        # be moved to another directory before
+        file_handler = logging.FileHandler(
+            os.path.join(
+                log_dir, f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+            ),
+            delay=True,
+        )
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        file_handler.setFormatter(formatter)
+        self._logger.addHandler(file_handler)
 
     def add_handler(self, handler: logging.Handler):
         self._logger.addHandler(handler)
@@ -33,18 +53,3 @@ class Logger:
 
     def error(self, message: str):
         self._logger.error(message)
-
-
-class LogEmitter(QObject):
-    log_signal = Signal(str)
-
-
-class SignalLogHandler(logging.Handler):
-    def __init__(self, emitter: LogEmitter):
-        super().__init__()
-        self.emitter = emitter
-
-    @override
-    def emit(self, record: logging.LogRecord):
-        message = self.format(record)
-        self.emitter.log_signal.emit(message)
@@ -0,0 +1,261 @@
+import csv
+import heapq
+import io
+import json
+import os
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import groupby
+from os import path
+from typing import Any
+
+from modules.convert import convert
+from modules.diff import Row, read_rows, row_key, row_size
+from modules.external_sort import default_memory_budget, external_sort
+from modules.logger import Logger
+from modules.processors.augias_processor import AugiasProcessor, ExtractionMode
+from modules.processors.registry import find_processor
+from modules.writers.compression import Compression, extensions, open_compressed
+from modules.writers.write import OutputVariant
+
+log = Logger()
+
+summary_file_name = "merge_summary.json"
+conflicts_header = ["source"]
+# Columns grouping the rows of a file, identifying a row within its group and
+# numbering the rows of a group. The rows of a group keep the order of their
+# input, rows of later inputs come after the ones of earlier inputs.
+merge_columns: dict[str, tuple[list[str], list[str], str | None]] = {
+    "parishes": ([], ["identifier"], None),
+    "registers": (["parish"], ["archival_identifier"], "ordering"),
+    "images": (["register"], ["file_path"], "order"),
+}
+
+
+class FileMerge:
+    """Counts the merged rows of one file and lists the conflicting rows. The
+    file of the conflicts is only written once there is a conflict."""
+
+    def __init__(
+        self,
+        name: str,
+        header: Row,
+        output_dir: str,
+        order_column: str | None,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        self.name = name
+        self.header = header
+        self.output_dir = output_dir
+        self.compression = compression
+        self.compression_level = compression_level
+        self.rows = 0
+        self.duplicates = 0
+        self.conflicts = 0
+        # Name of the written file of the conflicts, None without conflicts
+        self.conflicts_file: str | None = None
+        self._conflicts_output: io.TextIOWrapper | None = None
+        self._conflicts: Any = None
+        # Rows are numbered again when merged, so their numbers do not conflict
+        self._order_index = None if order_column is None else header.index(order_column)
+        # Ids of the kept rows of the current group listed as conflicting
+        self._listed: set[int] = set()
+
+    def keep(self):
+        self.rows += 1
+
+    def end_group(self):
+        self._listed.clear()
+
+    def compare(self, kept: tuple[str, Row], other: tuple[str, Row]):
+        if self.__values(kept[1]) == self.__values(other[1]):
+            self.duplicates += 1
+            return
+        self.conflicts += 1
+        conflicts = self._conflicts
+        if conflicts is None:
+            conflicts = self._conflicts = self.__open_conflicts()
+        if id(kept[1]) not in self._listed:
+            # The kept row is listed once before its conflicting rows
+            conflicts.writerow([kept[0], *kept[1]])
+            self._listed.add(id(kept[1]))
+        conflicts.writerow([other[0], *other[1]])
+
+    def __open_conflicts(self) -> Any:
+        file_name = f"{self.name}_conflicts.csv"
+        self._conflicts_output = io.TextIOWrapper(
+            open_compressed(
+                path.join(self.output_dir, file_name),
+                self.compression,
+                self.compression_level,
+            ),
+            encoding="utf-8",
+            newline="",
+        )
+        self.conflicts_file = file_name + extensions[self.compression]
+        conflicts = csv.writer(self._conflicts_output)
+        conflicts.writerow(conflicts_header + self.header)
+        return conflicts
+
+    def __values(self, row: Row) -> Row:
+        if self._order_index is None:
+            return row
+        return row[: self._order_index] + row[self._order_index + 1 :]
+
+    def close(self):
+        if self._conflicts_output is not None:
+            self._conflicts_output.close()
+            self._conflicts_output = None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "conflicts": self.conflicts,
+            "conflicts_file": self.conflicts_file,
+        }
+
+
+def merge_inputs(
+    input_files: list[str],
+    diocese_id: str,
+    output_dir: str,
+    mode: ExtractionMode = ExtractionMode.AUTO,
+    compression: Compression = Compression.NONE,
+    compression_level: int | None = None,
+    memory_budget: int = default_memory_budget,
+    max_workers: int | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Convert several databases of one diocese in parallel and merge their CSV
+    files into the output directory. Rows are matched by their key columns and
+    written once, rows with the same key but different values are conflicts and
+    the row of the earliest input is kept. The converted rows are sorted on disk
+    and merged as streams, so the memory used stays within the budget."""
+    if max_workers is None:
+        max_workers = min(len(input_files), os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source_dirs = [
+            path.join(temp_dir, f"source_{index}") for index in range(len(input_files))
+        ]
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = [
+                executor.submit(convert_input, input_file, diocese_id, source_dir, mode)
+                for input_file, source_dir in zip(input_files, source_dirs, strict=True)
+            ]
+            for input_file, future in zip(input_files, futures, strict=True):
+                future.result()
+                log.info(f"Converted {input_file}")
+        summary = {}
+        for name, (group_columns, key_columns, order_column) in merge_columns.items():
+            file_merge = _merge_file(
+                name,
+                group_columns,
+                key_columns,
+                order_column,
+                list(zip(input_files, source_dirs, strict=True)),
+                output_dir,
+                compression,
+                compression_level,
+                memory_budget,
+            )
+            summary[name] = file_merge.summary()
+            log.info(
+                f"{name}.csv: {file_merge.rows} rows, {file_merge.duplicates}"
+                f" duplicates, {file_merge.conflicts} conflicts"
+            )
+    with open(path.join(output_dir, summary_file_name), "w", encoding="utf-8") as f:
+        json.dump({"sources": input_files, **summary}, f, indent=2)
+    return summary
+
+
+def convert_input(
+    input_file: str, diocese_id: str, output_dir: str, mode: ExtractionMode
+) -> None:
+    """Convert one input to CSV, run in a worker process"""
+    os.makedirs(output_dir, exist_ok=True)
+    processor = find_processor(input_file, lambda _: None)
+    if processor is None:
+        raise ValueError(f"Unsupported file format: {input_file}")
+    if isinstance(processor, AugiasProcessor):
+        processor.mode = mode
+    convert(processor, diocese_id, OutputVariant.CSV, output_dir)
+
+
+def _merge_file(
+    name: str,
+    group_columns: list[str],
+    key_columns: list[str],
+    order_column: str | None,
+    sources: list[tuple[str, str]],
+    output_dir: str,
+    compression: Compression,
+    compression_level: int | None,
+    memory_budget: int,
+) -> FileMerge:
+    with ExitStack() as stack:
+        readers = [
+            stack.enter_context(read_rows(source_dir, name))
+            for _, source_dir in sources
+        ]
+        header = readers[0][0]
+        if any(other_header != header for other_header, _ in readers):
+            raise ValueError(f"The columns of {name}.csv differ between the inputs")
+        group_indices = [header.index(column) for column in group_columns]
+        key_indices = [header.index(column) for column in key_columns]
+        order_index = None if order_column is None else header.index(order_column)
+
+        def sort(source: str, rows: Iterator[Row]) -> Iterator[tuple[str, Row]]:
+            # The sort is stable, the rows of a group keep the order of the input.
+            # The budget is shared between the inputs.
+            for row in external_sort(
+                rows,
+                key=lambda row: row_key(row, group_indices),
+                memory_budget=memory_budget // len(sources),
+                size=row_size,
+            ):
+                yield source, row
+
+        # Rows of the same group come in the order of the inputs
+        merged = heapq.merge(
+            *(
+                sort(source, rows)
+                for (source, _), (_, rows) in zip(sources, readers, strict=True)
+            ),
+            key=lambda item: row_key(item[1], group_indices),
+        )
+        output = io.TextIOWrapper(
+            open_compressed(
+                path.join(output_dir, f"{name}.csv"), compression, compression_level
+            ),
+            encoding="utf-8",
+            newline="",
+        )
+        stack.enter_context(output)
+        writer = csv.writer(output)
+        writer.writerow(header)
+        file_merge = FileMerge(
+            name, header, output_dir, order_column, compression, compression_level
+        )
+        stack.callback(file_merge.close)
+        for _, group in groupby(
+            merged, key=lambda item: row_key(item[1], group_indices)
+        ):
+            # One parish or register at a time, all parishes at once
+            kept: dict[tuple[str, ...], tuple[str, Row]] = {}
+            for item in group:
+                key = row_key(item[1], key_indices)
+                first = kept.get(key)
+                if first is None:
+                    kept[key] = item
+                    file_merge.keep()
+                else:
+                    file_merge.compare(first, item)
+            file_merge.end_group()
+            for number, (_, row) in enumerate(kept.values(), 1):
+                if order_index is not None and row[order_index]:
+                    row[order_index] = str(number)
+                writer.writerow(row)
+    return file_merge
@@ -0,0 +1,55 @@
+from typing import Any
+
+
+class ReferenceKeys:
+    """Builds the serialized diocese, parish and register references once per key
+    so that all rows pointing to the same parent share a single string."""
+
+    def __init__(self, diocese_key: str):
+        self.diocese_key = diocese_key
+        self.diocese = f'["{diocese_key}"]'
+        self._parishes: dict[str, str] = {}
+        self._registers: dict[tuple[str, str], str] = {}
+
+    def parish(self, parish_key: str) -> str:
+        ref = self._parishes.get(parish_key)
+        if ref is None:
+            ref = f'["{self.diocese_key}", "{parish_key}", true]'
+            self._parishes[parish_key] = ref
+        return ref
+
+    def register(self, parish_key: str, register_key: str) -> str:
+        ref = self._registers.get((parish_key, register_key))
+        if ref is None:
+            ref = f'["{self.diocese_key}", "{parish_key}", true, "{register_key}"]'
+            self._registers[(parish_key, register_key)] = ref
+        return ref
+
+
+class DioceseKeys:
+    """Hands out the ReferenceKeys of the diocese a parish belongs to, for
+    databases holding the parishes of several dioceses"""
+
+    def __init__(self, diocese_key: str, parish_dioceses: dict[Any, str] | None = None):
+        self.diocese_key = diocese_key
+        self.parish_dioceses = parish_dioceses or {}
+        self._keys: dict[str, ReferenceKeys] = {}
+
+    def for_parish(self, parish_id: Any) -> ReferenceKeys:
+        """Parishes missing from the mapping belong to the default diocese"""
+        diocese_key = self.parish_dioceses.get(parish_id, self.diocese_key)
+        keys = self._keys.get(diocese_key)
+        if keys is None:
+            keys = ReferenceKeys(diocese_key)
+            self._keys[diocese_key] = keys
+        return keys
+
+
+def parish_reference(diocese_ref: str, parish_key: str) -> str:
+    """Build the reference of a parish from the reference of its diocese"""
+    return f'{diocese_ref[:-1]}, "{parish_key}", true]'
+
+
+def register_reference(parish_ref: str, register_key: str) -> str:
+    """Build the reference of a register from the reference of its parish"""
+    return f'{parish_ref[:-1]}, "{register_key}"]'
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from modules.logger import Logger
+
+log = Logger()
+
+# Items a stage can produce ahead of the stage consuming them
+default_queue_size = 4
+# Interval in which a blocked stage checks whether the pipeline was stopped
+poll_interval = 0.1
+# Time stop waits for every thread to finish the item it is producing
+join_timeout = 30.0
+
+
+class StageUtilization:
+    def __init__(self):
+        self.items = 0
+        self.busy_time = 0.0
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+
+    def dict(self, wall_time: float) -> dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_time, 4),
+            "waiting_for_input_seconds": round(self.input_wait, 4),
+            "waiting_for_output_seconds": round(self.output_wait, 4),
+            "utilization": (
+                round(self.busy_time / wall_time, 3) if wall_time > 0 else None
+            ),
+        }
+
+
+class _End:
+    pass
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class Pipeline:
+    """Runs the stages of the conversion on separate threads connected by bounded
+    queues. A full queue blocks the stage producing into it, so a slow stage
+    holds back the stages before it and the memory stays flat.
+
+    The time of every stage is split into busy, waiting for input from the stage
+    before it and waiting for space in the queue of the stage after it. The
+    stage with the highest utilization is the bottleneck."""
+
+    def __init__(self, queue_size: int = default_queue_size):
+        self.queue_size = queue_size
+        self.stages: dict[str, StageUtilization] = {}
+        self._local = threading.local()
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._wall_start = 0.0
+        self._wall_time = 0.0
+
+    def start(self):
+        self._wall_start = time.perf_counter()
+
+    def stop(self):
+        """Stop the threads that are still producing and wait for them, so they
+        no longer use the connection or the writers once stop returns"""
+        self._stopped.set()
+        self._wall_time = time.perf_counter() - self._wall_start
+        deadline = time.monotonic() + join_timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+            if thread.is_alive():
+                log.warn(f"The thread {thread.name} did not stop in time")
+        self._threads = []
+
+    def threaded[T](self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Produce the items on a new thread as the stage of the given name, up to
+        the queue size ahead of the consuming stage. Errors of the producing stage
+        are raised in the consuming one."""
+        stats = self.__stats(name)
+        channel: queue.Queue[Any] = queue.Queue(self.queue_size)
+
+        def produce():
+            self._local.stage = stats
+            try:
+                for item in self.__measure(stats, items):
+                    start = time.perf_counter()
+                    if not self.__put(channel, item):
+                        return
+                    stats.output_wait += time.perf_counter() - start
+                self.__put(channel, _End())
+            except BaseException as e:
+                self.__put(channel, _Failure(e))
+
+        thread = threading.Thread(target=produce, name=f"pipeline {name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        while True:
+            start = time.perf_counter()
+            item = self.__get(channel)
+            consumer = getattr(self._local, "stage", None)
+            if consumer is not None:
+                consumer.input_wait += time.perf_counter() - start
+            if item is None or isinstance(item, _End):
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def consume[T](self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Measure the stage of the given name consuming the items on the current
+        thread, it is busy between taking one item and the next"""
+        stats = self.__stats(name)
+        self._local.stage = stats
+        try:
+            for item in items:
+                stats.items += 1
+                start = time.perf_counter()
+                yield item
+                stats.busy_time += time.perf_counter() - start
+        finally:
+            self._local.stage = None
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        return {
+            name: stats.dict(self._wall_time) for name, stats in self.stages.items()
+        }
+
+    def log_summary(self):
+        if not self.stages or self._wall_time <= 0:
+            return
+        for name, stats in self.stages.items():
+            log.info(
+                f"Pipeline stage {name}: {stats.busy_time / self._wall_time:.0%} busy, "
+                f"{stats.input_wait:.2f} s waiting for input, "
+                f"{stats.output_wait:.2f} s waiting for output"
+            )
+        name, stats = max(self.stages.items(), key=lambda item: item[1].busy_time)
+        log.info(f"Pipeline bottleneck: {name}")
+
+    def __stats(self, name: str) -> StageUtilization:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = StageUtilization()
+            self.stages[name] = stats
+        return stats
+
+    def __measure[T](self, stats: StageUtilization, items: Iterable[T]) -> Iterator[T]:
+        # Time spent producing an item, without the time waiting for input
+        iterator = iter(items)
+        while not self._stopped.is_set():
+            start = time.perf_counter()
+            input_wait = stats.input_wait
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                stats.busy_time += (
+                    time.perf_counter() - start - (stats.input_wait - input_wait)
+                )
+            stats.items += 1
+            yield item
+
+    def __get(self, channel: queue.Queue[Any]) -> Any:
+        # None once the pipeline is stopped, so no consumer waits forever
+        while not self._stopped.is_set():
+            try:
+                return channel.get(timeout=poll_interval)
+            except queue.Empty:
+                continue
+        return None
+
+    def __put(self, channel: queue.Queue[Any], item: Any) -> bool:
+        while not self._stopped.is_set():
+            try:
+                channel.put(item, timeout=poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
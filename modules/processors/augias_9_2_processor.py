@@ -15,6 +15,8 @@ log = Logger()
 @final
 class Augias92Processor(AugiasProcessor):
     name = "Augias 9.2"
+    # Exported as Access 2000 databases
+    jet_versions = [1]
 
     @override
     def _get_key_map(self) -> KeyMap:
@@ -1,24 +1,54 @@
+import math
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Generator, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import asdict, dataclass
-from typing import final, override
-
-import pandas as pd
+from enum import Enum
+from importlib.util import find_spec
+from itertools import chain
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, final, override
 
+from modules.external_sort import default_memory_budget, external_sort, item_size
+from modules.instrumentation import Instrumentation, StageStats
 from modules.logger import Logger
 from modules.models.image import Image
 from modules.models.matricula_data import MatriculaData
 from modules.models.parish import Parish
 from modules.models.percent import Percent
+from modules.models.reference_keys import DioceseKeys, ReferenceKeys
 from modules.models.register import Register
 from modules.processors.base_processor import ProgressCallback
-from modules.processors.mdb_processor import MDBProcessor
+from modules.processors.mdb_processor import ConnectionFactory, MDBProcessor
+from modules.profiling import ProfileMode, Profiler
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 log = Logger()
-version_table_name = "DB_VERSION"
-version_col_name = "VERSION"
-parish_table_name = "M_BESTAENDE"
-register_table_name = "M_OBJEKTE1"
-register_table_imgs = "M_BILDER"
+
+# Slices of parishes per worker process, so that the work stays balanced when
+# parishes differ in size
+slices_per_worker = 4
+# Attributes of the registers and images passed between processes
+encoded_register_fields = [
+    "augias_id",
+    "identifier",
+    "title",
+    "register_type",
+    "description",
+    "comment",
+    "archival_identifier",
+    "storage_location",
+    "microfilm_identifier",
+    "date_range",
+    "date_start",
+    "date_end",
+    "image_dir_path",
+    "ordering",
+]
+encoded_image_fields = ["augias_id", "file_path", "label", "file_name", "order"]
 
 
 @dataclass
@@ -80,14 +110,49 @@ class KeyMap:
     image_cols: ImageColumns
 
 
+class ExtractionMode(Enum):
+    AUTO = 0  # Choose based on the table row counts
+    TABLES = 1  # Load all tables at once
+    PARTITIONED = 2  # Load registers and images one parish at a time
+    JOINED = 3  # Stream a single ordered parish/register/image join
+    LITE = 4  # Load all tables as plain tuples, does not require pandas
+
+
 class AugiasProcessor(MDBProcessor, ABC):
     increment = 1.0
+    # Number of images above which AUTO switches to partitioned extraction
+    partition_threshold = 500_000
+    # Registers and images per partition of the tables extraction
+    partition_rows = 100_000
+    hot_paths = [
+        *MDBProcessor.hot_paths,
+        "_AugiasProcessor__parish_from_row",
+        "_AugiasProcessor__register_from_row",
+        "_AugiasProcessor__image_from_row",
+        "_AugiasProcessor__coord_to_point",
+        "_AugiasProcessor__wrap_in_p",
+        "_AugiasProcessor__format_date",
+        "_AugiasProcessor__extract_types",
+    ]
 
     @override
-    def __init__(self, input_file: str, on_progress: ProgressCallback):
-        super().__init__(input_file, on_progress)
+    def __init__(
+        self,
+        input_file: str,
+        on_progress: ProgressCallback,
+        mode: ExtractionMode = ExtractionMode.AUTO,
+        connection_factory: ConnectionFactory | None = None,
+        memory_budget: int = default_memory_budget,
+        workers: int = 1,
+    ):
+        super().__init__(input_file, on_progress, connection_factory)
         self.key_map = self._get_key_map()
         self.progress = Percent()
+        self.mode = mode
+        # Memory for sorting the images of the lite extraction before spilling
+        self.memory_budget = memory_budget
+        # Processes transforming the parishes of the tables extraction
+        self.workers = workers
 
     @abstractmethod
     def _get_key_map(self) -> KeyMap:
@@ -96,14 +161,14 @@ class AugiasProcessor(MDBProcessor, ABC):
     @final
     @override
     def can_process(self) -> bool:
-        table = self._get_table(self.key_map.version_table_name)
-        if table is None or table.empty:
-            return False
-        version_column = table[self.key_map.version_col_name]
-        if version_column.empty:
+        rows = self._get_rows(
+            self.key_map.version_table_name, [self.key_map.version_col_name]
+        )
+        if not rows:
             return False
-        if version_column.isin(self.key_map.valid_versions).any():
-            version = version_column.iloc[-1].item()
+        versions = [row[0] for row in rows]
+        if any(version in self.key_map.valid_versions for version in versions):
+            version = versions[-1]
             log.info(self.key_map.correct_version_message)
             log.debug(f"Augias db version: {version}")
             return True
@@ -112,59 +177,657 @@ class AugiasProcessor(MDBProcessor, ABC):
     @final
     @override
     def try_process(self, diocese_id: str) -> None | MatriculaData:
+        tables = self.__read_tables(diocese_id)
+        if tables is None:
+            return None
+        data = MatriculaData(parishes=[], registers=[], images=[])
+        for partition in self.__iter_table_partitions(diocese_id, *tables):
+            data.parishes.extend(partition.parishes)
+            data.registers.extend(partition.registers)
+            data.images.extend(partition.images)
+        return data
+
+    def __read_tables(
+        self, diocese_id: str
+    ) -> "tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame] | None":
         log.info(f"Processing data for diocese: {diocese_id}")
-        log.info(f"Reading parishes in {parish_table_name}")
-        parishes_df = self._get_table(parish_table_name)
-        log.info(f"Read {len(parishes_df)} parishes")
+        key_map = self.key_map
+        tables = self.__table_columns()
+        self._prefetch_tables(tables)
+        log.info(f"Reading parishes in {key_map.parish_table_name}")
+        parishes_df = self._get_table(
+            key_map.parish_table_name, tables[key_map.parish_table_name]
+        )
         self._percent.value = 2
-        log.info(f"Reading registers in {register_table_name}")
-        registers_df = self._get_table(register_table_name)
-        log.info(f"Read {len(registers_df)} registers")
+        log.info(f"Reading registers in {key_map.register_table_name}")
+        registers_df = self._get_table(
+            key_map.register_table_name, tables[key_map.register_table_name]
+        )
         self._percent.value = 5
-        log.info(f"Reading images in {register_table_imgs}")
-        imgs_df = self._get_table(register_table_imgs)
-        log.info(f"Read {len(imgs_df)} images")
+        log.info(f"Reading images in {key_map.imgs_table_name}")
+        imgs_df = self._get_table(
+            key_map.imgs_table_name, tables[key_map.imgs_table_name]
+        )
         self._percent.value = 20
         if parishes_df is None or registers_df is None or imgs_df is None:
             log.error("Could not extract relevant tables from MDB file")
             return None
-        self._percent.set_steps(len(registers_df))
+        log.info(f"Read {len(parishes_df)} parishes")
+        log.info(f"Read {len(registers_df)} registers")
+        log.info(f"Read {len(imgs_df)} images")
+        return parishes_df, registers_df, imgs_df
 
-        parishes = self.__extract_parishes(parishes_df, diocese_id)
-        registers: list[Register] = []
-        images: list[Image] = []
+    def __iter_table_partitions(
+        self,
+        diocese_id: str,
+        parishes_df: "pd.DataFrame",
+        registers_df: "pd.DataFrame",
+        imgs_df: "pd.DataFrame",
+    ) -> Iterator[MatriculaData]:
+        """Join the read tables into partitions of whole parishes with about
+        partition_rows registers and images, so that a pipeline writes the
+        first partitions while the next ones are joined"""
+        self._percent.set_steps(max(len(registers_df), 1))
+        dioceses = DioceseKeys(diocese_id, self.parish_dioceses)
+        with self.instrumentation.stage("extract parishes", len(parishes_df)):
+            parishes = self.__extract_parishes(parishes_df, dioceses)
+
+        transformed: Generator[tuple[list[Register], list[Image]], None, None]
+        if self.workers > 1 and len(parishes) > 1:
+            transformed = self.__transform_in_workers(
+                parishes, registers_df, imgs_df, dioceses
+            )
+        else:
+            transformed = (
+                self.__transform_parish(
+                    parish,
+                    registers_df,
+                    imgs_df,
+                    dioceses.for_parish(parish.augias_id),
+                )
+                for parish in parishes
+            )
+        partition = MatriculaData(parishes=[], registers=[], images=[])
+        try:
+            for parish in parishes:
+                # Only the joining is timed, not the writing of the partitions
+                with self.instrumentation.stage("join hierarchy"):
+                    parish_registers, parish_images = next(transformed)
+                partition.parishes.append(parish)
+                partition.registers.extend(parish_registers)
+                partition.images.extend(parish_images)
+                rows = len(partition.registers) + len(partition.images)
+                if rows >= self.partition_rows:
+                    yield partition
+                    partition = MatriculaData(parishes=[], registers=[], images=[])
+        finally:
+            # Shuts the worker processes down
+            transformed.close()
+        if partition.parishes:
+            yield partition
+
+    @final
+    @override
+    def iter_partitions(self, diocese_id: str) -> Iterator[MatriculaData]:
+        mode = self.__resolve_mode()
+        self.instrumentation.metadata["extraction_mode"] = mode.name
+        if self.workers > 1 and mode != ExtractionMode.TABLES:
+            log.warn(
+                f"The {mode.name.lower()} extraction runs in a single process, "
+                f"workers = {self.workers} has no effect"
+            )
+        if mode == ExtractionMode.PARTITIONED:
+            yield from self.__iter_parish_partitions(diocese_id)
+        elif mode == ExtractionMode.JOINED:
+            yield from self.__iter_joined_partitions(diocese_id)
+        elif mode == ExtractionMode.LITE:
+            yield from self.__iter_lite_partitions(diocese_id)
+        else:
+            tables = self.__read_tables(diocese_id)
+            if tables is None:
+                raise ValueError("Could not extract data from the input file")
+            yield from self.__iter_table_partitions(diocese_id, *tables)
+
+    @final
+    def compare_modes(
+        self, diocese_id: str, reference: ExtractionMode, candidate: ExtractionMode
+    ) -> list[str]:
+        """Extract the data with two modes and list where their output differs"""
+        mode = self.mode
+        outputs: list[dict[str, list[tuple[str, ...]]]] = []
+        try:
+            for compared_mode in (reference, candidate):
+                self.mode = compared_mode
+                rows: dict[str, list[tuple[str, ...]]] = {
+                    "parishes": [],
+                    "registers": [],
+                    "images": [],
+                }
+                for data in self.iter_partitions(diocese_id):
+                    rows["parishes"].extend(map(self.__row_values, data.parishes))
+                    rows["registers"].extend(map(self.__row_values, data.registers))
+                    rows["images"].extend(map(self.__row_values, data.images))
+                outputs.append(rows)
+        finally:
+            self.mode = mode
+        differences: list[str] = []
+        for kind, reference_rows in outputs[0].items():
+            candidate_rows = outputs[1][kind]
+            if len(reference_rows) != len(candidate_rows):
+                differences.append(
+                    f"{kind}: {len(reference_rows)} rows in {reference.name}, "
+                    f"{len(candidate_rows)} rows in {candidate.name}"
+                )
+            for index, (a, b) in enumerate(zip(reference_rows, candidate_rows), 1):
+                if a != b:
+                    differences.append(f"{kind} row {index}: {a} != {b}")
+        return differences
 
+    def __row_values(self, row: Parish | Register | Image) -> tuple[str, ...]:
+        return tuple(str(value) for value in vars(row).values())
+
+    def __iter_parish_partitions(self, diocese_id: str) -> Iterator[MatriculaData]:
+        log.info(f"Processing data for diocese: {diocese_id} (partitioned)")
+        key_map = self.key_map
+        log.info(f"Reading parishes in {key_map.parish_table_name}")
+        parishes_df = self._get_table(key_map.parish_table_name)
+        if parishes_df is None:
+            raise ValueError("Could not extract relevant tables from MDB file")
+        log.info(f"Read {len(parishes_df)} parishes")
+        register_count = self._count_rows(key_map.register_table_name)
+        self._percent.value = 5
+        self._percent.set_steps(max(register_count or 0, 1))
+
+        registers_query = (
+            f"SELECT * FROM [{key_map.register_table_name}] "
+            f"WHERE [{key_map.register_parent_col}] = ?"
+        )
+        imgs_query = (
+            f"SELECT i.* FROM [{key_map.imgs_table_name}] AS i "
+            f"INNER JOIN [{key_map.register_table_name}] AS r "
+            f"ON i.[{key_map.img_parent_col}] = r.[{key_map.register_cols.identifier}] "
+            f"WHERE r.[{key_map.register_parent_col}] = ?"
+        )
+        dioceses = DioceseKeys(diocese_id, self.parish_dioceses)
+        with self.instrumentation.stage("extract parishes", len(parishes_df)):
+            parishes = self.__extract_parishes(parishes_df, dioceses)
         for parish in parishes:
-            log.info(f"Transforming registers for parish: {parish.title}")
-            parish_registers_df = registers_df[
-                registers_df[self.key_map.register_parent_col] == parish.augias_id
-            ]
-            parish_registers = self.__extract_registers(
-                parish_registers_df, diocese_id, parish.identifier
+            with self.instrumentation.stage("read parish registers") as stage:
+                registers_df = self._query(registers_query, (parish.augias_id,))
+                stage.rows = 0 if registers_df is None else len(registers_df)
+            with self.instrumentation.stage("read parish images") as stage:
+                imgs_df = self._query(imgs_query, (parish.augias_id,))
+                stage.rows = 0 if imgs_df is None else len(imgs_df)
+            if registers_df is None or imgs_df is None:
+                raise ValueError(
+                    f"Could not read registers or images for parish: {parish.title}"
+                )
+            with self.instrumentation.stage("join hierarchy"):
+                parish_registers, parish_images = self.__transform_parish(
+                    parish,
+                    registers_df,
+                    imgs_df,
+                    dioceses.for_parish(parish.augias_id),
+                )
+            yield MatriculaData(
+                parishes=[parish], registers=parish_registers, images=parish_images
             )
-            registers.extend(parish_registers)
-            for register in parish_registers:
+
+    def __iter_joined_partitions(self, diocese_id: str) -> Iterator[MatriculaData]:
+        log.info(f"Processing data for diocese: {diocese_id} (joined)")
+        key_map = self.key_map
+        parish_fields = list(asdict(key_map.parish_cols))
+        register_fields = list(asdict(key_map.register_cols))
+        image_fields = list(asdict(key_map.image_cols))
+        register_start = len(parish_fields)
+        image_start = register_start + len(register_fields)
+        parish_id_index = parish_fields.index("augias_id")
+        register_id_index = register_start + register_fields.index("identifier")
+        image_id_index = image_start + image_fields.index("augias_id")
+
+        register_count = self._count_rows(key_map.register_table_name)
+        self._percent.value = 5
+        self._percent.set_steps(max(register_count or 0, 1))
+
+        dioceses = DioceseKeys(diocese_id, self.parish_dioceses)
+        refs = dioceses.for_parish(None)
+        parish: Parish | None = None
+        register: Register | None = None
+        parish_ref = register_ref = ""
+        registers: list[Register] = []
+        images: list[Image] = []
+        for row in self._stream(self.__joined_query()):
+            if parish is None or parish.augias_id != row[parish_id_index]:
+                if parish is not None:
+                    yield MatriculaData(
+                        parishes=[parish], registers=registers, images=images
+                    )
+                refs = dioceses.for_parish(row[parish_id_index])
+                parish = self.__parish_from_row(
+                    dict(zip(parish_fields, row[:register_start])), refs
+                )
+                parish_ref = refs.parish(parish.identifier)
+                log.info(f"Transforming registers for parish: {parish.title}")
+                register = None
+                registers = []
+                images = []
+            if row[register_id_index] is None:
+                continue
+            if register is None or register.augias_id != row[register_id_index]:
+                register = self.__register_from_row(
+                    dict(zip(register_fields, row[register_start:image_start])),
+                    parish_ref,
+                    len(registers) + 1,
+                )
+                register_ref = refs.register(
+                    parish.identifier, register.archival_identifier
+                )
                 log.info(f"Transforming images for register: {register.title}")
-                register_imgs_df = imgs_df[
-                    imgs_df[self.key_map.img_parent_col] == register.augias_id
+                registers.append(register)
+                self._percent.increment()
+            if row[image_id_index] is None:
+                continue
+            image = self.__image_from_row(
+                dict(zip(image_fields, row[image_start:])), parish_ref, register_ref
+            )
+            if register.image_dir_path is None:
+                register.image_dir_path = image.file_path.replace(image.file_name, "")
+            images.append(image)
+        if parish is not None:
+            yield MatriculaData(parishes=[parish], registers=registers, images=images)
+
+    def __iter_lite_partitions(self, diocese_id: str) -> Iterator[MatriculaData]:
+        log.info(f"Processing data for diocese: {diocese_id} (lite)")
+        key_map = self.key_map
+        parish_fields = list(asdict(key_map.parish_cols))
+        register_fields = list(asdict(key_map.register_cols))
+        image_fields = list(asdict(key_map.image_cols))
+        parish_columns = list(asdict(key_map.parish_cols).values())
+        register_columns = list(asdict(key_map.register_cols).values())
+
+        # The images are streamed and sorted after the parishes and registers
+        self._prefetch_tables(
+            {
+                key_map.parish_table_name: parish_columns,
+                key_map.register_table_name: [
+                    key_map.register_parent_col,
+                    *register_columns,
+                ],
+            }
+        )
+        log.info(f"Reading parishes in {key_map.parish_table_name}")
+        parish_rows = self._get_rows(key_map.parish_table_name, parish_columns)
+        self._percent.value = 2
+        log.info(f"Reading registers in {key_map.register_table_name}")
+        register_groups = self.__get_grouped_rows(
+            key_map.register_table_name,
+            key_map.register_parent_col,
+            register_columns,
+            register_fields.index("identifier"),
+        )
+        self._percent.value = 5
+        if parish_rows is None or register_groups is None:
+            raise ValueError("Could not extract relevant tables from MDB file")
+        parish_id_index = parish_fields.index("augias_id")
+        register_id_index = register_fields.index("identifier")
+        parish_rows.sort(key=itemgetter(parish_id_index))
+        # Position of every register in the output, the images are sorted into
+        # the same order so that they are read in a single pass
+        register_positions = {
+            register_row[register_id_index]: position
+            for position, register_row in enumerate(
+                register_row
+                for parish_row in parish_rows
+                for register_row in register_groups.get(parish_row[parish_id_index], [])
+            )
+        }
+        log.info(f"Reading images in {key_map.imgs_table_name}")
+        image_count, image_rows = self.__sort_image_rows(register_positions)
+        self._percent.value = 20
+        register_count = sum(len(rows) for rows in register_groups.values())
+        log.info(f"Read {len(parish_rows)} parishes")
+        log.info(f"Read {register_count} registers")
+        log.info(f"Read {image_count} images")
+        self._percent.set_steps(max(register_count, 1))
+
+        dioceses = DioceseKeys(diocese_id, self.parish_dioceses)
+        position = 0
+        image_row = next(image_rows, None)
+        for parish_row in parish_rows:
+            with self.instrumentation.stage("join hierarchy"):
+                refs = dioceses.for_parish(parish_row[parish_id_index])
+                parish = self.__parish_from_row(
+                    dict(zip(parish_fields, parish_row)), refs
+                )
+                parish_ref = refs.parish(parish.identifier)
+                log.info(f"Transforming registers for parish: {parish.title}")
+                registers: list[Register] = []
+                images: list[Image] = []
+                for register_row in register_groups.get(parish.augias_id, []):
+                    register = self.__register_from_row(
+                        dict(zip(register_fields, register_row)),
+                        parish_ref,
+                        len(registers) + 1,
+                    )
+                    register_ref = refs.register(
+                        parish.identifier, register.archival_identifier
+                    )
+                    log.info(f"Transforming images for register: {register.title}")
+                    while image_row is not None and image_row[0] == position:
+                        image = self.__image_from_row(
+                            dict(zip(image_fields, image_row[1])),
+                            parish_ref,
+                            register_ref,
+                        )
+                        if register.image_dir_path is None:
+                            register.image_dir_path = image.file_path.replace(
+                                image.file_name, ""
+                            )
+                        images.append(image)
+                        image_row = next(image_rows, None)
+                    position += 1
+                    registers.append(register)
+                    self._percent.increment()
+            yield MatriculaData(parishes=[parish], registers=registers, images=images)
+
+    def __sort_image_rows(
+        self, register_positions: dict[Any, int]
+    ) -> tuple[int, Iterator[tuple[int, tuple[Any, ...]]]]:
+        """Read the images and sort them by the position of their register and
+        their id, spilling to disk beyond the memory budget. Returns the number
+        of images read and the sorted images with the position of the register."""
+        key_map = self.key_map
+        columns = [key_map.img_parent_col, *asdict(key_map.image_cols).values()]
+        image_id_index = list(asdict(key_map.image_cols)).index("augias_id")
+        count = 0
+
+        def positioned_rows() -> Iterator[tuple[int, tuple[Any, ...]]]:
+            nonlocal count
+            for row in self._stream_table(key_map.imgs_table_name, columns):
+                count += 1
+                # Images of registers that are not extracted are left out
+                position = register_positions.get(row[0])
+                if position is not None:
+                    yield position, tuple(row[1:])
+
+        def positioned_batch_rows() -> Iterator[tuple[int, tuple[Any, ...]]]:
+            # The registers of the images are looked up and filtered a column
+            # at a time, only the extracted images become rows
+            import pyarrow as pa
+            import pyarrow.compute as pc
+
+            nonlocal count
+            # The generated compute functions are unknown to the type checker
+            index_in = pc.index_in  # pyright: ignore[reportAttributeAccessIssue]
+            is_valid = pc.is_valid  # pyright: ignore[reportAttributeAccessIssue]
+            register_ids = pa.array(list(register_positions))
+            positions = pa.array(list(register_positions.values()), pa.int64())
+            for batch in self._stream_table_batches(key_map.imgs_table_name, columns):
+                count += batch.num_rows
+                if not register_positions:
+                    continue
+                batch_positions = pc.take(
+                    positions, index_in(batch.column(0), value_set=register_ids)
+                )
+                extracted = is_valid(batch_positions)
+                values = [
+                    column.to_pylist() for column in batch.filter(extracted).columns
                 ]
+                yield from zip(
+                    batch_positions.filter(extracted).to_pylist(), zip(*values[1:])
+                )
+
+        def sort(
+            rows: Iterator[tuple[int, tuple[Any, ...]]],
+        ) -> tuple[Iterator[tuple[int, tuple[Any, ...]]], Any]:
+            sorted_rows = external_sort(
+                rows,
+                key=lambda row: (row[0], row[1][image_id_index]),
+                memory_budget=self.memory_budget,
+                size=item_size,
+            )
+            # The images are all read and sorted once the first one is taken
+            return sorted_rows, next(sorted_rows, None)
+
+        with self.instrumentation.stage("sort images") as stage:
+            if find_spec("pyarrow") is None:
+                rows, first = sort(positioned_rows())
+            else:
+                import pyarrow as pa
+
+                try:
+                    rows, first = sort(positioned_batch_rows())
+                except pa.ArrowException as e:
+                    log.debug(f"Reading the images as rows instead of columns: {e}")
+                    count = 0
+                    rows, first = sort(positioned_rows())
+            stage.rows = count
+        if first is None:
+            return count, iter(())
+        return count, chain([first], rows)
+
+    def __get_grouped_rows(
+        self, table: str, parent_col: str, columns: list[str], sort_index: int
+    ) -> dict[Any, list[tuple[Any, ...]]] | None:
+        rows = self._get_rows(table, [parent_col, *columns])
+        if rows is None:
+            return None
+        groups: defaultdict[Any, list[tuple[Any, ...]]] = defaultdict(list)
+        for row in rows:
+            groups[row[0]].append(tuple(row[1:]))
+        for group in groups.values():
+            group.sort(key=itemgetter(sort_index))
+        return groups
+
+    def __joined_query(self) -> str:
+        key_map = self.key_map
+        columns = (
+            [f"p.[{c}]" for c in asdict(key_map.parish_cols).values()]
+            + [f"r.[{c}]" for c in asdict(key_map.register_cols).values()]
+            + [f"i.[{c}]" for c in asdict(key_map.image_cols).values()]
+        )
+        # Jet SQL requires nested joins to be parenthesized
+        return (
+            f"SELECT {', '.join(columns)} "
+            f"FROM ([{key_map.parish_table_name}] AS p "
+            f"LEFT JOIN [{key_map.register_table_name}] AS r "
+            f"ON r.[{key_map.register_parent_col}] = p.[{key_map.parish_cols.augias_id}]) "
+            f"LEFT JOIN [{key_map.imgs_table_name}] AS i "
+            f"ON i.[{key_map.img_parent_col}] = r.[{key_map.register_cols.identifier}] "
+            f"ORDER BY p.[{key_map.parish_cols.augias_id}], "
+            f"r.[{key_map.register_cols.identifier}], "
+            f"i.[{key_map.image_cols.augias_id}]"
+        )
+
+    def __table_columns(self) -> dict[str, list[str]]:
+        # The columns of the key map and the ones joining the tables
+        key_map = self.key_map
+        return {
+            key_map.parish_table_name: list(key_map.parish_cols.dict()),
+            key_map.register_table_name: list(
+                dict.fromkeys(
+                    [key_map.register_parent_col, *key_map.register_cols.dict()]
+                )
+            ),
+            key_map.imgs_table_name: list(
+                dict.fromkeys([key_map.img_parent_col, *key_map.image_cols.dict()])
+            ),
+        }
+
+    def __resolve_mode(self) -> ExtractionMode:
+        if (
+            self.mode in (ExtractionMode.PARTITIONED, ExtractionMode.JOINED)
+            and not self.supports_queries
+        ):
+            log.warn(
+                f"The {self.mode.name.lower()} extraction needs SQL queries, "
+                "which are not available without an ODBC driver"
+            )
+        elif self.mode != ExtractionMode.AUTO:
+            return self.mode
+        if find_spec("pandas") is None:
+            log.info("pandas is not available, using the lite extraction")
+            return ExtractionMode.LITE
+        img_count = self._count_rows(self.key_map.imgs_table_name)
+        if img_count is not None and img_count > self.partition_threshold:
+            log.info(f"{img_count} images found, extracting parishes one by one")
+            return ExtractionMode.PARTITIONED
+        return ExtractionMode.TABLES
+
+    def __transform_in_workers(
+        self,
+        parishes: list[Parish],
+        registers_df: "pd.DataFrame",
+        imgs_df: "pd.DataFrame",
+        dioceses: DioceseKeys,
+    ) -> Generator[tuple[list[Register], list[Image]], None, None]:
+        """Transform slices of the parishes in worker processes and yield the
+        registers and images of every parish in the order of the parishes"""
+        key_map = self.key_map
+        slice_size = math.ceil(len(parishes) / (self.workers * slices_per_worker))
+        slices = [
+            parishes[i : i + slice_size] for i in range(0, len(parishes), slice_size)
+        ]
+
+        def tasks() -> Iterator[tuple[Any, ...]]:
+            for parish_slice in slices:
+                slice_registers_df = registers_df[
+                    registers_df[key_map.register_parent_col].isin(
+                        [parish.augias_id for parish in parish_slice]
+                    )
+                ]
+                slice_imgs_df = imgs_df[
+                    imgs_df[key_map.img_parent_col].isin(
+                        slice_registers_df[key_map.register_cols.identifier]
+                    )
+                ]
+                yield (
+                    type(self),
+                    [
+                        (parish, dioceses.for_parish(parish.augias_id).diocese_key)
+                        for parish in parish_slice
+                    ],
+                    slice_registers_df,
+                    slice_imgs_df,
+                    self.profiler is not None,
+                )
+
+        log.info(f"Transforming {len(parishes)} parishes in {self.workers} processes")
+        with ProcessPoolExecutor(self.workers) as executor:
+            results = executor.map(_transform_parish_slice, tasks())
+            for parish_slice, (encoded_slice, stages, counters) in zip(
+                slices, results, strict=True
+            ):
+                # The stages and calls of the worker are added to the ones here
+                self.instrumentation.merge(stages)
+                if self.profiler is not None:
+                    self.profiler.counters.update(counters)
+                for parish, (encoded_registers, encoded_images) in zip(
+                    parish_slice, encoded_slice, strict=True
+                ):
+                    refs = dioceses.for_parish(parish.augias_id)
+                    parish_ref = refs.parish(parish.identifier)
+                    registers = [
+                        Register(
+                            **dict(zip(encoded_register_fields, values)),
+                            parish=parish_ref,
+                        )
+                        for values in encoded_registers
+                    ]
+                    register_refs = [
+                        refs.register(parish.identifier, register.archival_identifier)
+                        for register in registers
+                    ]
+                    images = [
+                        Image(
+                            **dict(zip(encoded_image_fields, values[1:])),
+                            parish=parish_ref,
+                            register=register_refs[values[0]],
+                        )
+                        for values in encoded_images
+                    ]
+                    for _ in registers:
+                        self._percent.increment()
+                    yield registers, images
+
+    def _encode_parish(
+        self,
+        parish: Parish,
+        registers_df: "pd.DataFrame",
+        imgs_df: "pd.DataFrame",
+        refs: ReferenceKeys,
+    ) -> tuple[list[tuple[Any, ...]], list[tuple[Any, ...]]]:
+        """Transform a parish and encode its registers and images as tuples of
+        their values without the references, which are restored by the parent
+        process. Images start with the index of their register."""
+        registers, images = self.__transform_parish(parish, registers_df, imgs_df, refs)
+        register_indices = {
+            refs.register(parish.identifier, register.archival_identifier): index
+            for index, register in enumerate(registers)
+        }
+        return (
+            [
+                tuple(getattr(register, field) for field in encoded_register_fields)
+                for register in registers
+            ],
+            [
+                (
+                    register_indices[image.register],
+                    *(getattr(image, field) for field in encoded_image_fields),
+                )
+                for image in images
+            ],
+        )
+
+    @classmethod
+    def _transformer(cls) -> "AugiasProcessor":
+        """An instance without a connection that only transforms data, for the
+        worker processes"""
+        processor = cls.__new__(cls)
+        processor.key_map = processor._get_key_map()
+        processor.instrumentation = Instrumentation()
+        processor._percent = Percent()
+        processor.issues = []
+        return processor
+
+    def __transform_parish(
+        self,
+        parish: Parish,
+        registers_df: "pd.DataFrame",
+        imgs_df: "pd.DataFrame",
+        refs: ReferenceKeys,
+    ) -> tuple[list[Register], list[Image]]:
+        log.info(f"Transforming registers for parish: {parish.title}")
+        parish_registers_df = registers_df[
+            registers_df[self.key_map.register_parent_col] == parish.augias_id
+        ]
+        with self.instrumentation.stage("extract registers", len(parish_registers_df)):
+            parish_registers = self.__extract_registers(
+                parish_registers_df, refs.parish(parish.identifier)
+            )
+        images: list[Image] = []
+        for register in parish_registers:
+            log.info(f"Transforming images for register: {register.title}")
+            register_imgs_df = imgs_df[
+                imgs_df[self.key_map.img_parent_col] == register.augias_id
+            ]
+            with self.instrumentation.stage("extract images", len(register_imgs_df)):
                 register_images = self.__extract_images(
                     register_imgs_df,
-                    diocese_id,
-                    parish.identifier,
-                    register.archival_identifier,
+                    refs.parish(parish.identifier),
+                    refs.register(parish.identifier, register.archival_identifier),
                 )
-                images.extend(register_images)
-                if len(register_images) > 0:
-                    first_img = register_images[0]
-                    image_dir_path = first_img.file_path.replace(
-                        first_img.file_name, ""
-                    )
-                    register.image_dir_path = image_dir_path
-                self._percent.increment()
-        return MatriculaData(parishes=parishes, registers=registers, images=images)
+            images.extend(register_images)
+            if len(register_images) > 0:
+                first_img = register_images[0]
+                image_dir_path = first_img.file_path.replace(first_img.file_name, "")
+                register.image_dir_path = image_dir_path
+            self._percent.increment()
+        return parish_registers, images
 
-    def __extract_parishes(self, df: pd.DataFrame, diocese_key: str) -> list[Parish]:
+    def __extract_parishes(
+        self, df: "pd.DataFrame", dioceses: DioceseKeys
+    ) -> list[Parish]:
         columns_to_keep = self.key_map.parish_cols.dict()
         df = df[columns_to_keep.keys()].rename(columns=columns_to_keep)
         df = df.sort_values(by="augias_id")
@@ -172,7 +835,6 @@ class AugiasProcessor(MDBProcessor, ABC):
         df["parish_church"] = df["title"]
         df["date_range"] = df["date_range"].apply(self.__wrap_in_p)
         df["description"] = df["description"].apply(lambda d: d if d else None)
-        df["location"] = df["location"].apply(self.__coord_to_point)
         self._b_ids = dict(zip(df["augias_id"], df["identifier"]))
         parishes = []
         for _, row in df.iterrows():
@@ -181,19 +843,19 @@ class AugiasProcessor(MDBProcessor, ABC):
                 identifier=row["identifier"],
                 title=row["title"],
                 matricula_identifier=row["matricula_identifier"],
-                location=row["location"],
+                location=self.__parish_location(row),
                 parish_church_link=row["parish_church_link"],
                 image_url=row["image_url"],
                 date_range=row["date_range"],
                 description=row["description"],
-                diocese=f'["{diocese_key}"]',
+                diocese=dioceses.for_parish(row["augias_id"]).diocese,
                 parish_church=row["parish_church"],
             )
             parishes.append(parish)
         return parishes
 
     def __extract_registers(
-        self, df: pd.DataFrame, diocese_key: str, parish_key: str
+        self, df: "pd.DataFrame", parish_ref: str
     ) -> list[Register]:
         columns_to_keep = self.key_map.register_cols.dict()
         df = df[columns_to_keep.keys()].rename(columns=columns_to_keep)
@@ -220,7 +882,7 @@ class AugiasProcessor(MDBProcessor, ABC):
                 date_range=row["date_range"],
                 date_start=row["date_start"],
                 date_end=row["date_end"],
-                parish=f'["{diocese_key}", "{parish_key}", true]',
+                parish=parish_ref,
                 image_dir_path=None,
                 ordering=row["ordering"],
             )
@@ -228,7 +890,7 @@ class AugiasProcessor(MDBProcessor, ABC):
         return registers
 
     def __extract_images(
-        self, df: pd.DataFrame, diocese_key: str, parish_key: str, register_key: str
+        self, df: "pd.DataFrame", parish_ref: str, register_ref: str
     ) -> list[Image]:
         columns_to_keep = self.key_map.image_cols.dict()
         df = df[columns_to_keep.keys()].rename(columns=columns_to_keep)
@@ -238,8 +900,8 @@ class AugiasProcessor(MDBProcessor, ABC):
         for _, row in df.iterrows():
             image = Image(
                 augias_id=row["augias_id"],
-                parish=f'["{diocese_key}", "{parish_key}", true]',
-                register=f'["{diocese_key}", "{parish_key}", true, "{register_key}"]',
+                parish=parish_ref,
+                register=register_ref,
                 file_path=row["file_path"],
                 label=row["label"],
                 file_name=row["file_name"],
@@ -248,10 +910,88 @@ class AugiasProcessor(MDBProcessor, ABC):
             images.append(image)
         return images
 
+    def __parish_from_row(self, row: dict[str, Any], refs: ReferenceKeys) -> Parish:
+        return Parish(
+            augias_id=row["augias_id"],
+            identifier=self._to_simple_ascii(row["title"]),
+            title=row["title"],
+            matricula_identifier=row["matricula_identifier"],
+            location=self.__parish_location(row),
+            parish_church_link=row["parish_church_link"],
+            image_url=row["image_url"],
+            date_range=self.__wrap_in_p(row["date_range"]),
+            description=row["description"] if row["description"] else None,
+            diocese=refs.diocese,
+            parish_church=row["title"],
+        )
+
+    def __register_from_row(
+        self, row: dict[str, Any], parish_ref: str, ordering: int
+    ) -> Register:
+        title = self._remove_newlines(row["title"])
+        return Register(
+            augias_id=row["identifier"],
+            identifier=row["identifier"],
+            title=title,
+            register_type=self.__extract_types(title),
+            description=self.__wrap_in_p(row["description"]),
+            comment=self.__wrap_in_p(row["comment"]),
+            archival_identifier=row["archival_identifier"],
+            storage_location=row["storage_location"],
+            microfilm_identifier=row["microfilm_identifier"],
+            date_range=row["date_range"],
+            date_start=self.__format_date(row["date_start"]),
+            date_end=self.__format_date(row["date_end"]),
+            parish=parish_ref,
+            image_dir_path=None,
+            ordering=ordering,
+        )
+
+    def __image_from_row(
+        self, row: dict[str, Any], parish_ref: str, register_ref: str
+    ) -> Image:
+        return Image(
+            augias_id=row["augias_id"],
+            parish=parish_ref,
+            register=register_ref,
+            file_path=row["file_path"],
+            label=row["label"],
+            file_name=row["file_name"],
+            order=None,
+        )
+
+    def __parish_location(self, row: Any) -> None | str:
+        location = self.__coord_to_point(row["location"])
+        if location is None and isinstance(row["location"], str) and row["location"]:
+            log.warn(
+                f"Malformed coordinates of parish {row['title']}: {row['location']}"
+            )
+            self.issues.append(
+                {
+                    "check": "malformed coordinates",
+                    "row": {
+                        "model": "parish.parish",
+                        "augias_id": row["augias_id"],
+                        "title": row["title"],
+                    },
+                    "value": row["location"],
+                }
+            )
+        return location
+
     def __coord_to_point(self, coord: None | str) -> None | str:
-        if not coord:
+        # None if the coordinates are not a valid "latitude, longitude" pair
+        if not coord or not isinstance(coord, str):
+            return None
+        parts = coord.split(",")
+        if len(parts) != 2:
+            return None
+        lat, lon = parts[0].strip(), parts[1].strip()
+        try:
+            if not (-90 <= float(lat) <= 90 and -180 <= float(lon) <= 180):
+                return None
+        except ValueError:
             return None
-        lat, lon = coord.split(", ")
         return f"SRID=4326;POINT ({lon} {lat})"
 
     def __wrap_in_p(self, text: None | str) -> None | str:
@@ -260,13 +1000,9 @@ class AugiasProcessor(MDBProcessor, ABC):
         return f"<p>{text}</p>"
 
     def __format_date(self, x: float) -> None | str:
-        date = (
-            str(int(x))
-            if isinstance(x, float) and not pd.isnull(x)
-            else str(x)
-            if not pd.isnull(x)
-            else ""
-        )
+        if x is None or (isinstance(x, float) and math.isnan(x)):
+            return
+        date = str(int(x)) if isinstance(x, float) else str(x)
         if not date:
             return
         return f"{date[:4]}-{date[4:6]}-{date[6:]}"
@@ -285,3 +1021,44 @@ class AugiasProcessor(MDBProcessor, ABC):
         if self.__any_in_text(title, ["trauu", "hochzeit", "heirat"]):
             types.append("Trauungen")
         return " - ".join(types) if types else title
+
+
+# Processors of the worker process by class, created for the first slice
+_transformers: dict[type[AugiasProcessor], AugiasProcessor] = {}
+
+
+def _transform_parish_slice(
+    task: tuple[
+        type[AugiasProcessor],
+        list[tuple[Parish, str]],
+        "pd.DataFrame",
+        "pd.DataFrame",
+        bool,
+    ],
+) -> tuple[
+    list[tuple[list[tuple[Any, ...]], list[tuple[Any, ...]]]],
+    dict[str, StageStats],
+    dict[str, int],
+]:
+    """Transform a slice of parishes and return them encoded, with the stages
+    measured and the hot path calls counted if asked to"""
+    processor_class, parishes, registers_df, imgs_df, count_calls = task
+    processor = _transformers.get(processor_class)
+    if processor is None:
+        processor = processor_class._transformer()
+        _transformers[processor_class] = processor
+    processor.instrumentation = Instrumentation()
+    # Only counts the calls, nothing is written
+    profiler = Profiler(ProfileMode.OFF, "")
+    if count_calls:
+        profiler.count_calls(processor, processor.hot_paths)
+    try:
+        encoded = [
+            processor._encode_parish(
+                parish, registers_df, imgs_df, ReferenceKeys(diocese_key)
+            )
+            for parish, diocese_key in parishes
+        ]
+    finally:
+        profiler.restore()
+    return encoded, processor.instrumentation.stages, dict(profiler.counters)
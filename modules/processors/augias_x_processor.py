@@ -15,6 +15,8 @@ log = Logger()
 @final
 class AugiasXProcessor(AugiasProcessor):
     name = "Augias X"
+    # Exported as Access 2000 databases, ACE when saved again by Access 2007+
+    jet_versions = [1, 2, 3, 4, 5]
 
     @override
     def _get_key_map(self) -> KeyMap:
@@ -1,12 +1,16 @@
 import os
 import re
 from abc import ABC, abstractmethod
-from typing import Callable
+from collections.abc import Iterator
+from typing import Any, Callable
 
 from unidecode import unidecode
 
+from modules.instrumentation import Instrumentation
 from modules.models.matricula_data import MatriculaData
 from modules.models.percent import Percent, PercentChangeHandler
+from modules.pipeline import Pipeline
+from modules.profiling import Profiler
 
 type ProgressCallback = Callable[[Percent], None]
 
@@ -14,14 +18,33 @@ type ProgressCallback = Callable[[Percent], None]
 class BaseProcessor(ABC):
     name: str
     increment: float
+    # Per-row methods whose calls are counted when profiling
+    hot_paths: list[str] = ["_to_simple_ascii", "_remove_newlines"]
 
     def __init__(self, input_file: str, on_progress: PercentChangeHandler):
         self.__on_progress = on_progress
         self._percent = Percent(on_change=on_progress)
         self.input_file = input_file
+        self.instrumentation = Instrumentation()
+        # Values that could not be converted and were left out, with the
+        # context of their row, as reported by the validation
+        self.issues: list[dict[str, Any]] = []
+        # Diocese of the parishes by their id, for databases holding several
+        # dioceses. Other parishes belong to the diocese being converted.
+        self.parish_dioceses: dict[Any, str] = {}
+        # Runs the fetching of streamed queries on its own thread when set
+        self.pipeline: Pipeline | None = None
+        # Counts the calls of the hot paths when profiling, also the ones made
+        # in worker processes
+        self.profiler: Profiler | None = None
         if not os.path.exists(input_file):
             raise ValueError("Input file does not exist")
 
+    @classmethod
+    def matches_signature(cls, header: bytes) -> bool:
+        """Cheap check on the first bytes of the input file before connecting"""
+        return True
+
     @abstractmethod
     def can_process(self) -> bool:
         """Whether or not to proceed with the processing using this processor"""
@@ -32,6 +55,13 @@ class BaseProcessor(ABC):
         """Extract data from the input file"""
         raise NotImplementedError("Subclasses must implement this method")
 
+    def iter_partitions(self, diocese_id: str) -> Iterator[MatriculaData]:
+        """Extract data from the input file as consecutive, self-contained parts"""
+        data = self.try_process(diocese_id)
+        if data is None:
+            raise ValueError("Could not extract data from the input file")
+        yield data
+
     def _to_simple_ascii(self, text: str) -> str:
         # Convert to ASCII (remove accents, diacritics)
         ascii_text = unidecode(text.lower())
@@ -1,13 +1,18 @@
 from abc import ABC
-from typing import override
-
-import pandas as pd
-import pypyodbc
+from collections.abc import Callable, Iterator, Mapping
+from importlib.util import find_spec
+from itertools import batched
+from typing import TYPE_CHECKING, Any, override
 
 from modules.logger import Logger
+from modules.processors import mdbtools
 from modules.processors.base_processor import BaseProcessor, ProgressCallback
+from modules.record_batches import rows_to_record_batch
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
-pypyodbc.lowercase = False
 log = Logger()
 
 drivers = [
@@ -15,41 +20,306 @@ drivers = [
     "Microsoft Access Driver (*.mdb)",
 ]
 
+# Jet (*.mdb) and ACE (*.accdb) databases start with this id at offset 4
+signatures = [b"Standard Jet DB", b"Standard ACE DB"]
+version_offset = 0x14
+
+# Opens a DB-API connection for the given input file
+type ConnectionFactory = Callable[[str], Any]
+
+
+def odbc_connect(input_file: str) -> Any:
+    # Imported here so that other connection factories work without an ODBC manager
+    try:
+        import pypyodbc
+    except Exception as e:
+        log.debug(f"ODBC is not available. Error: {e}")
+        return None
+
+    pypyodbc.lowercase = False
+    for driver in drivers:
+        try:
+            log.debug(f"Trying driver: {driver}")
+            connection_str = f"Driver={{{driver}}};DBQ={input_file};"
+            connection = pypyodbc.connect(connection_str)
+            log.debug(f"Connected successfully using driver: {driver}")
+            return connection
+        except pypyodbc.Error as e:
+            log.debug(f"Failed to connect with driver: {driver}. Error: {e}")
+    return None
+
 
 class MDBProcessor(BaseProcessor, ABC):
+    fetch_size = 10_000
+    # Accepted Jet engine versions (0 = Jet 3, 1 = Jet 4, 2+ = ACE), None for all
+    jet_versions: list[int] | None = None
+
     @override
-    def __init__(self, input_file: str, on_progress: ProgressCallback):
+    def __init__(
+        self,
+        input_file: str,
+        on_progress: ProgressCallback,
+        connection_factory: ConnectionFactory | None = None,
+    ):
         super().__init__(input_file, on_progress)
-        if not input_file.endswith(".mdb") and not input_file.endswith(".accdb"):
-            raise ValueError("Input file must be an MS Access file (*.mdb, *.accdb)")
-        self.connection = None
-        for driver in drivers:
-            try:
-                log.debug(f"Trying driver: {driver}")
-                connection_str = f"Driver={{{driver}}};DBQ={self.input_file};"
-                connection = pypyodbc.connect(connection_str)
-                log.debug(f"Connected successfully using driver: {driver}")
-                self.connection = connection
-                break
-            except pypyodbc.Error as e:
-                log.debug(f"Failed to connect with driver: {driver}. Error: {e}")
-        if self.connection is None:
+        # One cursor per parameterized query so the driver only prepares it once
+        self._prepared_cursors: dict[str, Any] = {}
+        # Reads the tables when there is no ODBC driver, it does not run queries
+        self.mdbtools: mdbtools.MDBTools | None = None
+        if connection_factory is None:
+            with open(input_file, "rb") as f:
+                header = f.read(version_offset + 1)
+            if not self.matches_signature(header):
+                raise ValueError(
+                    "Input file must be an MS Access file (*.mdb, *.accdb)"
+                )
+            connection_factory = odbc_connect
+        self.connection = connection_factory(input_file)
+        if (
+            self.connection is None
+            and connection_factory is odbc_connect
+            and mdbtools.available()
+        ):
+            log.debug("No ODBC driver found, reading the tables with mdbtools")
+            self.mdbtools = mdbtools.MDBTools(input_file)
+        if self.connection is None and self.mdbtools is None:
             raise ValueError(
                 "No suitable driver found or unable to establish a connection."
             )
 
-    def _get_table(self, table: str) -> pd.DataFrame | None:
+    @classmethod
+    @override
+    def matches_signature(cls, header: bytes) -> bool:
+        if len(header) <= version_offset:
+            return False
+        if header[4 : 4 + len(signatures[0])] not in signatures:
+            return False
+        return cls.jet_versions is None or header[version_offset] in cls.jet_versions
+
+    @property
+    def supports_queries(self) -> bool:
+        """Whether SQL queries can be run, tables can always be read"""
+        return self.connection is not None
+
+    def _prefetch_tables(self, tables: Mapping[str, list[str] | None]) -> None:
+        """Start reading the given columns of the tables, all of them if None, in
+        parallel ahead of _get_table and _get_rows. Only mdbtools reads ahead."""
+        if self.mdbtools is not None:
+            self.mdbtools.prefetch(tables)
+
+    def _get_table(
+        self, table: str, columns: list[str] | None = None
+    ) -> "pd.DataFrame | None":
+        log.debug(f"Reading table: {table}")
+        with self.instrumentation.stage(f"read {table}") as stage:
+            if self.mdbtools is not None:
+                df = self.__export_table(table, columns)
+            elif columns is None:
+                df = self._query(f"SELECT * FROM [{table}]")
+            else:
+                df = self._query(f"SELECT {self.__projection(columns)} FROM [{table}]")
+            stage.rows = 0 if df is None else len(df)
+        return df
+
+    def _count_rows(self, table: str) -> int | None:
+        # mdbtools can only count the rows by exporting the whole table
         if self.connection is None:
             return None
         try:
             cursor = self.connection.cursor()
-            log.debug(f"Reading table: {table}")
-            query = f"SELECT * FROM [{table}]"
-            cursor.execute(query)
+            cursor.execute(f"SELECT COUNT(*) FROM [{table}]")
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except Exception as e:
+            log.debug(f"Error counting rows in table: {table}. Error: {e}")
+            return None
+
+    def _get_rows(self, table: str, columns: list[str]) -> list[tuple[Any, ...]] | None:
+        log.debug(f"Reading table: {table}")
+        with self.instrumentation.stage(f"read {table}") as stage:
+            if self.mdbtools is not None:
+                result = self.__export_rows(table, columns)
+            else:
+                result = self._fetch_rows(
+                    f"SELECT {self.__projection(columns)} FROM [{table}]"
+                )
+            stage.rows = 0 if result is None else len(result[1])
+        return None if result is None else result[1]
+
+    def _stream_table(
+        self, table: str, columns: list[str]
+    ) -> Iterator[tuple[Any, ...]]:
+        """Stream the given columns of all rows of the table"""
+        if self.mdbtools is not None:
+            log.debug(f"Streaming table: {table}")
+            return self.mdbtools.stream(table, columns)
+        return self._stream(f"SELECT {self.__projection(columns)} FROM [{table}]")
+
+    def _stream_table_batches(
+        self, table: str, columns: list[str]
+    ) -> Iterator["pa.RecordBatch"]:
+        """Stream the given columns of all rows of the table as Arrow record
+        batches of up to fetch_size rows"""
+        if self.mdbtools is not None:
+            log.debug(f"Streaming table: {table}")
+            for rows in batched(self.mdbtools.stream(table, columns), self.fetch_size):
+                with self.instrumentation.stage("convert to columns", len(rows)):
+                    batch = rows_to_record_batch(columns, rows)
+                yield batch
+        else:
+            yield from self._stream_record_batches(
+                f"SELECT {self.__projection(columns)} FROM [{table}]"
+            )
+
+    def _query(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> "pd.DataFrame | None":
+        # Imported here so that pandas is only required by the DataFrame API
+        import pandas as pd
+
+        if find_spec("pyarrow") is not None:
+            import pyarrow as pa
+
+            try:
+                table = self._fetch_table(query, params)
+                return None if table is None else table.to_pandas()
+            except pa.ArrowException as e:
+                # Columns mixing types are left to pandas to infer
+                log.debug(f"Reading rows instead of columns for: {query}. Error: {e}")
+        result = self._fetch_rows(query, params)
+        if result is None:
+            return None
+        columns, rows = result
+        # Convert the result to a DataFrame
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def __export_table(
+        self, table: str, columns: list[str] | None
+    ) -> "pd.DataFrame | None":
+        import pandas as pd
+
+        result = self.__export_rows(table, columns)
+        if result is None:
+            return None
+        columns, rows = result
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def __export_rows(
+        self, table: str, columns: list[str] | None
+    ) -> tuple[list[str], list[tuple[Any, ...]]] | None:
+        assert self.mdbtools is not None
+        try:
+            return self.mdbtools.read(table, columns)
+        except (OSError, ValueError) as e:
+            log.debug(f"Error exporting table: {table}. Error: {e}")
+            return None
+
+    @staticmethod
+    def __projection(columns: list[str]) -> str:
+        return ", ".join(f"[{column}]" for column in columns)
+
+    def _fetch_rows(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> tuple[list[str], list[tuple[Any, ...]]] | None:
+        if self.connection is None:
+            return None
+        try:
+            cursor = self.__execute(query, params)
             columns = [column[0] for column in cursor.description]
-            rows = cursor.fetchall()
-            # Convert the result to a DataFrame
-            return pd.DataFrame.from_records(rows, columns=columns)
+            return columns, cursor.fetchall()
         except Exception as e:
-            log.debug(f"Error reading table: {table}. Error: {e}")
+            log.debug(f"Error running query: {query}. Error: {e}")
             return None
+
+    def _fetch_table(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> "pa.Table | None":
+        """Fetch the result as typed Arrow columns. Every block of rows is
+        converted to columns as it is fetched, so that the row tuples of the
+        whole result are never held at once."""
+        import pyarrow as pa
+
+        if self.connection is None:
+            return None
+        try:
+            cursor = self.__execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            batches = list(self.__record_batches(columns, self.__fetch_batches(cursor)))
+        except pa.ArrowException:
+            raise
+        except Exception as e:
+            log.debug(f"Error running query: {query}. Error: {e}")
+            return None
+        if not batches:
+            return pa.table({column: pa.array([]) for column in columns})
+        # Columns that are null in a block take the type of the other blocks
+        return pa.concat_tables(
+            [pa.Table.from_batches([batch]) for batch in batches],
+            promote_options="permissive",
+        )
+
+    def _stream_record_batches(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> Iterator["pa.RecordBatch"]:
+        """Stream the result as typed Arrow record batches, one for every block
+        of up to fetch_size rows fetched from the cursor. A column mixing types
+        raises pyarrow.ArrowException."""
+        cursor = self.__stream_cursor(query, params)
+        columns = [column[0] for column in cursor.description]
+        batches = self.__record_batches(columns, self.__fetch_batches(cursor))
+        if self.pipeline is not None:
+            # The blocks are fetched and converted while the batches are used
+            batches = self.pipeline.threaded("fetch", batches)
+        yield from batches
+
+    def __record_batches(
+        self, columns: list[str], blocks: Iterator[list[tuple[Any, ...]]]
+    ) -> Iterator["pa.RecordBatch"]:
+        for rows in blocks:
+            with self.instrumentation.stage("convert to columns", len(rows)):
+                batch = rows_to_record_batch(columns, rows)
+            yield batch
+
+    def __execute(self, query: str, params: tuple[Any, ...] | None) -> Any:
+        if params is None:
+            cursor = self.connection.cursor()
+            cursor.execute(query)
+        else:
+            cursor = self._prepared_cursors.get(query)
+            if cursor is None:
+                cursor = self.connection.cursor()
+                self._prepared_cursors[query] = cursor
+            cursor.execute(query, params)
+        return cursor
+
+    def _stream(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> Iterator[tuple[Any, ...]]:
+        cursor = self.__stream_cursor(query, params)
+        batches = self.__fetch_batches(cursor)
+        if self.pipeline is not None:
+            # The driver fetches the next batches while the rows are transformed
+            batches = self.pipeline.threaded("fetch", batches)
+        for rows in batches:
+            yield from rows
+
+    def __stream_cursor(self, query: str, params: tuple[Any, ...] | None) -> Any:
+        # A cursor of its own, other queries can run while the result streams
+        if self.connection is None:
+            raise ValueError("No database connection available")
+        log.debug(f"Streaming query: {query}")
+        cursor = self.connection.cursor()
+        if params is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query, params)
+        return cursor
+
+    def __fetch_batches(self, cursor: Any) -> Iterator[list[tuple[Any, ...]]]:
+        while True:
+            with self.instrumentation.stage("fetch rows") as stage:
+                rows = cursor.fetchmany(self.fetch_size)
+                stage.rows = len(rows)
+            if not rows:
+                break
+            yield rows
@@ -0,0 +1,208 @@
+import csv
+import io
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Any
+
+from modules.logger import Logger
+
+log = Logger()
+
+export_command = "mdb-export"
+schema_command = "mdb-schema"
+# Format the dates are exported in and parsed from
+date_format = "%Y-%m-%d %H:%M:%S"
+# Jet 3 databases do not store their code page, Augias runs on Western European
+# Windows installations
+jet3_charset = "CP1252"
+# Exported for nulls, the csv module only tells them from empty text by their
+# missing quotes since Python 3.13
+null_value = "\x1f"
+# A column of a CREATE TABLE statement of the access backend of mdb-schema,
+# e.g. "[Titel]			Text (255), "
+column_pattern = re.compile(
+    r"\s*\[(?P<name>[^\]]+)\]\s+(?P<type>[A-Za-z/ ]+?)\s*(?:\(\d+\))?\s*,?\s*"
+)
+
+
+def _to_bool(value: str) -> bool:
+    # Exported as 1/0, or as TRUE/FALSE by older versions
+    return value not in ("0", "FALSE", "False", "false")
+
+
+def _to_datetime(value: str) -> datetime:
+    return datetime.strptime(value, date_format)
+
+
+def _convert(convert: Callable[[str], Any], value: str) -> Any:
+    if value == null_value:
+        return None
+    if convert is str:
+        return value
+    try:
+        return convert(value)
+    except (ArithmeticError, ValueError):
+        # Kept as exported, like a driver returns what is stored
+        return value
+
+
+# Conversion of the exported text by the column type, other columns stay text
+converters: dict[str, Callable[[str], Any]] = {
+    "Boolean": _to_bool,
+    "Byte": int,
+    "Integer": int,
+    "Long Integer": int,
+    "Single": float,
+    "Double": float,
+    "Currency": Decimal,
+    "Numeric": Decimal,
+    "DateTime": _to_datetime,
+}
+
+
+def available() -> bool:
+    return (
+        shutil.which(export_command) is not None
+        and shutil.which(schema_command) is not None
+    )
+
+
+class MDBTools:
+    """Reads the tables of an Access database with mdb-export and mdb-schema of
+    mdbtools, for systems without an Access ODBC driver. Every table is exported
+    by its own process and its CSV is parsed while it streams through the pipe,
+    so tables that are prefetched together are exported in parallel. Only whole
+    tables can be read, there is no SQL."""
+
+    def __init__(self, input_file: str):
+        self.input_file = input_file
+        self._env = {**os.environ}
+        self._env.setdefault("MDB_JET3_CHARSET", jet3_charset)
+        self._types: dict[str, dict[str, str]] = {}
+        self._prefetched: dict[
+            str, tuple[list[str] | None, Future[list[tuple[Any, ...]]]]
+        ] = {}
+
+    def column_types(self, table: str) -> dict[str, str]:
+        """The type of every column of the table, in the order of the table"""
+        types = self._types.get(table)
+        if types is None:
+            result = subprocess.run(
+                [
+                    schema_command,
+                    "-T",
+                    table,
+                    "--no-indexes",
+                    "--no-relations",
+                    "--no-not-null",
+                    self.input_file,
+                    "access",
+                ],
+                capture_output=True,
+                env=self._env,
+                check=False,
+            )
+            if result.returncode != 0:
+                raise ValueError(
+                    f"{schema_command} failed for table {table}: "
+                    f"{result.stderr.decode(errors='replace').strip()}"
+                )
+            types = {}
+            for line in result.stdout.decode("utf-8").splitlines():
+                match = column_pattern.fullmatch(line)
+                if match is not None:
+                    types[match["name"]] = match["type"]
+            if not types:
+                raise ValueError(f"Table not found: {table}")
+            self._types[table] = types
+        return types
+
+    def prefetch(self, tables: Mapping[str, list[str] | None]) -> None:
+        """Start exporting the given columns of the tables, all of them if None,
+        in parallel. They are kept until read."""
+        executor = ThreadPoolExecutor(len(tables), thread_name_prefix=export_command)
+        for table, columns in tables.items():
+            future = executor.submit(
+                lambda t, c: list(self.stream(t, c)), table, columns
+            )
+            self._prefetched[table] = (columns, future)
+        # The exports keep running, the threads end with them
+        executor.shutdown(wait=False)
+
+    def read(
+        self, table: str, columns: list[str] | None = None
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        """Read the given columns of the table, all of them if None, and return
+        the column names with the rows"""
+        names = list(self.column_types(table)) if columns is None else columns
+        prefetched = self._prefetched.pop(table, None)
+        if prefetched is not None and prefetched[0] == columns:
+            return names, prefetched[1].result()
+        return names, list(self.stream(table, columns))
+
+    def stream(
+        self, table: str, columns: list[str] | None = None
+    ) -> Iterator[tuple[Any, ...]]:
+        """Stream the given columns of the table, all of them if None, while it
+        is exported"""
+        types = self.column_types(table)
+        names = list(types) if columns is None else columns
+        unknown = [name for name in names if name not in types]
+        if unknown:
+            raise ValueError(f"Columns not found in table {table}: {unknown}")
+        log.debug(f"Exporting table: {table}")
+        # Written to a file, a full pipe of warnings would block the export
+        errors = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            [
+                export_command,
+                "-D",
+                date_format,
+                "-0",
+                null_value,
+                self.input_file,
+                table,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            env=self._env,
+        )
+        try:
+            assert process.stdout is not None
+            reader = csv.reader(
+                io.TextIOWrapper(process.stdout, encoding="utf-8", newline="")
+            )
+            header = next(reader, [])
+            projection = [
+                (header.index(name), converters.get(types[name], str))
+                for name in names
+                if name in header
+            ]
+            if len(projection) == len(names):
+                for row in reader:
+                    yield tuple(
+                        _convert(convert, row[index]) for index, convert in projection
+                    )
+            if process.wait() != 0:
+                errors.seek(0)
+                raise ValueError(
+                    f"{export_command} failed for table {table}: "
+                    f"{errors.read().decode(errors='replace').strip()}"
+                )
+            if len(projection) != len(names):
+                raise ValueError(f"Unexpected columns exported from table {table}")
+        finally:
+            # The export is stopped when the rows are not read to the end
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if process.stdout is not None:
+                process.stdout.close()
+            errors.close()
@@ -1,12 +1,13 @@
 from PySide6.QtCore import QObject, Signal, Slot
 
+from modules.convert import convert
 from modules.logger import Logger
-from modules.models.matricula_data import MatriculaData
-from modules.processors.augias_9_2_processor import Augias92Processor
-from modules.processors.augias_x_processor import AugiasXProcessor
+from modules.processors.augias_processor import AugiasProcessor, ExtractionMode
 from modules.processors.base_processor import BaseProcessor
-
-processors: list[type[BaseProcessor]] = [Augias92Processor, AugiasXProcessor]
+from modules.processors.registry import find_processor
+from modules.profiling import ProfileMode
+from modules.writers.compression import Compression
+from modules.writers.write import OutputVariant
 
 log = Logger()
 
@@ -15,38 +16,62 @@ class ProcessorWorker(QObject):
     log_signal = Signal(str)  # Log messages
     initialized = Signal(str)  # Processor name
     progress = Signal(float)  # Processing progress
-    finished = Signal(MatriculaData)  # Processing result
+    finished = Signal(str)  # Output directory
     error = Signal(str)  # Error messages
-    start_extraction = Signal(str)
+    start_extraction = Signal(str, str)  # Diocese ID, output directory
 
-    def __init__(self, input_file: str):
+    def __init__(
+        self,
+        input_file: str,
+        output_variant: OutputVariant,
+        *,
+        extraction_mode: ExtractionMode = ExtractionMode.AUTO,
+        trace_memory: bool = False,
+        profile: ProfileMode = ProfileMode.OFF,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+        shard_rows: int | None = None,
+        shard_bytes: int | None = None,
+        verify_images: bool = False,
+        image_metadata: bool = False,
+        delta_store: str | None = None,
+        validate: bool = False,
+        diocese_map: str | None = None,
+        memory_budget: int | None = None,
+        pipelined: bool = False,
+        workers: int = 1,
+    ):
         super().__init__()
         self.input_file = input_file
+        self.output_variant = output_variant
+        self.extraction_mode = extraction_mode
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shard_rows = shard_rows
+        self.shard_bytes = shard_bytes
+        self.verify_images = verify_images
+        self.image_metadata = image_metadata
+        self.delta_store = delta_store
+        self.validate = validate
+        self.diocese_map = diocese_map
+        self.memory_budget = memory_budget
+        self.pipelined = pipelined
+        self.workers = workers
         self.processor: None | BaseProcessor = None
         self.start_extraction.connect(self.extract)
 
     @Slot()
     def init(self) -> None:
-        for processor_class in processors:
-            try:
-                processor = processor_class(
-                    self.input_file, lambda p: self.progress.emit(p)
-                )
-                log.debug(f"Trying processor: {processor.name}")
-                if processor.can_process():
-                    log.debug(
-                        f"Processor {processor.name} can process {self.input_file}"
-                    )
-                    self.processor = processor
-                    break
-                else:
-                    log.debug(
-                        f"Processor {processor.name} cannot process {self.input_file}"
-                    )
-            except Exception as e:
-                log.error(
-                    f"Error processing data using {processor_class.__name__}: {e}"
-                )
+        self.processor = find_processor(
+            self.input_file, lambda p: self.progress.emit(p)
+        )
+        if isinstance(self.processor, AugiasProcessor):
+            self.processor.mode = self.extraction_mode
+            if self.memory_budget is not None:
+                self.processor.memory_budget = self.memory_budget
+            self.processor.workers = self.workers
         if self.processor is None:
             self.error.emit(
                 "Unsupported file format or unable to create a valid processor"
@@ -54,16 +79,35 @@ class ProcessorWorker(QObject):
         else:
             self.initialized.emit(self.processor.name)
 
-    @Slot(str)
-    def extract(self, diocese_id: str) -> None:
+    @Slot(str, str)
+    def extract(self, diocese_id: str, output_dir: str) -> None:
         if self.processor is None:
             error_msg = "Processor is not initialized"
             log.error(error_msg)
             self.error.emit(error_msg)
         else:
             try:
-                data = self.processor.try_process(diocese_id)
-                self.finished.emit(data)
+                log.info(f"Writing output files to {output_dir}")
+                convert(
+                    self.processor,
+                    diocese_id,
+                    self.output_variant,
+                    output_dir,
+                    trace_memory=self.trace_memory,
+                    profile=self.profile,
+                    compression=self.compression,
+                    compression_level=self.compression_level,
+                    shard_rows=self.shard_rows,
+                    shard_bytes=self.shard_bytes,
+                    verify_images=self.verify_images,
+                    image_metadata=self.image_metadata,
+                    delta_store=self.delta_store,
+                    validate=self.validate,
+                    diocese_map=self.diocese_map,
+                    pipelined=self.pipelined,
+                )
+                log.info("Output files written successfully")
+                self.finished.emit(output_dir)
             except Exception as e:
                 log.error(f"Error during extraction: {e}")
                 self.error.emit(str(e))
@@ -0,0 +1,63 @@
+from importlib.metadata import entry_points
+
+from modules.logger import Logger
+from modules.models.percent import PercentChangeHandler
+from modules.processors.augias_9_2_processor import Augias92Processor
+from modules.processors.augias_x_processor import AugiasXProcessor
+from modules.processors.base_processor import BaseProcessor
+
+log = Logger()
+
+# Third party processors can register themselves under this entry point group
+entry_point_group = "matricula_convert.processors"
+header_size = 4096
+
+builtin_processors: list[type[BaseProcessor]] = [Augias92Processor, AugiasXProcessor]
+
+
+def get_processors() -> list[type[BaseProcessor]]:
+    processors = list(builtin_processors)
+    for entry_point in entry_points(group=entry_point_group):
+        try:
+            processor_class = entry_point.load()
+        except Exception as e:
+            log.error(f"Error loading processor plugin '{entry_point.name}': {e}")
+            continue
+        if not isinstance(processor_class, type) or not issubclass(
+            processor_class, BaseProcessor
+        ):
+            log.error(f"Processor plugin '{entry_point.name}' is not a processor")
+            continue
+        if processor_class not in processors:
+            log.debug(f"Found processor plugin: {entry_point.name}")
+            processors.append(processor_class)
+    return processors
+
+
+def read_header(input_file: str, size: int = header_size) -> bytes:
+    with open(input_file, "rb") as f:
+        return f.read(size)
+
+
+def find_processor(
+    input_file: str, on_progress: PercentChangeHandler
+) -> BaseProcessor | None:
+    try:
+        header = read_header(input_file)
+    except OSError as e:
+        log.error(f"Error reading input file '{input_file}': {e}")
+        return None
+    for processor_class in get_processors():
+        if not processor_class.matches_signature(header):
+            log.debug(f"File signature does not match {processor_class.__name__}")
+            continue
+        try:
+            processor = processor_class(input_file, on_progress)
+            log.debug(f"Trying processor: {processor.name}")
+            if processor.can_process():
+                log.debug(f"Processor {processor.name} can process {input_file}")
+                return processor
+            log.debug(f"Processor {processor.name} cannot process {input_file}")
+        except Exception as e:
+            log.error(f"Error processing data using {processor_class.__name__}: {e}")
+    return None
@@ -0,0 +1,114 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from collections.abc import Callable
+from enum import Enum
+from typing import Any
+
+from modules.logger import Logger
+
+log = Logger()
+
+
+class ProfileMode(Enum):
+    OFF = 0
+    CPROFILE = 1  # Deterministic profile, written as profile.prof and profile.txt
+    SAMPLING = 2  # Sampled stacks, written as profile.folded for flame graphs
+
+
+class Profiler:
+    """Profiles the calling thread and counts the calls of selected hot path
+    methods. Nothing is patched or traced unless a profiler is started."""
+
+    sample_interval = 0.005
+
+    def __init__(self, mode: ProfileMode, output_dir: str):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.counters: Counter[str] = Counter()
+        self._patched: list[tuple[Any, str]] = []
+        self._profile: cProfile.Profile | None = None
+        self._samples: Counter[str] = Counter()
+        self._sampler: threading.Thread | None = None
+        self._stop_sampling = threading.Event()
+
+    def count_calls(self, target: Any, names: list[str]):
+        """Replace the given methods on the target instance with counting wrappers"""
+        prefix = type(target).__name__
+        for name in names:
+            method: Callable[..., Any] = getattr(target, name)
+            setattr(target, name, self.__counting(f"{prefix}.{name}", method))
+            self._patched.append((target, name))
+
+    def start(self):
+        if self.mode == ProfileMode.CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == ProfileMode.SAMPLING:
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(
+                target=self.__sample,
+                args=(threading.get_ident(),),
+                name="profile-sampler",
+                daemon=True,
+            )
+            self._sampler.start()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+            profile_path = os.path.join(self.output_dir, "profile.prof")
+            self._profile.dump_stats(profile_path)
+            with open(
+                os.path.join(self.output_dir, "profile.txt"), "w", encoding="utf-8"
+            ) as f:
+                stats = pstats.Stats(self._profile, stream=f)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+            self._profile = None
+            log.info(f"Profile written to {profile_path}")
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+            folded_path = os.path.join(self.output_dir, "profile.folded")
+            with open(folded_path, "w", encoding="utf-8") as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            log.info(f"Sampled stacks written to {folded_path}")
+        self.restore()
+        if self.counters:
+            counters_path = os.path.join(self.output_dir, "profile_counters.json")
+            with open(counters_path, "w", encoding="utf-8") as f:
+                json.dump(dict(self.counters.most_common()), f, indent=2)
+
+    def restore(self):
+        """Remove the counting wrappers, the counters are kept"""
+        for target, name in self._patched:
+            delattr(target, name)
+        self._patched = []
+
+    def __counting(self, key: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        counters = self.counters
+
+        def counted(*args: Any, **kwargs: Any) -> Any:
+            counters[key] += 1
+            return method(*args, **kwargs)
+
+        return counted
+
+    def __sample(self, thread_id: int):
+        # Collapsed stack format: root;caller;callee count
+        while not self._stop_sampling.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            stack: list[str] = []
+            while frame is not None:
+                code = frame.f_code
+                file_name = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({file_name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self._samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,34 @@
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+def record_batch(
+    names: list[str],
+    columns: Sequence[Sequence[Any]],
+    schema: "pa.Schema | None" = None,
+) -> "pa.RecordBatch":
+    """Build a record batch from the values of every column. Without a schema the
+    type of a column is inferred from its values, a column mixing types raises
+    pyarrow.ArrowException."""
+    import pyarrow as pa
+
+    if not columns:
+        columns = [[] for _ in names]
+    if schema is None:
+        arrays = [pa.array(values) for values in columns]
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+    arrays = [
+        pa.array(values, type=field.type)
+        for values, field in zip(columns, schema, strict=True)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def rows_to_record_batch(
+    names: list[str], rows: Sequence[tuple[Any, ...]]
+) -> "pa.RecordBatch":
+    """Build a record batch from rows with a value for every name"""
+    return record_batch(names, list(zip(*rows, strict=True)))
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from datetime import date
+from typing import Any
+
+from modules.logger import Logger
+from modules.models.image import Image
+from modules.models.matricula_data import MatriculaData
+from modules.models.parish import Parish
+from modules.models.reference_keys import parish_reference, register_reference
+from modules.models.register import Register
+
+log = Logger()
+
+report_file_name = "validation_report.json"
+date_pattern = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+# Issues listed per check in the report, all of them are counted
+max_listed_issues = 1000
+
+
+def _to_builtin(value: Any) -> Any:
+    # Ids of rows extracted with pandas are numpy scalars
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class Validator:
+    """Checks the converted rows in a single pass over the partitions. Keys that
+    must be unique are kept in hash sets, images only by a 128 bit digest of
+    their file path to keep the memory low for millions of images. References to parishes
+    or registers that were not seen yet are resolved at the end, so the order of
+    the partitions does not matter."""
+
+    def __init__(self):
+        self.counts: Counter[str] = Counter()
+        self.issues: dict[str, list[dict[str, Any]]] = {}
+        self._parish_identifiers: dict[str, dict[str, Any]] = {}
+        self._parishes: set[str] = set()
+        self._registers: set[str] = set()
+        self._archival_identifiers: dict[str, dict[str, Any]] = {}
+        self._file_paths: set[bytes] = set()
+        self._unresolved: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+
+    def add(self, data: MatriculaData):
+        for parish in data.parishes:
+            self.__check_parish(parish)
+        for register in data.registers:
+            self.__check_register(register)
+        for image in data.images:
+            self.__check_image(image)
+
+    def finish(self, issues: list[dict[str, Any]] | None = None) -> dict[str, Any]:
+        """Report the remaining orphans and the issues found by the processor"""
+        for reference, rows in self._unresolved.items():
+            if reference in self._parishes or reference in self._registers:
+                continue
+            for check, row in rows:
+                self.__report(check, row, reference)
+        self._unresolved = {}
+        for issue in issues or []:
+            self.__report(issue["check"], issue["row"], issue.get("value"))
+        return self.report()
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "issues": sum(self.counts.values()),
+            "counts": dict(self.counts),
+            "checks": self.issues,
+        }
+
+    def write_report(self, output_dir: str) -> str:
+        report_path = os.path.join(output_dir, report_file_name)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(
+                self.report(), f, indent=2, ensure_ascii=False, default=_to_builtin
+            )
+        return report_path
+
+    def log_summary(self):
+        if not self.counts:
+            log.info("Validation found no issues")
+            return
+        for check, count in self.counts.most_common():
+            log.warn(f"Validation: {count} x {check}")
+
+    def __check_parish(self, parish: Parish):
+        row = {
+            "model": parish.model,
+            "augias_id": parish.augias_id,
+            "identifier": parish.identifier,
+            "title": parish.title,
+        }
+        first = self._parish_identifiers.setdefault(parish.identifier, row)
+        if first is not row:
+            self.__report("duplicate parish identifier", row, first["title"])
+        self._parishes.add(parish_reference(parish.diocese, parish.identifier))
+        if not parish.title or not str(parish.title).strip():
+            self.__report("empty title", row)
+        self.__check_dates(row, parish.date_start, parish.date_end)
+
+    def __check_register(self, register: Register):
+        row = {
+            "model": register.model,
+            "augias_id": register.augias_id,
+            "archival_identifier": register.archival_identifier,
+            "title": register.title,
+            "parish": register.parish,
+        }
+        reference = register_reference(register.parish, register.archival_identifier)
+        if reference in self._registers:
+            self.__report("duplicate register key", row, reference)
+        self._registers.add(reference)
+        first = self._archival_identifiers.setdefault(register.archival_identifier, row)
+        if first is not row:
+            self.__report("duplicate archival identifier", row, first["augias_id"])
+        self.__check_reference("orphaned register", register.parish, row)
+        if not register.title or not str(register.title).strip():
+            self.__report("empty title", row)
+        self.__check_dates(row, register.date_start, register.date_end)
+
+    def __check_image(self, image: Image):
+        file_path_digest = hashlib.blake2b(
+            str(image.file_path).encode("utf-8", "surrogateescape"), digest_size=16
+        ).digest()
+        if file_path_digest in self._file_paths:
+            self.__report("duplicate file path", self.__image_row(image))
+        self._file_paths.add(file_path_digest)
+        if not image.file_path:
+            self.__report("empty file path", self.__image_row(image))
+        if image.register not in self._registers or image.parish not in self._parishes:
+            row = self.__image_row(image)
+            self.__check_reference("orphaned image", image.register, row)
+            self.__check_reference("orphaned image", image.parish, row)
+
+    @staticmethod
+    def __image_row(image: Image) -> dict[str, Any]:
+        return {
+            "model": image.model,
+            "augias_id": image.augias_id,
+            "file_path": image.file_path,
+            "parish": image.parish,
+            "register": image.register,
+        }
+
+    def __check_reference(self, check: str, reference: str, row: dict[str, Any]):
+        if reference not in self._parishes and reference not in self._registers:
+            self._unresolved.setdefault(reference, []).append((check, row))
+
+    def __check_dates(
+        self, row: dict[str, Any], date_start: str | None, date_end: str | None
+    ):
+        start = self.__parse_date(row, "date_start", date_start)
+        end = self.__parse_date(row, "date_end", date_end)
+        if start is not None and end is not None and start > end:
+            self.__report("date start after date end", row, f"{start} > {end}")
+
+    def __parse_date(
+        self, row: dict[str, Any], field: str, value: str | None
+    ) -> date | None:
+        if value is None:
+            return None
+        match = date_pattern.fullmatch(str(value))
+        try:
+            if match is None:
+                raise ValueError
+            return date(*map(int, match.groups()))
+        except ValueError:
+            self.__report("malformed date", row, f"{field}: {value}")
+            return None
+
+    def __report(self, check: str, row: dict[str, Any], value: Any = None):
+        self.counts[check] += 1
+        listed = self.issues.setdefault(check, [])
+        if len(listed) < max_listed_issues:
+            issue: dict[str, Any] = {"row": row}
+            if value is not None:
+                issue["value"] = value
+            listed.append(issue)
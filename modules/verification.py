@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from modules.logger import Logger
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import register_reference
+
+log = Logger()
+
+report_file_name = "image_verification.json"
+default_cache_path = os.path.join(
+    os.path.expanduser("~"), ".matricula-convert", "image_checks.json"
+)
+# Files created by file browsers that are never reported as extra
+ignored_files = {"thumbs.db", "desktop.ini", ".ds_store"}
+
+# Directory mtime in nanoseconds, digest of the file names referenced in it and
+# the names of the missing and extra files
+type Check = tuple[int, str, list[str], list[str]]
+
+
+def _digest(names: set[str]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(names):
+        digest.update(name.encode("utf-8", "surrogateescape") + b"\0")
+    return digest.hexdigest()
+
+
+class RegisterImages:
+    def __init__(
+        self,
+        reference: str,
+        title: str,
+        archival_identifier: str,
+        image_dir: str | None,
+    ):
+        self.reference = reference
+        self.title = title
+        self.archival_identifier = archival_identifier
+        self.image_dir = image_dir
+        self.files: dict[str, list[str]] = {}
+
+
+class PartitionCheck:
+    def __init__(self, registers: list[RegisterImages]):
+        self.registers = registers
+        self.directories: dict[str, Future[Check | None]] = {}
+
+
+class ImageVerifier:
+    """Checks that the image files of the converted registers exist. The
+    directories of a partition are listed with os.scandir on a thread pool while
+    the conversion continues, and compared to the images of the partition. Only
+    the missing and extra files are kept, so the memory does not grow with the
+    number of scans. The results are cached between runs as long as neither the
+    modification time of a directory nor the files referenced in it change."""
+
+    # Listings mostly wait for the file server, not for the CPU
+    max_workers = 16
+    # Partitions whose directories are listed at the same time
+    pending_partitions = 4
+
+    def __init__(self, cache_path: str = default_cache_path):
+        self.cache_path = cache_path
+        self._cache: dict[str, Check] = {}
+        self._pending: deque[PartitionCheck] = deque()
+        self._directories: set[str] = set()
+        self._missing_directories: set[str] = set()
+        self._registers: list[dict[str, Any]] = []
+        self._missing_files = 0
+        self._extra_files = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._report: dict[str, Any] = {}
+
+    def start(self):
+        self._cache = self.__load_cache()
+        self._executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="image-verifier"
+        )
+
+    def add(self, data: MatriculaData):
+        """Start listing the directories of a partition. Files are compared to the
+        images of the same partition, a parish or the whole database."""
+        assert self._executor is not None
+        registers: dict[str, RegisterImages] = {}
+        referenced: dict[str, set[str]] = {}
+        for register in data.registers:
+            image_dir = register.image_dir_path
+            if image_dir:
+                image_dir = os.path.normcase(os.path.normpath(image_dir))
+                referenced.setdefault(image_dir, set())
+            reference = register_reference(
+                register.parish, register.archival_identifier
+            )
+            registers[reference] = RegisterImages(
+                reference, register.title, register.archival_identifier, image_dir
+            )
+        for image in data.images:
+            directory, name = os.path.split(os.path.normcase(image.file_path))
+            directory = os.path.normpath(directory)
+            referenced.setdefault(directory, set()).add(name)
+            register = registers.get(image.register)
+            if register is not None:
+                register.files.setdefault(directory, []).append(name)
+        partition = PartitionCheck(list(registers.values()))
+        for directory, names in referenced.items():
+            partition.directories[directory] = self._executor.submit(
+                self.__check, directory, names, self._cache.get(directory)
+            )
+        self._pending.append(partition)
+        if len(self._pending) > self.pending_partitions:
+            self.__collect(self._pending.popleft())
+
+    def finish(self) -> dict[str, Any]:
+        """Wait for the listings, compare them to the images and update the cache"""
+        try:
+            while self._pending:
+                self.__collect(self._pending.popleft())
+        finally:
+            self._pending.clear()
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+        self.__save_cache()
+        self._report = {
+            "directories": len(self._directories),
+            "missing_directories": len(self._missing_directories),
+            "missing_files": self._missing_files,
+            "extra_files": self._extra_files,
+            "registers": self._registers,
+        }
+        return self._report
+
+    def write_report(self, output_dir: str) -> str:
+        report_path = os.path.join(output_dir, report_file_name)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self._report, f, indent=2, ensure_ascii=False)
+        return report_path
+
+    def log_summary(self):
+        report = self._report
+        log.info(
+            f"Verified {report['directories']} image directories: "
+            f"{report['missing_directories']} missing directories, "
+            f"{report['missing_files']} missing and {report['extra_files']} extra files"
+        )
+        for register in report["registers"]:
+            log.warn(
+                f"Register {register['archival_identifier']} ({register['title']}): "
+                f"{len(register['missing_files'])} missing, "
+                f"{len(register['extra_files'])} extra files"
+            )
+
+    def __collect(self, partition: PartitionCheck):
+        checks = {
+            directory: future.result()
+            for directory, future in partition.directories.items()
+        }
+        for directory, check in checks.items():
+            self._directories.add(directory)
+            if check is None:
+                self._missing_directories.add(directory)
+                self._cache.pop(directory, None)
+            else:
+                self._cache[directory] = check
+        for register in partition.registers:
+            missing = []
+            missing_dirs = []
+            for directory, names in register.files.items():
+                check = checks[directory]
+                if check is None:
+                    missing_dirs.append(directory)
+                    missing.extend(os.path.join(directory, n) for n in names)
+                    continue
+                absent = set(check[2])
+                missing.extend(os.path.join(directory, n) for n in names if n in absent)
+            extra = []
+            if register.image_dir:
+                check = checks[register.image_dir]
+                if check is None:
+                    missing_dirs.append(register.image_dir)
+                else:
+                    extra = [os.path.join(register.image_dir, n) for n in check[3]]
+            if missing or extra or missing_dirs:
+                self._missing_files += len(missing)
+                self._extra_files += len(extra)
+                self._registers.append(
+                    {
+                        "register": register.reference,
+                        "title": register.title,
+                        "archival_identifier": register.archival_identifier,
+                        "image_dir_path": register.image_dir,
+                        "missing_directories": sorted(set(missing_dirs)),
+                        "missing_files": missing,
+                        "extra_files": extra,
+                    }
+                )
+
+    @staticmethod
+    def __check(directory: str, names: set[str], cached: Check | None) -> Check | None:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        digest = _digest(names)
+        if cached is not None and cached[0] == mtime and cached[1] == digest:
+            return cached
+        try:
+            with os.scandir(directory) as entries:
+                existing = {
+                    os.path.normcase(entry.name) for entry in entries if entry.is_file()
+                }
+        except OSError:
+            return None
+        missing = sorted(names - existing)
+        extra = sorted(
+            name for name in existing - names if name.lower() not in ignored_files
+        )
+        return mtime, digest, missing, extra
+
+    def __load_cache(self) -> dict[str, Check]:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                entries = json.load(f)
+            cache: dict[str, Check] = {}
+            for directory, (mtime, digest, missing, extra) in entries.items():
+                cache[directory] = (mtime, digest, missing, extra)
+            return cache
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def __save_cache(self):
+        # Directories of other conversions are kept
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f)
+        except OSError as e:
+            log.warn(f"Could not write the image check cache: {e}")
@@ -1,13 +1,60 @@
 from abc import abstractmethod
+from os import path
+from typing import IO
 
+from modules.instrumentation import Instrumentation
 from modules.models.matricula_data import MatriculaData
+from modules.writers.compression import Compression, open_compressed
 
 
 class BaseWriter:
-    def __init__(self, output_dir: str):
+    # Per-row methods whose calls are counted when profiling
+    hot_paths: list[str] = []
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
         self.output_dir = output_dir
+        self.compression = compression
+        self.compression_level = compression_level
+        self.instrumentation = Instrumentation()
+
+    @abstractmethod
+    def open(self) -> None:
+        """Create the output files"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    def write_partition(self, data: MatriculaData) -> None:
+        """Append a part of the data to the opened output files"""
+        raise NotImplementedError("Subclasses must implement this method")
 
     @abstractmethod
+    def close(self) -> None:
+        """Flush and close the output files"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def abort(self) -> None:
+        """Close the output files after a failed conversion"""
+        self.close()
+
     def write(self, data: MatriculaData) -> None:
         """Write data to the output file"""
-        raise NotImplementedError("Subclasses must implement this method")
+        self.open()
+        try:
+            self.write_partition(data)
+        except BaseException:
+            self.abort()
+            raise
+        self.close()
+
+    def _open_output(self, file_name: str) -> IO[bytes]:
+        """Open an output file, compressed on the fly with the configured compression"""
+        return open_compressed(
+            path.join(self.output_dir, file_name),
+            self.compression,
+            self.compression_level,
+        )
@@ -0,0 +1,208 @@
+import math
+from abc import abstractmethod
+from collections.abc import Callable
+from os import path
+from typing import TYPE_CHECKING, Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.record_batches import record_batch
+from modules.writers.base_writer import BaseWriter
+from modules.writers.compression import Compression
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Column name, model attribute and pyarrow type factory, in the order of the CSV files
+type ColumnSpec = list[tuple[str, str, str]]
+
+parish_columns: ColumnSpec = [
+    ("model", "model", "string"),
+    ("pk", "pk", "int64"),
+    ("is_test", "is_test", "bool_"),
+    ("identifier", "identifier", "string"),
+    ("title", "title", "string"),
+    ("diocese", "diocese", "string"),
+    ("matricula_identifier", "matricula_identifier", "string"),
+    ("location", "location", "string"),
+    ("parish_church_link", "parish_church_link", "string"),
+    ("parish_church", "parish_church", "string"),
+    ("image_url", "image_url", "string"),
+    ("date_range", "date_range", "string"),
+    ("description", "description", "string"),
+    ("date_start", "date_start", "string"),
+    ("date_end", "date_end", "string"),
+]
+
+register_columns: ColumnSpec = [
+    ("model", "model", "string"),
+    ("pk", "pk", "int64"),
+    ("identifier", "identifier", "string"),
+    ("title", "title", "string"),
+    ("type", "register_type", "string"),
+    ("description", "description", "string"),
+    ("comment", "comment", "string"),
+    ("archival_identifier", "archival_identifier", "string"),
+    ("storage_location", "storage_location", "string"),
+    ("microfilm_identifier", "microfilm_identifier", "string"),
+    ("date_range", "date_range", "string"),
+    ("date_start", "date_start", "string"),
+    ("date_end", "date_end", "string"),
+    ("parish", "parish", "string"),
+    ("image_dir_path", "image_dir_path", "string"),
+    ("ordering", "ordering", "int64"),
+]
+
+image_columns: ColumnSpec = [
+    ("model", "model", "string"),
+    ("pk", "pk", "int64"),
+    ("parish", "parish", "string"),
+    ("register", "register", "string"),
+    ("file_path", "file_path", "string"),
+    ("label", "label", "string"),
+    ("order", "order", "int64"),
+]
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+converters: dict[str, Callable[[Any], Any]] = {
+    "string": lambda v: None if _is_missing(v) else str(v),
+    "int64": lambda v: None if _is_missing(v) else int(v),
+    "bool_": lambda v: None if _is_missing(v) else bool(v),
+}
+
+
+class ColumnarWriter(BaseWriter):
+    """Writes typed columnar files in record batches of batch_size rows, the rows
+    of a partition that do not fill a batch are kept for the next one"""
+
+    batch_size = 65_536
+    extension: str
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        self._files: dict[str, Any] = {}
+        self._schemas: dict[str, "pa.Schema"] = {}
+        self._buffers: dict[str, list[Any]] = {}
+
+    @override
+    def open(self) -> None:
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ValueError(
+                "pyarrow is required to write columnar output files"
+            ) from e
+        for name, columns in self._tables().items():
+            schema = pa.schema(
+                [(column, getattr(pa, type_name)()) for column, _, type_name in columns]
+            )
+            self._schemas[name] = schema
+            self._files[name] = self._open_file(f"{name}.{self.extension}", schema)
+            self._buffers[name] = []
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        for name, rows in (
+            ("parishes", data.parishes),
+            ("registers", data.registers),
+            ("images", data.images),
+        ):
+            buffer = self._buffers[name]
+            buffer.extend(rows)
+            start = 0
+            while len(buffer) - start >= self.batch_size:
+                self._write_batch(name, buffer[start : start + self.batch_size])
+                start += self.batch_size
+            if start:
+                del buffer[:start]
+
+    @override
+    def close(self) -> None:
+        for name in list(self._files):
+            if self._buffers[name]:
+                self._write_batch(name, self._buffers[name])
+            self._files[name].close()
+        self._files = {}
+        self._buffers = {}
+
+    @abstractmethod
+    def _open_file(self, file_name: str, schema: "pa.Schema") -> Any:
+        """Open a file writer that accepts record batches of the given schema"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def _tables(self) -> dict[str, ColumnSpec]:
+        return {
+            "parishes": parish_columns,
+            "registers": register_columns,
+            "images": image_columns,
+        }
+
+    def _write_batch(self, name: str, rows: list[Any]):
+        file_name = f"{name}.{self.extension}"
+        with self.instrumentation.stage(f"write {file_name}", len(rows)):
+            schema = self._schemas[name]
+            columns = [
+                [converters[type_name](getattr(row, attribute)) for row in rows]
+                for _, attribute, type_name in self._tables()[name]
+            ]
+            batch = record_batch(schema.names, columns, schema)
+            self._files[name].write_batch(batch)
+
+
+class ParquetWriter(ColumnarWriter):
+    """Compresses the pages with the configured codec instead of the whole file,
+    so the files stay readable by any Parquet reader"""
+
+    extension = "parquet"
+
+    @override
+    def _open_file(self, file_name: str, schema: "pa.Schema") -> Any:
+        import pyarrow.parquet as pq
+
+        compression = self.compression
+        if compression == Compression.NONE:
+            compression = Compression.ZSTD
+        return pq.ParquetWriter(
+            path.join(self.output_dir, file_name),
+            schema,
+            compression=compression.name.lower(),
+            compression_level=self.compression_level,
+        )
+
+
+class ArrowWriter(ColumnarWriter):
+    extension = "arrow"
+
+    @override
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        self._sinks: list[Any] = []
+
+    @override
+    def _open_file(self, file_name: str, schema: "pa.Schema") -> Any:
+        import pyarrow as pa
+
+        sink = self._open_output(file_name)
+        self._sinks.append(sink)
+        return pa.ipc.new_file(sink, schema)
+
+    @override
+    def close(self) -> None:
+        super().close()
+        # The IPC writers leave Python file objects open
+        for sink in self._sinks:
+            sink.close()
+        self._sinks = []
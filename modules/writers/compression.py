@@ -0,0 +1,80 @@
+import gzip
+import io
+import os
+from enum import Enum
+from typing import IO, cast
+
+# Size of the buffer in front of the compressor, so that many small row
+# writes are handed to the compressor in large blocks
+write_buffer_size = 1 << 20
+
+
+class Compression(Enum):
+    NONE = 0
+    GZIP = 1
+    ZSTD = 2  # Requires the zstandard package
+
+
+extensions = {
+    Compression.NONE: "",
+    Compression.GZIP: ".gz",
+    Compression.ZSTD: ".zst",
+}
+
+default_levels = {
+    Compression.GZIP: 6,
+    Compression.ZSTD: 3,
+}
+
+
+def open_compressed(
+    file_path: str, compression: Compression, level: int | None = None
+) -> IO[bytes]:
+    """Open a binary file for writing that compresses the data as it is written.
+    The extension of the compression is appended to the file path."""
+    if compression == Compression.NONE:
+        return open(file_path, "wb", buffering=write_buffer_size)
+    if level is None:
+        level = default_levels[compression]
+    file_path += extensions[compression]
+    if compression == Compression.GZIP:
+        stream = gzip.GzipFile(file_path, "wb", compresslevel=level, mtime=0)
+        return io.BufferedWriter(stream, write_buffer_size)
+    if compression == Compression.ZSTD:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError(
+                "The zstandard package is required for zstd compression"
+            ) from e
+        compressor = zstandard.ZstdCompressor(level=level)
+        stream = compressor.stream_writer(open(file_path, "wb"), closefd=True)
+        # The zstandard writer implements the raw stream interface
+        return io.BufferedWriter(cast(io.RawIOBase, stream), write_buffer_size)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def find_compressed(file_path: str) -> str | None:
+    """Return the path of a file written by open_compressed with any compression"""
+    for extension in extensions.values():
+        if os.path.exists(file_path + extension):
+            return file_path + extension
+    return None
+
+
+def open_decompressed(file_path: str) -> IO[bytes]:
+    """Open a file for reading, decompressing it according to its extension"""
+    if file_path.endswith(extensions[Compression.GZIP]):
+        return cast(IO[bytes], gzip.open(file_path, "rb"))
+    if file_path.endswith(extensions[Compression.ZSTD]):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError(
+                "The zstandard package is required for zstd compression"
+            ) from e
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(file_path, "rb"), closefd=True
+        )
+        return cast(IO[bytes], reader)
+    return open(file_path, "rb", buffering=write_buffer_size)
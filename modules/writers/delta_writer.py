@@ -0,0 +1,213 @@
+import csv
+import hashlib
+import os
+import sqlite3
+from collections.abc import Callable
+from os import path
+from typing import Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import parish_reference, register_reference
+from modules.writers.base_writer import BaseWriter
+from modules.writers.columnar_writer import (
+    image_columns,
+    parish_columns,
+    register_columns,
+)
+
+deleted_header = ["model", "augias_id", "key"]
+tables = {
+    "parishes": ("parish.parish", [attribute for _, attribute, _ in parish_columns]),
+    "registers": (
+        "parish.register",
+        [attribute for _, attribute, _ in register_columns],
+    ),
+    "images": ("parish.image", [attribute for _, attribute, _ in image_columns]),
+}
+
+
+class DeltaWriter(BaseWriter):
+    """Writes only the rows that are new or changed since the previous run into
+    the new and changed subdirectories, using a writer of the selected output
+    variant for each, and lists the deleted rows in the deleted subdirectory.
+
+    The previous run is kept in a SQLite fingerprint store with an 8 byte hash
+    and the natural key of every row by augias_id. The hashes of a partition are
+    looked up in the store in batches and the fingerprints of this run are
+    written to new tables, which replace the old ones once the run completed."""
+
+    # Ids per fingerprint lookup query, below the SQLite variable limit
+    lookup_size = 500
+    hot_paths = ["_fingerprint"]
+
+    def __init__(
+        self,
+        output_dir: str,
+        store_path: str,
+        create_writer: Callable[[str], BaseWriter],
+    ):
+        super().__init__(output_dir)
+        self.store_path = store_path
+        self._create_writer = create_writer
+        self._new: BaseWriter | None = None
+        self._changed: BaseWriter | None = None
+        self._store: sqlite3.Connection | None = None
+        self.counts: dict[str, dict[str, int]] = {}
+
+    @override
+    def open(self) -> None:
+        store = sqlite3.connect(self.store_path, isolation_level=None)
+        store.execute("PRAGMA journal_mode = WAL")
+        store.execute("BEGIN")
+        for name in tables:
+            for table in (name, f"next_{name}"):
+                store.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (augias_id INTEGER"
+                    " PRIMARY KEY, hash BLOB, key TEXT)"
+                )
+            store.execute(f"DELETE FROM next_{name}")
+        self._store = store
+        self.counts = {
+            name: {"new": 0, "changed": 0, "unchanged": 0, "deleted": 0}
+            for name in tables
+        }
+        self._new = self.__open_writer("new")
+        self._changed = self.__open_writer("changed")
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        assert self._new is not None and self._changed is not None
+        new: dict[str, list[Any]] = {}
+        changed: dict[str, list[Any]] = {}
+        for name, rows in (
+            ("parishes", data.parishes),
+            ("registers", data.registers),
+            ("images", data.images),
+        ):
+            with self.instrumentation.stage(f"compare {name}", len(rows)):
+                new[name], changed[name] = self.__compare(name, rows)
+        for writer, split in ((self._new, new), (self._changed, changed)):
+            if any(split.values()):
+                writer.write_partition(
+                    MatriculaData(
+                        split["parishes"], split["registers"], split["images"]
+                    )
+                )
+
+    @override
+    def close(self) -> None:
+        try:
+            for writer in (self._new, self._changed):
+                if writer is not None:
+                    writer.close()
+            if self._store is not None:
+                with self.instrumentation.stage("write deleted rows"):
+                    self.__write_deleted()
+                self.__replace_fingerprints()
+        finally:
+            self._new = self._changed = None
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+    @override
+    def abort(self) -> None:
+        try:
+            for writer in (self._new, self._changed):
+                if writer is not None:
+                    writer.abort()
+        finally:
+            self._new = self._changed = None
+            if self._store is not None:
+                # The fingerprints of the previous run stay in place
+                self._store.execute("ROLLBACK")
+                self._store.close()
+                self._store = None
+
+    def _fingerprint(self, row: Any, attributes: list[str]) -> bytes:
+        values = []
+        for attribute in attributes:
+            value = getattr(row, attribute)
+            values.append("" if value is None else str(value))
+        return hashlib.blake2b(
+            "\x1f".join(values).encode("utf-8"), digest_size=8
+        ).digest()
+
+    def __open_writer(self, name: str) -> BaseWriter:
+        directory = path.join(self.output_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        writer = self._create_writer(directory)
+        writer.instrumentation = self.instrumentation
+        writer.open()
+        return writer
+
+    def __compare(self, name: str, rows: list[Any]) -> tuple[list[Any], list[Any]]:
+        assert self._store is not None
+        attributes = tables[name][1]
+        fingerprints = [
+            (int(row.augias_id), self._fingerprint(row, attributes), self.__key(row))
+            for row in rows
+        ]
+        previous: dict[int, bytes] = {}
+        for i in range(0, len(fingerprints), self.lookup_size):
+            ids = [
+                augias_id for augias_id, _, _ in fingerprints[i : i + self.lookup_size]
+            ]
+            placeholders = ", ".join("?" * len(ids))
+            previous.update(
+                self._store.execute(
+                    f"SELECT augias_id, hash FROM {name}"
+                    f" WHERE augias_id IN ({placeholders})",
+                    ids,
+                )
+            )
+        self._store.executemany(
+            f"INSERT OR REPLACE INTO next_{name} VALUES (?, ?, ?)", fingerprints
+        )
+        new = []
+        changed = []
+        counts = self.counts[name]
+        for row, (augias_id, fingerprint, _) in zip(rows, fingerprints, strict=True):
+            old = previous.get(augias_id)
+            if old is None:
+                new.append(row)
+            elif old != fingerprint:
+                changed.append(row)
+            else:
+                counts["unchanged"] += 1
+        counts["new"] += len(new)
+        counts["changed"] += len(changed)
+        return new, changed
+
+    @staticmethod
+    def __key(row: Any) -> str:
+        if row.model == "parish.parish":
+            return parish_reference(row.diocese, row.identifier)
+        if row.model == "parish.register":
+            return register_reference(row.parish, row.archival_identifier)
+        return row.file_path
+
+    def __write_deleted(self):
+        assert self._store is not None
+        directory = path.join(self.output_dir, "deleted")
+        os.makedirs(directory, exist_ok=True)
+        for name, (model, _) in tables.items():
+            with open(
+                path.join(directory, f"{name}.csv"), "w", newline="", encoding="utf-8"
+            ) as f:
+                writer = csv.writer(f)
+                writer.writerow(deleted_header)
+                deleted = self._store.execute(
+                    f"SELECT augias_id, key FROM {name} WHERE augias_id NOT IN"
+                    f" (SELECT augias_id FROM next_{name}) ORDER BY augias_id"
+                )
+                for augias_id, key in deleted:
+                    writer.writerow([model, augias_id, key])
+                    self.counts[name]["deleted"] += 1
+
+    def __replace_fingerprints(self):
+        assert self._store is not None
+        for name in tables:
+            self._store.execute(f"DROP TABLE {name}")
+            self._store.execute(f"ALTER TABLE next_{name} RENAME TO {name}")
+        self._store.execute("COMMIT")
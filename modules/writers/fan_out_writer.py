@@ -0,0 +1,132 @@
+import csv
+import os
+from collections.abc import Callable
+from os import path
+from typing import Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import ReferenceKeys, parish_reference
+from modules.writers.base_writer import BaseWriter
+
+diocese_map_header = ["parish_id", "diocese_id"]
+
+
+def read_diocese_map(file_path: str) -> dict[Any, str]:
+    """Read the diocese of every parish from a CSV file with the Augias id of
+    the parish and the diocese id in the columns parish_id and diocese_id"""
+    dioceses: dict[Any, str] = {}
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or not set(diocese_map_header) <= set(
+            reader.fieldnames
+        ):
+            raise ValueError(
+                f"The diocese map needs the columns {', '.join(diocese_map_header)}"
+            )
+        for row in reader:
+            parish_id = row["parish_id"].strip()
+            diocese_id = row["diocese_id"].strip()
+            # The id names the output subdirectory of the diocese
+            if (
+                not diocese_id
+                or diocese_id in (".", "..")
+                or os.sep in diocese_id
+                or (os.altsep is not None and os.altsep in diocese_id)
+            ):
+                raise ValueError(f"Invalid diocese id for parish {parish_id}")
+            # Augias ids are integers, the mapping is looked up by row values
+            key = int(parish_id) if parish_id.lstrip("-").isdigit() else parish_id
+            dioceses[key] = diocese_id
+    return dioceses
+
+
+class FanOutWriter(BaseWriter):
+    """Routes the rows of every partition to a writer per diocese, writing each
+    diocese into a subdirectory named by its id. All writers are open at the
+    same time, so the input is read only once for all dioceses."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        diocese_ids: list[str],
+        create_writer: Callable[[str], BaseWriter],
+    ):
+        super().__init__(output_dir)
+        self.diocese_ids = diocese_ids
+        self._create_writer = create_writer
+        self._writers: dict[str, BaseWriter] = {}
+        # Diocese ids by the diocese reference of the parishes
+        self._dioceses = {
+            ReferenceKeys(diocese_id).diocese: diocese_id for diocese_id in diocese_ids
+        }
+        self.counts: dict[str, dict[str, int]] = {}
+
+    @override
+    def open(self) -> None:
+        self.counts = {
+            diocese_id: {"parishes": 0, "registers": 0, "images": 0}
+            for diocese_id in self.diocese_ids
+        }
+        try:
+            for diocese_id in self.diocese_ids:
+                directory = path.join(self.output_dir, diocese_id)
+                os.makedirs(directory, exist_ok=True)
+                writer = self._create_writer(directory)
+                writer.instrumentation = self.instrumentation
+                writer.open()
+                self._writers[diocese_id] = writer
+        except BaseException:
+            self.abort()
+            raise
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        with self.instrumentation.stage(
+            "route dioceses", len(data.registers) + len(data.images)
+        ):
+            splits = self.__split(data)
+        for diocese, split in splits.items():
+            counts = self.counts[diocese]
+            counts["parishes"] += len(split.parishes)
+            counts["registers"] += len(split.registers)
+            counts["images"] += len(split.images)
+            self._writers[diocese].write_partition(split)
+
+    @override
+    def close(self) -> None:
+        writers = list(self._writers.values())
+        self._writers = {}
+        for writer in writers:
+            writer.close()
+
+    @override
+    def abort(self) -> None:
+        writers = list(self._writers.values())
+        self._writers = {}
+        for writer in writers:
+            writer.abort()
+
+    def __split(self, data: MatriculaData) -> dict[str, MatriculaData]:
+        # Registers and images are extracted together with their parish
+        dioceses: dict[str, str] = {}
+        splits: dict[str, MatriculaData] = {}
+        for parish in data.parishes:
+            diocese = self._dioceses.get(parish.diocese)
+            if diocese is None:
+                raise ValueError(f"No output for the diocese {parish.diocese}")
+            dioceses[parish_reference(parish.diocese, parish.identifier)] = diocese
+            if diocese not in splits:
+                splits[diocese] = MatriculaData([], [], [])
+            splits[diocese].parishes.append(parish)
+        for register in data.registers:
+            splits[self.__diocese(dioceses, register.parish)].registers.append(register)
+        for image in data.images:
+            splits[self.__diocese(dioceses, image.parish)].images.append(image)
+        return splits
+
+    @staticmethod
+    def __diocese(dioceses: dict[str, str], parish_ref: str) -> str:
+        diocese = dioceses.get(parish_ref)
+        if diocese is None:
+            raise ValueError(f"The parish {parish_ref} is not part of the partition")
+        return diocese
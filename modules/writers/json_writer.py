@@ -0,0 +1,170 @@
+import json
+import math
+from collections.abc import Callable, Iterable
+from typing import IO, Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.writers.base_writer import BaseWriter
+from modules.writers.columnar_writer import (
+    ColumnSpec,
+    image_columns,
+    parish_columns,
+    register_columns,
+)
+from modules.writers.compression import Compression
+
+type FieldSpec = list[tuple[str, str]]
+
+# Fields holding serialized natural keys, emitted as JSON lists instead of strings
+reference_fields = {"diocese", "parish", "register"}
+
+
+def _create_encoder() -> Callable[[Any], bytes]:
+    try:
+        import orjson
+
+        return lambda record: orjson.dumps(record, default=_to_builtin)
+    except ImportError:
+        encoder = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), default=_to_builtin
+        )
+        return lambda record: encoder.encode(record).encode("utf-8")
+
+
+def _fields(columns: ColumnSpec) -> FieldSpec:
+    return [
+        (column, attribute)
+        for column, attribute, _ in columns
+        if column not in ("model", "pk")
+    ]
+
+
+def _to_builtin(value: Any) -> Any:
+    # numpy scalars coming from the pandas based extraction
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+parish_fields = _fields(parish_columns)
+register_fields = _fields(register_columns)
+image_fields = _fields(image_columns)
+
+
+class JSONWriter(BaseWriter):
+    """Streams the rows as Django fixture records, one encoded record at a time"""
+
+    extension: str
+    hot_paths = ["_record"]
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        self._files: dict[str, IO[bytes]] = {}
+        self._encode: Callable[[Any], bytes] = _create_encoder()
+        # The reference strings are shared between rows, so each is parsed once
+        self._references: dict[str, Any] = {}
+
+    @override
+    def open(self) -> None:
+        self._references = {}
+        for name in ("parishes", "registers", "images"):
+            f = self._open_output(f"{name}.{self.extension}")
+            self._files[name] = f
+            self._start(f)
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        for name, fields, rows in (
+            ("parishes", parish_fields, data.parishes),
+            ("registers", register_fields, data.registers),
+            ("images", image_fields, data.images),
+        ):
+            if not rows:
+                continue
+            with self.instrumentation.stage(
+                f"write {name}.{self.extension}", len(rows)
+            ):
+                self._write_records(
+                    self._files[name], (self._record(row, fields) for row in rows)
+                )
+
+    @override
+    def close(self) -> None:
+        for f in self._files.values():
+            self._end(f)
+            f.close()
+        self._files = {}
+
+    def _start(self, f: IO[bytes]):
+        pass
+
+    def _end(self, f: IO[bytes]):
+        pass
+
+    def _write_records(self, f: IO[bytes], records: Iterable[dict[str, Any]]):
+        encode = self._encode
+        for record in records:
+            f.write(encode(record))
+            f.write(b"\n")
+
+    def _record(self, row: Any, fields: FieldSpec) -> dict[str, Any]:
+        values: dict[str, Any] = {}
+        for column, attribute in fields:
+            value = getattr(row, attribute)
+            if column in reference_fields and isinstance(value, str):
+                value = self._reference(value)
+            elif isinstance(value, float) and math.isnan(value):
+                value = None
+            values[column] = value
+        return {"model": row.model, "pk": row.pk, "fields": values}
+
+    def _reference(self, value: str) -> Any:
+        reference = self._references.get(value)
+        if reference is None:
+            reference = json.loads(value)
+            self._references[value] = reference
+        return reference
+
+
+class JSONLinesWriter(JSONWriter):
+    extension = "jsonl"
+
+
+class FixtureWriter(JSONWriter):
+    """Writes a JSON array per file that can be loaded with Django's loaddata"""
+
+    extension = "json"
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        self._empty: dict[int, bool] = {}
+
+    @override
+    def _start(self, f: IO[bytes]):
+        f.write(b"[")
+        self._empty[id(f)] = True
+
+    @override
+    def _end(self, f: IO[bytes]):
+        f.write(b"\n]\n")
+        self._empty.pop(id(f), None)
+
+    @override
+    def _write_records(self, f: IO[bytes], records: Iterable[dict[str, Any]]):
+        encode = self._encode
+        separator = b"\n" if self._empty[id(f)] else b",\n"
+        for record in records:
+            f.write(separator)
+            f.write(encode(record))
+            separator = b",\n"
+        self._empty[id(f)] = False
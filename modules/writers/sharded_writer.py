@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import path
+from typing import IO, Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.writers.compression import Compression, extensions
+from modules.writers.csv_writer import (
+    CSVWriter,
+    image_header,
+    parish_header,
+    register_header,
+)
+
+manifest_file_name = "images_manifest.json"
+
+
+class ImageShard:
+    def __init__(self, index: int, header: bytes):
+        self.file_name = f"images_{index:05d}.csv"
+        self.chunks: list[bytes] = [header]
+        self.buffered = len(header)
+        self.rows = 0
+        self.registers = 0
+        self.size = len(header)
+        # Opened by the first write, the writes of a shard run one after another
+        self.file: IO[bytes] | None = None
+        self.last_write: Future[None] | None = None
+
+    def manifest_entry(self, compression: Compression) -> dict[str, Any]:
+        return {
+            "file": self.file_name + extensions[compression],
+            "rows": self.rows,
+            "registers": self.registers,
+            "bytes": self.size,
+        }
+
+
+class ShardedCSVWriter(CSVWriter):
+    """Splits the images into several CSV files of at most shard_rows rows or
+    shard_bytes uncompressed bytes. Shards are only cut between registers, so a
+    single register larger than the limit still ends up in one shard. The rows
+    are encoded on the calling thread, compressing and writing them is left to a
+    pool of writer threads in blocks of buffer_size bytes, so different shards
+    are written in parallel and at most a few blocks are held in memory. The
+    shards are listed in import order in images_manifest.json."""
+
+    # Blocks waiting for a writer thread per thread, before blocking
+    pending_per_thread = 2
+    # Encoded rows of a shard handed to a writer thread at once
+    buffer_size = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+        shard_rows: int | None = None,
+        shard_bytes: int | None = None,
+        writer_threads: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        if not shard_rows and not shard_bytes:
+            raise ValueError("Either a shard row or byte limit is required")
+        self.shard_rows = shard_rows
+        self.shard_bytes = shard_bytes
+        self.writer_threads = writer_threads or min(4, os.cpu_count() or 1)
+        self._header = self.__encode([image_header])
+        self._shards: list[ImageShard] = []
+        self._shard: ImageShard | None = None
+        self._pending: deque[Future[None]] = deque()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @override
+    def open(self) -> None:
+        self._parish_writer = self._open_csv("parishes.csv", parish_header)
+        self._register_writer = self._open_csv("registers.csv", register_header)
+        self._shards = []
+        self._shard = None
+        self._executor = ThreadPoolExecutor(
+            self.writer_threads, thread_name_prefix="shard-writer"
+        )
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        stage = self.instrumentation.stage
+        with stage("write parishes.csv", len(data.parishes)):
+            self._parish_writer.writerows(map(self._parish_row, data.parishes))
+        with stage("write registers.csv", len(data.registers)):
+            self._register_writer.writerows(map(self._register_row, data.registers))
+        with stage("write images.csv", len(data.images)):
+            # Images arrive grouped by register
+            start = 0
+            images = data.images
+            for end in range(1, len(images) + 1):
+                if end == len(images) or images[end].register != images[start].register:
+                    self.__add_register(
+                        self.__encode(map(self._image_row, images[start:end])),
+                        end - start,
+                    )
+                    start = end
+
+    @override
+    def close(self) -> None:
+        try:
+            if self._executor is not None:
+                if self._shard is not None or not self._shards:
+                    self.__submit(self._shard or self.__new_shard(), final=True)
+                with self.instrumentation.stage("wait for shard writers"):
+                    while self._pending:
+                        self._pending.popleft().result()
+                self.__write_manifest()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            self._pending.clear()
+            # Shards left open by a failed conversion
+            for shard in self._shards:
+                if shard.file is not None:
+                    shard.file.close()
+                    shard.file = None
+            super().close()
+
+    def __add_register(self, chunk: bytes, rows: int):
+        shard = self._shard
+        if shard is not None and shard.rows and self.__exceeds(shard, rows, chunk):
+            self.__submit(shard, final=True)
+            shard = None
+        if shard is None:
+            shard = self.__new_shard()
+        shard.chunks.append(chunk)
+        shard.buffered += len(chunk)
+        shard.rows += rows
+        shard.registers += 1
+        shard.size += len(chunk)
+        self._shard = shard
+        if shard.buffered >= self.buffer_size:
+            self.__submit(shard, final=False)
+
+    def __exceeds(self, shard: ImageShard, rows: int, chunk: bytes) -> bool:
+        # Whether adding the register takes the shard over one of the limits
+        return bool(
+            (self.shard_rows and shard.rows + rows > self.shard_rows)
+            or (self.shard_bytes and shard.size + len(chunk) > self.shard_bytes)
+        )
+
+    def __new_shard(self) -> ImageShard:
+        shard = ImageShard(len(self._shards) + 1, self._header)
+        self._shards.append(shard)
+        return shard
+
+    def __submit(self, shard: ImageShard, final: bool):
+        """Hand the buffered rows of the shard to a writer thread, the shard is
+        closed after a final block"""
+        assert self._executor is not None
+        if final:
+            self._shard = None
+        chunks = shard.chunks
+        shard.chunks = []
+        shard.buffered = 0
+        if len(self._pending) >= self.writer_threads * self.pending_per_thread:
+            with self.instrumentation.stage("wait for shard writers"):
+                self._pending.popleft().result()
+        # Blocks are taken in the order they are submitted, so the previous block
+        # of the shard is already being written by another thread or done
+        shard.last_write = self._executor.submit(
+            self.__write_block, shard, chunks, shard.last_write, final
+        )
+        self._pending.append(shard.last_write)
+
+    def __write_block(
+        self,
+        shard: ImageShard,
+        chunks: list[bytes],
+        previous: Future[None] | None,
+        final: bool,
+    ):
+        if previous is not None:
+            previous.result()
+        if shard.file is None:
+            shard.file = self._open_output(shard.file_name)
+        shard.file.writelines(chunks)
+        if final:
+            shard.file.close()
+            shard.file = None
+
+    def __write_manifest(self):
+        manifest = {
+            "shard_rows": self.shard_rows,
+            "shard_bytes": self.shard_bytes,
+            "rows": sum(shard.rows for shard in self._shards),
+            "shards": [
+                shard.manifest_entry(self.compression) for shard in self._shards
+            ],
+        }
+        with open(
+            path.join(self.output_dir, manifest_file_name), "w", encoding="utf-8"
+        ) as f:
+            json.dump(manifest, f, indent=2)
+
+    @staticmethod
+    def __encode(rows: Any) -> bytes:
+        buffer = io.StringIO(newline="")
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
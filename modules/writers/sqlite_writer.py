@@ -0,0 +1,173 @@
+import os
+import sqlite3
+from operator import attrgetter
+from os import path
+from typing import Any, override
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.parish import Parish
+from modules.models.reference_keys import parish_reference, register_reference
+from modules.models.register import Register
+from modules.writers.base_writer import BaseWriter
+from modules.writers.columnar_writer import (
+    ColumnSpec,
+    converters,
+    image_columns,
+    parish_columns,
+    register_columns,
+)
+from modules.writers.compression import Compression
+
+database_file_name = "matricula.sqlite"
+
+column_types = {"string": "TEXT", "int64": "INTEGER", "bool_": "INTEGER"}
+
+# The database is rebuilt on every conversion, so durability is traded for speed
+pragmas = [
+    "PRAGMA page_size = 65536",
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+]
+
+# Created after loading, indexing an empty table and inserting is much slower
+indexes = {
+    "parishes": ["reference"],
+    "registers": ["reference", "parish"],
+    "images": ["parish", "register"],
+}
+
+
+class SQLiteWriter(BaseWriter):
+    """Loads the parishes, registers and images into a single SQLite database.
+    Parishes and registers get an additional reference column with their
+    serialized natural key, so that the tables can be joined on the reference
+    columns of their children."""
+
+    # Rows inserted before the transaction is committed
+    transaction_rows = 1_000_000
+
+    def __init__(
+        self,
+        output_dir: str,
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ):
+        super().__init__(output_dir, compression, compression_level)
+        if compression != Compression.NONE:
+            raise ValueError("Compression is not supported for SQLite output")
+        self._connection: sqlite3.Connection | None = None
+        self._statements: dict[str, str] = {}
+        self._getters: dict[str, list[tuple[Any, Any]]] = {}
+        self._uncommitted = 0
+
+    @override
+    def open(self) -> None:
+        database_path = path.join(self.output_dir, database_file_name)
+        if path.exists(database_path):
+            os.remove(database_path)
+        # Transactions are handled explicitly
+        connection = sqlite3.connect(database_path, isolation_level=None)
+        for pragma in pragmas:
+            connection.execute(pragma)
+        for name, columns in self._tables().items():
+            definitions = ", ".join(
+                f'"{column}" {column_types[type_name]}'
+                for column, _, type_name in columns
+            )
+            connection.execute(f'CREATE TABLE "{name}" ({definitions})')
+            placeholders = ", ".join("?" * len(columns))
+            self._statements[name] = f'INSERT INTO "{name}" VALUES ({placeholders})'
+            self._getters[name] = [
+                (attrgetter(attribute), converters[type_name])
+                for _, attribute, type_name in columns
+                if attribute != "reference"
+            ]
+        connection.execute("BEGIN")
+        self._connection = connection
+        self._uncommitted = 0
+
+    @override
+    def write_partition(self, data: MatriculaData) -> None:
+        for name, rows in (
+            ("parishes", data.parishes),
+            ("registers", data.registers),
+            ("images", data.images),
+        ):
+            if not rows:
+                continue
+            with self.instrumentation.stage(f"write {name}", len(rows)):
+                self.__insert(name, rows)
+
+    @override
+    def close(self) -> None:
+        connection = self._connection
+        if connection is None:
+            return
+        try:
+            connection.execute("COMMIT")
+            with self.instrumentation.stage("create indexes"):
+                for table, columns in indexes.items():
+                    for column in columns:
+                        connection.execute(
+                            f'CREATE INDEX "{table}_{column}" ON "{table}" ("{column}")'
+                        )
+            connection.execute("ANALYZE")
+        finally:
+            connection.close()
+            self._connection = None
+
+    @override
+    def abort(self) -> None:
+        connection = self._connection
+        if connection is None:
+            return
+        self._connection = None
+        try:
+            # Without a journal the rollback cannot undo the committed rows,
+            # so the partial database is removed instead of being indexed
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+        finally:
+            connection.close()
+            database_path = path.join(self.output_dir, database_file_name)
+            if path.exists(database_path):
+                os.remove(database_path)
+
+    def _tables(self) -> dict[str, ColumnSpec]:
+        return {
+            "parishes": [*parish_columns, ("reference", "reference", "string")],
+            "registers": [*register_columns, ("reference", "reference", "string")],
+            "images": image_columns,
+        }
+
+    def __insert(self, name: str, rows: list[Any]):
+        assert self._connection is not None
+        getters = self._getters[name]
+        if name == "parishes":
+            reference = self.__parish_reference
+        elif name == "registers":
+            reference = self.__register_reference
+        else:
+            reference = None
+        values = (
+            [convert(get(row)) for get, convert in getters]
+            + ([reference(row)] if reference else [])
+            for row in rows
+        )
+        self._connection.executemany(self._statements[name], values)
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.transaction_rows:
+            self._connection.execute("COMMIT")
+            self._connection.execute("BEGIN")
+            self._uncommitted = 0
+
+    @staticmethod
+    def __parish_reference(parish: Parish) -> str:
+        return parish_reference(parish.diocese, parish.identifier)
+
+    @staticmethod
+    def __register_reference(register: Register) -> str:
+        return register_reference(register.parish, register.archival_identifier)
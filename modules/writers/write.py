@@ -1,17 +1,53 @@
 from enum import Enum
 
 from modules.models.matricula_data import MatriculaData
+from modules.writers.base_writer import BaseWriter
+from modules.writers.columnar_writer import ArrowWriter, ParquetWriter
+from modules.writers.compression import Compression
 from modules.writers.csv_writer import CSVWriter
+from modules.writers.json_writer import FixtureWriter, JSONLinesWriter
+from modules.writers.sharded_writer import ShardedCSVWriter
+from modules.writers.sqlite_writer import SQLiteWriter
 
 
 class OutputVariant(Enum):
     CSV = 1
+    PARQUET = 2
+    ARROW = 3
+    JSONL = 4
+    FIXTURE = 5
+    SQLITE = 6
 
 
-def write(output_variant: OutputVariant, data: MatriculaData, output_dir: str):
-    writer = None
+def get_writer(
+    output_variant: OutputVariant,
+    output_dir: str,
+    compression: Compression = Compression.NONE,
+    compression_level: int | None = None,
+    shard_rows: int | None = None,
+    shard_bytes: int | None = None,
+) -> BaseWriter:
+    if shard_rows or shard_bytes:
+        if output_variant != OutputVariant.CSV:
+            raise ValueError("Sharded output is only supported for CSV files")
+        return ShardedCSVWriter(
+            output_dir, compression, compression_level, shard_rows, shard_bytes
+        )
     if output_variant == OutputVariant.CSV:
-        writer = CSVWriter
+        return CSVWriter(output_dir, compression, compression_level)
+    if output_variant == OutputVariant.PARQUET:
+        return ParquetWriter(output_dir, compression, compression_level)
+    if output_variant == OutputVariant.ARROW:
+        return ArrowWriter(output_dir, compression, compression_level)
+    if output_variant == OutputVariant.JSONL:
+        return JSONLinesWriter(output_dir, compression, compression_level)
+    if output_variant == OutputVariant.FIXTURE:
+        return FixtureWriter(output_dir, compression, compression_level)
+    if output_variant == OutputVariant.SQLITE:
+        return SQLiteWriter(output_dir, compression, compression_level)
     # Add more writers if needed
+    raise ValueError(f"Unsupported output variant: {output_variant}")
+
 
-    writer(output_dir).write(data)
+def write(output_variant: OutputVariant, data: MatriculaData, output_dir: str):
+    get_writer(output_variant, output_dir).write(data)
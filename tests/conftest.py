@@ -0,0 +1,103 @@
+import csv
+import ntpath
+import os
+
+import pytest
+
+from benchmarks.synthetic import flavors, generate
+from modules.logger import Logger
+from modules.models.image import Image
+from modules.models.parish import Parish
+from modules.models.register import Register
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_dir(tmp_path_factory):
+    """Keeps the log file out of the working directory"""
+    Logger().set_log_dir(str(tmp_path_factory.mktemp("logs")))
+
+
+@pytest.fixture(scope="session", params=list(flavors))
+def augias_db(request, tmp_path_factory) -> tuple[str, str]:
+    """A small synthetic Augias database of every flavor, with its flavor"""
+    path = tmp_path_factory.mktemp("augias") / f"augias_{request.param}.db"
+    generate(str(path), request.param, parishes=4, registers=20, images=300)
+    return request.param, str(path)
+
+
+def make_image(
+    augias_id: int,
+    *,
+    parish: str = "parish",
+    register: str = "register",
+    file_path: str | None = None,
+    order: int | None = None,
+) -> Image:
+    if file_path is None:
+        file_path = f"/scans/{augias_id}.jpg"
+    return Image(
+        augias_id=augias_id,
+        parish=parish,
+        register=register,
+        file_path=file_path,
+        label=str(augias_id),
+        file_name=ntpath.basename(file_path),
+        order=order,
+    )
+
+
+def make_parish(augias_id: int, *, diocese: str = '["diocese"]') -> Parish:
+    return Parish(
+        augias_id=augias_id,
+        identifier=f"parish-{augias_id}",
+        title=f"Parish {augias_id}",
+        diocese=diocese,
+        matricula_identifier=f"parish-{augias_id}",
+        location=None,
+        parish_church_link=None,
+        parish_church=None,
+        image_url=None,
+        date_range=None,
+        description=None,
+    )
+
+
+def make_register(
+    augias_id: int,
+    *,
+    parish: str = "parish",
+    archival_identifier: str | None = None,
+    title: str = "Taufen",
+    image_dir_path: str | None = None,
+) -> Register:
+    if archival_identifier is None:
+        archival_identifier = f"A/{augias_id}"
+    return Register(
+        augias_id=augias_id,
+        identifier=str(augias_id),
+        title=title,
+        register_type="",
+        description=None,
+        comment=None,
+        archival_identifier=archival_identifier,
+        storage_location="",
+        microfilm_identifier=None,
+        date_range="",
+        date_start=None,
+        date_end=None,
+        parish=parish,
+        image_dir_path=image_dir_path,
+        ordering=augias_id,
+    )
+
+
+def write_csv(directory, name: str, header: list[str], rows: list[list[str]]):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{name}.csv"), "w", newline="") as f:
+        csv.writer(f).writerows([header, *rows])
+
+
+def read_csv(directory, name: str) -> list[list[str]]:
+    """The rows of a CSV file written by a writer, without its header"""
+    with open(os.path.join(directory, f"{name}.csv"), newline="") as f:
+        return list(csv.reader(f))[1:]
@@ -0,0 +1,126 @@
+import filecmp
+import json
+import sqlite3
+import sys
+
+import pytest
+
+from benchmarks.synthetic import flavors
+from modules.convert import convert
+from modules.models.reference_keys import parish_reference
+from modules.processors.augias_processor import ExtractionMode
+from modules.profiling import ProfileMode
+from modules.writers.write import OutputVariant
+
+output_files = ["parishes.csv", "registers.csv", "images.csv"]
+
+
+def open_processor(augias_db, mode: ExtractionMode = ExtractionMode.AUTO):
+    flavor, path = augias_db
+    return flavors[flavor](
+        path,
+        lambda _: None,
+        mode=mode,
+        # A pipeline queries the database on its own thread
+        connection_factory=lambda path: sqlite3.connect(path, check_same_thread=False),
+    )
+
+
+@pytest.mark.parametrize(
+    "mode", [ExtractionMode.PARTITIONED, ExtractionMode.JOINED, ExtractionMode.LITE]
+)
+def test_modes_match_tables(augias_db, mode):
+    processor = open_processor(augias_db)
+    assert processor.compare_modes("test", ExtractionMode.TABLES, mode) == []
+
+
+@pytest.mark.parametrize("mode", [ExtractionMode.AUTO, ExtractionMode.LITE])
+def test_without_pandas(augias_db, mode, tmp_path, monkeypatch):
+    (tmp_path / "tables").mkdir()
+    (tmp_path / "lite").mkdir()
+    convert(
+        open_processor(augias_db, ExtractionMode.TABLES),
+        "test",
+        OutputVariant.CSV,
+        str(tmp_path / "tables"),
+    )
+    # Importing pandas raises an ImportError
+    monkeypatch.setitem(sys.modules, "pandas", None)
+    instrumentation = convert(
+        open_processor(augias_db, mode),
+        "test",
+        OutputVariant.CSV,
+        str(tmp_path / "lite"),
+    )
+    assert instrumentation.metadata["extraction_mode"] == "LITE"
+    _, mismatch, errors = filecmp.cmpfiles(
+        tmp_path / "tables", tmp_path / "lite", output_files, shallow=False
+    )
+    assert mismatch == errors == []
+
+
+def test_workers(augias_db, tmp_path):
+    reports = []
+    for workers in (1, 2):
+        output_dir = tmp_path / str(workers)
+        output_dir.mkdir()
+        processor = open_processor(augias_db, ExtractionMode.TABLES)
+        processor.workers = workers
+        reports.append(
+            convert(
+                processor,
+                "test",
+                OutputVariant.CSV,
+                str(output_dir),
+                profile=ProfileMode.CPROFILE,
+            ).report()["stages"]
+        )
+    _, mismatch, errors = filecmp.cmpfiles(
+        tmp_path / "1", tmp_path / "2", output_files, shallow=False
+    )
+    assert mismatch == errors == []
+    # The stages measured by the workers are reported
+    for stage in ("extract registers", "extract images"):
+        assert reports[1][stage]["rows"] == reports[0][stage]["rows"]
+        assert reports[1][stage]["calls"] == reports[0][stage]["calls"]
+    counters = [
+        json.loads((tmp_path / str(workers) / "profile_counters.json").read_text())
+        for workers in (1, 2)
+    ]
+    assert counters[1] == counters[0]
+
+
+def test_tables_partitions(augias_db, tmp_path):
+    (tmp_path / "whole").mkdir()
+    (tmp_path / "partitions").mkdir()
+    convert(
+        open_processor(augias_db, ExtractionMode.TABLES),
+        "test",
+        OutputVariant.CSV,
+        str(tmp_path / "whole"),
+    )
+    processor = open_processor(augias_db, ExtractionMode.TABLES)
+    processor.partition_rows = 50
+    partitions = list(processor.iter_partitions("test"))
+    assert len(partitions) > 1
+    # Every partition holds whole parishes
+    for partition in partitions:
+        references = {
+            parish_reference(parish.diocese, parish.identifier)
+            for parish in partition.parishes
+        }
+        assert {register.parish for register in partition.registers} <= references
+        assert {image.parish for image in partition.images} <= references
+    instrumentation = convert(
+        processor,
+        "test",
+        OutputVariant.CSV,
+        str(tmp_path / "partitions"),
+        pipelined=True,
+    )
+    pipeline = instrumentation.metadata["pipeline"]
+    assert pipeline["transform"]["items"] == len(partitions)
+    _, mismatch, errors = filecmp.cmpfiles(
+        tmp_path / "whole", tmp_path / "partitions", output_files, shallow=False
+    )
+    assert mismatch == errors == []
@@ -0,0 +1,37 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from conftest import make_image
+
+from modules.models.image import Image
+from modules.models.matricula_data import MatriculaData
+from modules.writers.columnar_writer import ArrowWriter, ParquetWriter
+
+
+def images(start: int, count: int) -> list[Image]:
+    return [make_image(index, order=index) for index in range(start, start + count)]
+
+
+def write(writer, partitions: list[int]):
+    writer.batch_size = 100
+    writer.open()
+    start = 0
+    for count in partitions:
+        writer.write_partition(MatriculaData([], [], images(start, count)))
+        start += count
+    writer.close()
+
+
+def test_parquet_row_groups_have_at_most_batch_size_rows(tmp_path):
+    write(ParquetWriter(str(tmp_path)), [250, 30, 90])
+    metadata = pq.ParquetFile(tmp_path / "images.parquet").metadata
+    sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    assert sizes == [100, 100, 100, 70]
+    table = pq.read_table(tmp_path / "images.parquet")
+    assert table.column("order").to_pylist() == list(range(370))
+
+
+def test_arrow_batches_have_at_most_batch_size_rows(tmp_path):
+    write(ArrowWriter(str(tmp_path)), [1000])
+    with pa.ipc.open_file(tmp_path / "images.arrow") as reader:
+        sizes = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    assert sizes == [100] * 10
@@ -0,0 +1,53 @@
+import gzip
+
+import pytest
+
+from modules.writers.compression import (
+    Compression,
+    find_compressed,
+    open_compressed,
+    open_decompressed,
+)
+
+content = b"".join(b"%d,image,%d.jpg\n" % (index, index) for index in range(10_000))
+
+
+@pytest.mark.parametrize("compression", list(Compression))
+def test_round_trip(tmp_path, compression):
+    if compression == Compression.ZSTD:
+        pytest.importorskip("zstandard")
+    file_path = str(tmp_path / "images.csv")
+    with open_compressed(file_path, compression) as f:
+        # Many small writes, as the writers make them
+        for line in content.splitlines(keepends=True):
+            f.write(line)
+    compressed_path = find_compressed(file_path)
+    assert compressed_path is not None
+    assert compressed_path.endswith(
+        ".csv"
+        + {
+            Compression.NONE: "",
+            Compression.GZIP: ".gz",
+            Compression.ZSTD: ".zst",
+        }[compression]
+    )
+    with open_decompressed(compressed_path) as f:
+        assert f.read() == content
+
+
+def test_gzip_is_reproducible(tmp_path):
+    outputs = []
+    for index in range(2):
+        # The file name is part of the gzip header
+        (tmp_path / str(index)).mkdir()
+        file_path = str(tmp_path / str(index) / "images.csv")
+        with open_compressed(file_path, Compression.GZIP, level=1) as f:
+            f.write(content)
+        with open(file_path + ".gz", "rb") as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert gzip.decompress(outputs[0]) == content
+
+
+def test_find_compressed_missing(tmp_path):
+    assert find_compressed(str(tmp_path / "images.csv")) is None
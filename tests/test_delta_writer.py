@@ -0,0 +1,62 @@
+from conftest import make_image, make_parish, make_register, read_csv
+
+from modules.models.matricula_data import MatriculaData
+from modules.writers.csv_writer import CSVWriter
+from modules.writers.delta_writer import DeltaWriter
+
+
+def run(tmp_path, name: str, labels: dict[int, str]) -> DeltaWriter:
+    output_dir = tmp_path / name
+    output_dir.mkdir()
+    writer = DeltaWriter(str(output_dir), str(tmp_path / "store.sqlite"), CSVWriter)
+    images = [
+        make_image(augias_id, file_path=f"/scans/{augias_id}.jpg")
+        for augias_id in labels
+    ]
+    for image in images:
+        image.label = labels[image.augias_id]
+    writer.write(MatriculaData([make_parish(1)], [make_register(1)], images))
+    return writer
+
+
+def test_second_run_writes_the_differences(tmp_path):
+    first = run(tmp_path, "first", {1: "1", 2: "2", 3: "3"})
+    assert first.counts["images"] == {
+        "new": 3,
+        "changed": 0,
+        "unchanged": 0,
+        "deleted": 0,
+    }
+    assert len(read_csv(tmp_path / "first" / "new", "images")) == 3
+
+    second = run(tmp_path, "second", {1: "1", 2: "Taufen", 4: "4"})
+    assert second.counts["images"] == {
+        "new": 1,
+        "changed": 1,
+        "unchanged": 1,
+        "deleted": 1,
+    }
+    assert second.counts["registers"]["unchanged"] == 1
+    output_dir = tmp_path / "second"
+    # Columns: model, pk, parish, register, file_path, label, order
+    [new] = read_csv(output_dir / "new", "images")
+    assert new[4:6] == ["/scans/4.jpg", "4"]
+    [changed] = read_csv(output_dir / "changed", "images")
+    assert changed[4:6] == ["/scans/2.jpg", "Taufen"]
+    assert read_csv(output_dir / "changed", "registers") == []
+    assert read_csv(output_dir / "deleted", "images") == [
+        ["parish.image", "3", "/scans/3.jpg"]
+    ]
+
+
+def test_aborted_run_keeps_the_fingerprints(tmp_path):
+    run(tmp_path, "first", {1: "1"})
+    writer = DeltaWriter(
+        str(tmp_path / "aborted"), str(tmp_path / "store.sqlite"), CSVWriter
+    )
+    writer.open()
+    writer.write_partition(MatriculaData([], [], [make_image(2)]))
+    writer.abort()
+    second = run(tmp_path, "second", {1: "1"})
+    assert second.counts["images"]["unchanged"] == 1
+    assert second.counts["images"]["new"] == 0
@@ -0,0 +1,54 @@
+import csv
+import json
+import os
+
+from conftest import write_csv
+
+from modules.diff import diff_outputs, summary_file_name
+
+parish_header = ["identifier", "name"]
+register_header = ["parish", "archival_identifier", "title"]
+image_header = ["register", "file_path", "label"]
+
+
+def write_output(directory, registers: list[list[str]], images: list[list[str]]):
+    write_csv(directory, "parishes", parish_header, [["p1", "Parish"]])
+    write_csv(directory, "registers", register_header, registers)
+    write_csv(directory, "images", image_header, images)
+
+
+def test_diff_outputs(tmp_path):
+    images = [["r1", f"{index:04}.jpg", str(index)] for index in range(500)]
+    write_output(
+        tmp_path / "old",
+        [["p1", "001", "Taufen"], ["p1", "002", "Trauungen"]],
+        images,
+    )
+    new_images = [["r1", "0000.jpg", "Titel"], *images[2:], ["r1", "0500.jpg", "500"]]
+    # The file order does not matter
+    new_images.reverse()
+    write_output(
+        tmp_path / "new",
+        [["p1", "002", "Trauungen"], ["p1", "003", "Sterbefälle"]],
+        new_images,
+    )
+    output_dir = tmp_path / "diff"
+    os.makedirs(output_dir)
+    summary = diff_outputs(
+        str(tmp_path / "old"), str(tmp_path / "new"), str(output_dir), 4096
+    )
+    assert summary == {
+        "parishes": {"added": 0, "removed": 0, "changed": 0, "unchanged": 1},
+        "registers": {"added": 1, "removed": 1, "changed": 0, "unchanged": 1},
+        "images": {"added": 1, "removed": 1, "changed": 1, "unchanged": 498},
+    }
+    with open(output_dir / summary_file_name) as f:
+        assert json.load(f) == summary
+    with open(output_dir / "images_diff.csv", newline="") as f:
+        assert list(csv.reader(f)) == [
+            ["change", *image_header],
+            ["changed_from", "r1", "0000.jpg", "0"],
+            ["changed_to", "r1", "0000.jpg", "Titel"],
+            ["removed", "r1", "0001.jpg", "1"],
+            ["added", "r1", "0500.jpg", "500"],
+        ]
@@ -0,0 +1,21 @@
+import random
+
+from modules import external_sort as external_sort_module
+from modules.external_sort import external_sort, item_size
+
+
+def test_sorts_in_memory():
+    assert list(external_sort([3, 1, 2])) == [1, 2, 3]
+
+
+def test_spilled_sort_is_stable(monkeypatch):
+    # Few runs merged at once to also go through the intermediate merges
+    monkeypatch.setattr(external_sort_module, "max_fan_in", 3)
+    generator = random.Random(0)
+    items = [(generator.randrange(10), index) for index in range(2000)]
+    result = list(
+        external_sort(
+            items, key=lambda item: item[0], memory_budget=2048, size=item_size
+        )
+    )
+    assert result == sorted(items, key=lambda item: item[0])
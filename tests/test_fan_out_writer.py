@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from conftest import make_image, make_parish, make_register, read_csv, write_csv
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import ReferenceKeys, parish_reference
+from modules.writers.csv_writer import CSVWriter
+from modules.writers.fan_out_writer import (
+    FanOutWriter,
+    diocese_map_header,
+    read_diocese_map,
+)
+
+
+def parish_data(augias_id: int, diocese_id: str) -> MatriculaData:
+    parish = make_parish(augias_id, diocese=ReferenceKeys(diocese_id).diocese)
+    reference = parish_reference(parish.diocese, parish.identifier)
+    registers = [make_register(augias_id, parish=reference)]
+    images = [make_image(augias_id * 10 + i, parish=reference) for i in range(3)]
+    return MatriculaData([parish], registers, images)
+
+
+def test_rows_are_routed_by_the_diocese_map(tmp_path):
+    write_csv(tmp_path, "dioceses", diocese_map_header, [["1", "a"], ["2", "b"]])
+    dioceses = read_diocese_map(str(tmp_path / "dioceses.csv"))
+    assert dioceses == {1: "a", 2: "b"}
+    output_dir = tmp_path / "output"
+    writer = FanOutWriter(str(output_dir), sorted(set(dioceses.values())), CSVWriter)
+    writer.open()
+    # The parishes of both dioceses in a single partition
+    first, second = (
+        parish_data(parish_id, diocese_id) for parish_id, diocese_id in dioceses.items()
+    )
+    writer.write_partition(
+        MatriculaData(
+            first.parishes + second.parishes,
+            first.registers + second.registers,
+            first.images + second.images,
+        )
+    )
+    writer.close()
+    assert writer.counts == {
+        "a": {"parishes": 1, "registers": 1, "images": 3},
+        "b": {"parishes": 1, "registers": 1, "images": 3},
+    }
+    # Columns: model, pk, parish, register, file_path, label, order
+    images = read_csv(output_dir / "b", "images")
+    assert [row[4] for row in images] == [
+        "/scans/20.jpg",
+        "/scans/21.jpg",
+        "/scans/22.jpg",
+    ]
+
+
+def test_unmapped_diocese(tmp_path):
+    writer = FanOutWriter(str(tmp_path), ["a"], CSVWriter)
+    writer.open()
+    with pytest.raises(ValueError, match="No output for the diocese"):
+        writer.write_partition(parish_data(1, "b"))
+    writer.abort()
+
+
+@pytest.mark.parametrize("diocese_id", ["", "..", "a/b", "a\\b"])
+def test_invalid_diocese_ids(tmp_path, monkeypatch, diocese_id):
+    # Both separators of Windows, also when the tests run elsewhere
+    monkeypatch.setattr(os, "sep", "\\")
+    monkeypatch.setattr(os, "altsep", "/")
+    write_csv(tmp_path, "dioceses", diocese_map_header, [["1", diocese_id]])
+    with pytest.raises(ValueError, match="Invalid diocese id for parish 1"):
+        read_diocese_map(str(tmp_path / "dioceses.csv"))
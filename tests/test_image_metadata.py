@@ -0,0 +1,95 @@
+import hashlib
+import struct
+
+from conftest import make_image
+
+from modules.image_headers import read_dimensions, read_metadata
+from modules.image_metadata import ImageMetadataExtractor, metadata_file_name
+from modules.models.matricula_data import MatriculaData
+
+# Headers of 3x2 images, without the image data
+jpeg = (
+    b"\xff\xd8"
+    + b"\xff\xe0"
+    + struct.pack(">H", 16)
+    + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    + b"\xff\xc0"
+    + struct.pack(">HBHHB", 11, 8, 2, 3, 1)
+    + b"\x01\x11\x00"
+    + b"\xff\xd9"
+)
+png = (
+    b"\x89PNG\r\n\x1a\n"
+    + struct.pack(">I", 13)
+    + b"IHDR"
+    + struct.pack(">IIBBBBB", 3, 2, 8, 2, 0, 0, 0)
+    + b"\x00\x00\x00\x00"
+)
+# Little-endian with a SHORT width and big-endian with a LONG height
+tiff = (
+    b"II*\x00"
+    + struct.pack("<IH", 8, 2)
+    + struct.pack("<HHIHH", 256, 3, 1, 3, 0)
+    + struct.pack("<HHII", 257, 4, 1, 2)
+    + struct.pack("<I", 0)
+)
+big_endian_tiff = (
+    b"MM\x00*"
+    + struct.pack(">IH", 8, 2)
+    + struct.pack(">HHIHH", 256, 3, 1, 3, 0)
+    + struct.pack(">HHII", 257, 4, 1, 2)
+    + struct.pack(">I", 0)
+)
+
+
+def test_read_dimensions():
+    assert read_dimensions(jpeg) == (3, 2, "jpeg")
+    assert read_dimensions(png) == (3, 2, "png")
+    assert read_dimensions(tiff) == (3, 2, "tiff")
+    assert read_dimensions(big_endian_tiff) == (3, 2, "tiff")
+    # Truncated and unknown headers have no dimensions
+    assert read_dimensions(png[:20]) == (None, None, None)
+    assert read_dimensions(b"not an image") == (None, None, None)
+
+
+def test_read_metadata(tmp_path):
+    file_path = tmp_path / "1.jpg"
+    file_path.write_bytes(jpeg)
+    assert read_metadata(str(file_path)) == (
+        len(jpeg),
+        3,
+        2,
+        "jpeg",
+        hashlib.sha256(jpeg).hexdigest(),
+    )
+    assert read_metadata(str(tmp_path / "missing.jpg")) is None
+
+
+def test_extractor_uses_the_cache(tmp_path):
+    image_dir = tmp_path / "scans"
+    image_dir.mkdir()
+    for name, content in (("1.jpg", jpeg), ("2.png", png), ("3.tif", tiff)):
+        (image_dir / name).write_bytes(content)
+    data = MatriculaData(
+        [],
+        [],
+        [
+            make_image(index, file_path=str(image_dir / name))
+            for index, name in enumerate(["1.jpg", "2.png", "3.tif", "4.jpg"])
+        ],
+    )
+    cache_path = str(tmp_path / "cache" / "image_metadata.sqlite")
+    summaries = []
+    for _ in range(2):
+        extractor = ImageMetadataExtractor(str(tmp_path), cache_path, max_workers=1)
+        extractor.start()
+        extractor.add(data)
+        summaries.append(extractor.finish())
+    assert summaries == [
+        {"images": 4, "cached": 0, "extracted": 3, "missing": 1},
+        {"images": 4, "cached": 3, "extracted": 0, "missing": 1},
+    ]
+    rows = (tmp_path / metadata_file_name).read_text().splitlines()
+    assert rows[2] == f"register,{image_dir / '2.png'},{len(png)},3,2,png," + (
+        hashlib.sha256(png).hexdigest()
+    )
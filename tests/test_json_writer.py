@@ -0,0 +1,70 @@
+import json
+import sys
+
+import pytest
+from conftest import make_image, make_parish, make_register
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import parish_reference, register_reference
+from modules.writers.json_writer import FixtureWriter, JSONLinesWriter
+
+
+def data() -> MatriculaData:
+    parish = make_parish(1)
+    reference = parish_reference(parish.diocese, parish.identifier)
+    register = make_register(1, parish=reference)
+    images = [
+        make_image(
+            index,
+            parish=reference,
+            register=register_reference(reference, register.archival_identifier),
+            order=index,
+        )
+        for index in range(3)
+    ]
+    images[0].label = "Taufen 1808–1810"
+    return MatriculaData([parish], [register], images)
+
+
+def write_jsonl(output_dir) -> list[dict]:
+    output_dir.mkdir(exist_ok=True)
+    JSONLinesWriter(str(output_dir)).write(data())
+    with open(output_dir / "images.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("orjson", [True, False])
+def test_jsonl_round_trip(tmp_path, monkeypatch, orjson):
+    if orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setitem(sys.modules, "orjson", None)
+    records = write_jsonl(tmp_path)
+    assert len(records) == 3
+    assert records[0] == {
+        "model": "parish.image",
+        "pk": None,
+        "fields": records[0]["fields"],
+    }
+    fields = records[0]["fields"]
+    # The references are written as the natural keys, not as strings
+    assert fields["parish"] == ["diocese", "parish-1", True]
+    assert fields["register"] == ["diocese", "parish-1", True, "A/1"]
+    assert fields["label"] == "Taufen 1808–1810"
+    assert fields["order"] == 0
+
+
+def test_encoders_write_the_same_records(tmp_path, monkeypatch):
+    pytest.importorskip("orjson")
+    with_orjson = write_jsonl(tmp_path / "orjson")
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    assert write_jsonl(tmp_path / "json") == with_orjson
+
+
+def test_fixture_is_a_json_array(tmp_path):
+    FixtureWriter(str(tmp_path)).write(data())
+    with open(tmp_path / "registers.json", encoding="utf-8") as f:
+        [register] = json.load(f)
+    assert register["fields"]["archival_identifier"] == "A/1"
+    with open(tmp_path / "images.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == 3
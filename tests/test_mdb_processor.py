@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic import flavors
+
+pa = pytest.importorskip("pyarrow")
+
+
+def open_processor(augias_db):
+    flavor, path = augias_db
+    return flavors[flavor](path, lambda _: None, connection_factory=sqlite3.connect)
+
+
+def test_stream_table_batches(augias_db):
+    processor = open_processor(augias_db)
+    processor.fetch_size = 128
+    key_map = processor.key_map
+    columns = [
+        key_map.img_parent_col,
+        key_map.image_cols.augias_id,
+        key_map.image_cols.file_path,
+    ]
+    batches = list(processor._stream_table_batches(key_map.imgs_table_name, columns))
+    assert [batch.num_rows for batch in batches] == [128, 128, 44]
+    for batch in batches:
+        assert batch.schema == pa.schema(
+            [
+                (columns[0], pa.int64()),
+                (columns[1], pa.int64()),
+                (columns[2], pa.string()),
+            ]
+        )
+    rows = [
+        row
+        for batch in batches
+        for row in zip(*(column.to_pylist() for column in batch.columns))
+    ]
+    assert rows == processor._get_rows(key_map.imgs_table_name, columns)
+
+
+def test_query_columns(augias_db):
+    processor = open_processor(augias_db)
+    processor.fetch_size = 8
+    key_map = processor.key_map
+    register_cols = key_map.register_cols
+    table = processor._fetch_table(
+        f"SELECT [{register_cols.identifier}], [{register_cols.title}], "
+        f"[{register_cols.date_start}] FROM [{key_map.register_table_name}] "
+        f"ORDER BY [{register_cols.identifier}]"
+    )
+    assert table is not None
+    assert table.schema.types == [pa.int64(), pa.string(), pa.int64()]
+    assert table.column(0).to_pylist() == list(range(1, 21))
+    df = processor._query(
+        f"SELECT * FROM [{key_map.register_table_name}] "
+        f"WHERE [{register_cols.identifier}] = ?",
+        (3,),
+    )
+    assert df is not None
+    assert len(df) == 1 and df[register_cols.identifier].dtype == "int64"
+
+
+def test_query_mixed_types(augias_db):
+    # Columns that Arrow cannot type are read as rows
+    df = open_processor(augias_db)._query("SELECT 1 AS a UNION ALL SELECT 'x'")
+    assert df is not None
+    assert df["a"].tolist() == [1, "x"]
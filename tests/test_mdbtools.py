@@ -0,0 +1,105 @@
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from modules.processors import mdbtools
+from modules.processors.mdbtools import MDBTools, _convert, column_pattern, null_value
+
+schema = """CREATE TABLE [M_BESTAENDE]
+ (
+\t[B_ID]\t\t\tLong Integer, 
+\t[B_NAME]\t\t\tText (255), 
+\t[B_DATUM]\t\t\tDateTime, 
+\t[B_AKTIV]\t\t\tBoolean
+);
+"""
+export = """B_ID,B_NAME,B_DATUM,B_AKTIV
+1,"Taufen, Band 1","1850-01-02 00:00:00",1
+2,"",\x1f,0
+x,\x1f,"1850",1
+"""
+
+
+def write_script(path, output: str, exit_code: int = 0) -> str:
+    path.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        f"sys.stdout.write({output!r})\n"
+        f"sys.exit({exit_code})\n"
+    )
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def commands(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        mdbtools, "schema_command", write_script(tmp_path / "mdb-schema", schema)
+    )
+    monkeypatch.setattr(
+        mdbtools, "export_command", write_script(tmp_path / "mdb-export", export)
+    )
+    return tmp_path
+
+
+def test_column_pattern():
+    match = column_pattern.fullmatch("\t[Titel]\t\t\tText (255), ")
+    assert match is not None
+    assert (match["name"], match["type"]) == ("Titel", "Text")
+    match = column_pattern.fullmatch("\t[OB_ID]\t\t\tLong Integer")
+    assert match is not None
+    assert (match["name"], match["type"]) == ("OB_ID", "Long Integer")
+    assert column_pattern.fullmatch("CREATE TABLE [M_BESTAENDE]") is None
+
+
+def test_convert():
+    assert _convert(int, "12") == 12
+    assert _convert(Decimal, "1.50") == Decimal("1.50")
+    assert _convert(int, null_value) is None
+    assert _convert(str, null_value) is None
+    # Values that do not fit their column type are kept as exported
+    assert _convert(int, "") == ""
+    assert _convert(Decimal, "n/a") == "n/a"
+
+
+def test_column_types(commands):
+    assert MDBTools("augias.mdb").column_types("M_BESTAENDE") == {
+        "B_ID": "Long Integer",
+        "B_NAME": "Text",
+        "B_DATUM": "DateTime",
+        "B_AKTIV": "Boolean",
+    }
+
+
+def test_read(commands):
+    names, rows = MDBTools("augias.mdb").read("M_BESTAENDE")
+    assert names == ["B_ID", "B_NAME", "B_DATUM", "B_AKTIV"]
+    assert rows == [
+        (1, "Taufen, Band 1", datetime(1850, 1, 2), True),
+        (2, "", None, False),
+        ("x", None, "1850", True),
+    ]
+
+
+def test_prefetched_projection(commands):
+    reader = MDBTools("augias.mdb")
+    reader.prefetch({"M_BESTAENDE": ["B_AKTIV", "B_ID"]})
+    assert reader.read("M_BESTAENDE", ["B_AKTIV", "B_ID"]) == (
+        ["B_AKTIV", "B_ID"],
+        [(True, 1), (False, 2), (True, "x")],
+    )
+
+
+def test_unknown_column(commands):
+    with pytest.raises(ValueError, match="B_ORT"):
+        list(MDBTools("augias.mdb").stream("M_BESTAENDE", ["B_ID", "B_ORT"]))
+
+
+def test_failed_export(commands, monkeypatch):
+    monkeypatch.setattr(
+        mdbtools, "export_command", write_script(commands / "failing", "", 1)
+    )
+    with pytest.raises(ValueError, match="failed for table M_BESTAENDE"):
+        list(MDBTools("augias.mdb").stream("M_BESTAENDE"))
@@ -0,0 +1,147 @@
+import csv
+import gzip
+import os
+
+from conftest import read_csv, write_csv
+
+from modules.merge import _merge_file, merge_columns
+from modules.writers.compression import Compression
+
+register_header = ["parish", "archival_identifier", "title", "ordering"]
+image_header = ["register", "file_path", "label", "order"]
+
+
+def merge(
+    tmp_path,
+    name: str,
+    header: list[str],
+    inputs: list[list[list[str]]],
+    compression: Compression = Compression.NONE,
+):
+    sources = []
+    for index, rows in enumerate(inputs):
+        source_dir = tmp_path / f"source_{index}"
+        write_csv(source_dir, name, header, rows)
+        sources.append((f"input_{index}.mdb", str(source_dir)))
+    output_dir = tmp_path / "output"
+    os.makedirs(output_dir, exist_ok=True)
+    group_columns, key_columns, order_column = merge_columns[name]
+    file_merge = _merge_file(
+        name,
+        group_columns,
+        key_columns,
+        order_column,
+        sources,
+        str(output_dir),
+        compression,
+        None,
+        memory_budget=2048,
+    )
+    if compression != Compression.NONE:
+        return file_merge, [], []
+    return (
+        file_merge,
+        read_csv(output_dir, name),
+        read_csv(output_dir, f"{name}_conflicts") if file_merge.conflicts_file else [],
+    )
+
+
+def test_images_keep_the_page_order_of_each_input(tmp_path):
+    first = [
+        ["r1", "/b/0002.jpg", "2", ""],
+        ["r2", "/c/0001.jpg", "1", ""],
+        ["r1", "/b/0010.jpg", "10", ""],
+    ]
+    second = [
+        ["r1", "/a/0001.jpg", "1", ""],
+        ["r1", "/b/0002.jpg", "2", ""],
+        ["r1", "/a/0003.jpg", "3", ""],
+    ]
+    file_merge, rows, _ = merge(tmp_path, "images", image_header, [first, second])
+    assert [row[1] for row in rows] == [
+        "/b/0002.jpg",
+        "/b/0010.jpg",
+        "/a/0001.jpg",
+        "/a/0003.jpg",
+        "/c/0001.jpg",
+    ]
+    assert file_merge.summary() == {
+        "rows": 5,
+        "duplicates": 1,
+        "conflicts": 0,
+        "conflicts_file": None,
+    }
+
+
+def test_register_orderings_are_renumbered(tmp_path):
+    first = [["p1", "A", "Taufen", "1"], ["p1", "C", "Trauungen", "2"]]
+    second = [
+        ["p1", "B", "Sterbefälle", "1"],
+        ["p1", "A", "Taufen", "2"],
+        ["p2", "D", "Taufen", "1"],
+    ]
+    file_merge, rows, conflicts = merge(
+        tmp_path, "registers", register_header, [first, second]
+    )
+    assert rows == [
+        ["p1", "A", "Taufen", "1"],
+        ["p1", "C", "Trauungen", "2"],
+        ["p1", "B", "Sterbefälle", "3"],
+        ["p2", "D", "Taufen", "1"],
+    ]
+    # A different ordering alone is no conflict
+    assert file_merge.summary() == {
+        "rows": 4,
+        "duplicates": 1,
+        "conflicts": 0,
+        "conflicts_file": None,
+    }
+    assert conflicts == []
+
+
+def test_conflicting_rows_are_listed_with_their_input(tmp_path):
+    first = [["p1", "A", "Taufen", "1"]]
+    second = [["p1", "A", "Taufen 1800-1850", "1"]]
+    third = [["p1", "A", "Taufen 1800", "1"]]
+    file_merge, rows, conflicts = merge(
+        tmp_path, "registers", register_header, [first, second, third]
+    )
+    assert rows == [["p1", "A", "Taufen", "1"]]
+    assert file_merge.conflicts == 2
+    assert conflicts == [
+        ["input_0.mdb", "p1", "A", "Taufen", "1"],
+        ["input_1.mdb", "p1", "A", "Taufen 1800-1850", "1"],
+        ["input_2.mdb", "p1", "A", "Taufen 1800", "1"],
+    ]
+
+
+def test_rows_are_sorted_beyond_the_memory_budget(tmp_path):
+    inputs = [
+        [[f"r{i % 7}", f"/{source}/{i:04d}.jpg", str(i), ""] for i in range(300)]
+        for source in range(2)
+    ]
+    file_merge, rows, _ = merge(tmp_path, "images", image_header, inputs)
+    assert file_merge.rows == 600
+    for register in range(7):
+        paths = [row[1] for row in rows if row[0] == f"r{register}"]
+        assert paths == sorted(paths)
+
+
+def test_conflicts_are_compressed(tmp_path):
+    first = [["p1", "A", "Taufen", "1"]]
+    second = [["p1", "A", "Taufen 1800", "1"]]
+    file_merge, _, _ = merge(
+        tmp_path, "registers", register_header, [first, second], Compression.GZIP
+    )
+    assert file_merge.summary()["conflicts_file"] == "registers_conflicts.csv.gz"
+    with gzip.open(tmp_path / "output" / "registers_conflicts.csv.gz", "rt") as f:
+        assert list(csv.reader(f))[1:] == [
+            ["input_0.mdb", "p1", "A", "Taufen", "1"],
+            ["input_1.mdb", "p1", "A", "Taufen 1800", "1"],
+        ]
+
+
+def test_no_conflicts_file_without_conflicts(tmp_path):
+    rows = [["p1", "A", "Taufen", "1"]]
+    merge(tmp_path, "registers", register_header, [rows, rows])
+    assert sorted(os.listdir(tmp_path / "output")) == ["registers.csv"]
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from modules.pipeline import Pipeline
+
+
+def test_items_pass_through_in_order():
+    pipeline = Pipeline(queue_size=2)
+    pipeline.start()
+    items = list(
+        pipeline.consume("write", pipeline.threaded("transform", iter(range(100))))
+    )
+    pipeline.stop()
+    assert items == list(range(100))
+    assert pipeline.stages["transform"].items == 100
+    assert pipeline.stages["write"].items == 100
+
+
+def test_producer_errors_are_raised_in_the_consumer():
+    def produce():
+        yield 1
+        raise RuntimeError("fetch failed")
+
+    pipeline = Pipeline()
+    pipeline.start()
+    with pytest.raises(RuntimeError, match="fetch failed"):
+        list(pipeline.threaded("fetch", produce()))
+    pipeline.stop()
+
+
+def test_stop_waits_for_the_producing_threads():
+    # The fetch thread is still running when the writer fails
+    fetched = threading.Event()
+
+    def fetch():
+        for item in range(1000):
+            fetched.set()
+            yield item
+
+    pipeline = Pipeline(queue_size=1)
+    pipeline.start()
+    transformed = pipeline.threaded("transform", pipeline.threaded("fetch", fetch()))
+    with pytest.raises(RuntimeError):
+        for _ in pipeline.consume("write", transformed):
+            fetched.wait()
+            raise RuntimeError("disk full")
+    pipeline.stop()
+    assert not [
+        thread for thread in threading.enumerate() if thread.name.startswith("pipeline")
+    ]
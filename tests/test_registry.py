@@ -0,0 +1,83 @@
+from typing import override
+
+import pytest
+
+from modules.models.matricula_data import MatriculaData
+from modules.processors import registry
+from modules.processors.augias_9_2_processor import Augias92Processor
+from modules.processors.augias_x_processor import AugiasXProcessor
+from modules.processors.base_processor import BaseProcessor
+from modules.processors.mdb_processor import version_offset
+
+
+class FakeProcessor(BaseProcessor):
+    name = "Fake"
+
+    @classmethod
+    @override
+    def matches_signature(cls, header: bytes) -> bool:
+        return header.startswith(b"FAKE")
+
+    @override
+    def can_process(self) -> bool:
+        return True
+
+    @override
+    def try_process(self, diocese_id: str) -> None | MatriculaData:
+        return MatriculaData([], [], [])
+
+
+class FakeEntryPoint:
+    def __init__(self, name: str, value):
+        self.name = name
+        self.value = value
+
+    def load(self):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+@pytest.fixture
+def plugins(monkeypatch):
+    entry_points = [
+        FakeEntryPoint("broken", ImportError("missing dependency")),
+        FakeEntryPoint("not-a-processor", str),
+        FakeEntryPoint("fake", FakeProcessor),
+    ]
+
+    def fake_entry_points(group: str):
+        assert group == registry.entry_point_group
+        return entry_points
+
+    monkeypatch.setattr(registry, "entry_points", fake_entry_points)
+
+
+def jet_header(version: int) -> bytes:
+    header = bytearray(b"\x00\x01\x00\x00Standard Jet DB\x00".ljust(version_offset + 1))
+    header[version_offset] = version
+    return bytes(header)
+
+
+def test_get_processors(plugins):
+    assert registry.get_processors() == [*registry.builtin_processors, FakeProcessor]
+
+
+def test_find_processor_sniffs_the_signature(plugins, tmp_path):
+    input_file = tmp_path / "input.fake"
+    input_file.write_bytes(b"FAKE" + bytes(64))
+    processor = registry.find_processor(str(input_file), lambda _: None)
+    assert isinstance(processor, FakeProcessor)
+    input_file.write_bytes(b"UNKNOWN")
+    assert registry.find_processor(str(input_file), lambda _: None) is None
+
+
+def test_jet_versions():
+    # Jet 3, Jet 4 and ACE 12
+    assert not Augias92Processor.matches_signature(jet_header(0))
+    assert Augias92Processor.matches_signature(jet_header(1))
+    assert not Augias92Processor.matches_signature(jet_header(2))
+    assert not AugiasXProcessor.matches_signature(jet_header(0))
+    assert AugiasXProcessor.matches_signature(jet_header(1))
+    assert AugiasXProcessor.matches_signature(jet_header(2))
+    assert not AugiasXProcessor.matches_signature(b"SQLite format 3\x00")
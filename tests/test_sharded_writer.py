@@ -0,0 +1,78 @@
+import csv
+import json
+import os
+
+from conftest import make_image
+
+from modules.models.image import Image
+from modules.models.matricula_data import MatriculaData
+from modules.writers.sharded_writer import ShardedCSVWriter, manifest_file_name
+
+
+def register_images(register: int, count: int) -> list[Image]:
+    return [
+        make_image(
+            register * 1000 + index,
+            register=f"register-{register}",
+            file_path=f"/scans/{register}/{index}.jpg",
+        )
+        for index in range(count)
+    ]
+
+
+def write(output_dir, images: list[Image], **limits) -> dict:
+    writer = ShardedCSVWriter(str(output_dir), **limits)
+    writer.open()
+    writer.write_partition(MatriculaData([], [], images))
+    writer.close()
+    with open(os.path.join(output_dir, manifest_file_name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_shard(output_dir, file_name: str) -> list[list[str]]:
+    with open(os.path.join(output_dir, file_name), newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))[1:]
+
+
+def test_shards_stay_within_row_limit(tmp_path):
+    images = [
+        image
+        for register, count in enumerate([40, 70, 20, 90, 10, 60, 50])
+        for image in register_images(register, count)
+    ]
+    manifest = write(tmp_path, images, shard_rows=100)
+    assert [shard["rows"] for shard in manifest["shards"]] == [40, 90, 100, 60, 50]
+    rows = [
+        row
+        for shard in manifest["shards"]
+        for row in read_shard(tmp_path, shard["file"])
+    ]
+    assert [row[4] for row in rows] == [image.file_path for image in images]
+
+
+def test_register_larger_than_limit_gets_own_shard(tmp_path):
+    images = register_images(0, 5) + register_images(1, 30) + register_images(2, 5)
+    manifest = write(tmp_path, images, shard_rows=10)
+    assert [shard["rows"] for shard in manifest["shards"]] == [5, 30, 5]
+
+
+def test_shards_stay_within_byte_limit(tmp_path):
+    images = [image for register in range(20) for image in register_images(register, 7)]
+    manifest = write(tmp_path, images, shard_bytes=2000)
+    assert len(manifest["shards"]) > 1
+    for shard in manifest["shards"]:
+        assert shard["bytes"] <= 2000
+        assert shard["bytes"] == os.path.getsize(tmp_path / shard["file"])
+
+
+def test_large_shards_are_written_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ShardedCSVWriter, "buffer_size", 500)
+    images = [image for register in range(50) for image in register_images(register, 9)]
+    manifest = write(tmp_path, images, shard_rows=200, writer_threads=3)
+    assert sum(shard["rows"] for shard in manifest["shards"]) == len(images)
+    rows = [
+        row
+        for shard in manifest["shards"]
+        for row in read_shard(tmp_path, shard["file"])
+    ]
+    assert [row[4] for row in rows] == [image.file_path for image in images]
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+
+from conftest import make_image, make_parish, make_register
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import parish_reference
+from modules.writers.sqlite_writer import SQLiteWriter, database_file_name
+
+
+def data() -> MatriculaData:
+    parish = make_parish(1)
+    reference = parish_reference(parish.diocese, parish.identifier)
+    register = make_register(1, parish=reference)
+    images = [make_image(index, parish=reference) for index in range(10)]
+    return MatriculaData([parish], [register], images)
+
+
+def test_close_indexes_the_database(tmp_path):
+    writer = SQLiteWriter(str(tmp_path))
+    writer.write(data())
+    with sqlite3.connect(tmp_path / database_file_name) as connection:
+        [(count,)] = connection.execute('SELECT COUNT(*) FROM "images"').fetchall()
+        index_names = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ).fetchall()
+    assert count == 10
+    assert ("images_register",) in index_names
+
+
+def test_abort_removes_the_database(tmp_path):
+    writer = SQLiteWriter(str(tmp_path))
+    writer.transaction_rows = 4
+    writer.open()
+    writer.write_partition(data())
+    writer.abort()
+    assert not os.path.exists(tmp_path / database_file_name)
+    # A second abort, as after a failed close, does nothing
+    writer.abort()
@@ -0,0 +1,28 @@
+from conftest import make_image
+
+from modules.models.matricula_data import MatriculaData
+from modules.validation import Validator
+
+
+def test_duplicate_file_paths_across_partitions():
+    validator = Validator()
+    validator.add(
+        MatriculaData(
+            [],
+            [],
+            [make_image(1, file_path="/a/1.jpg"), make_image(2, file_path="/a/2.jpg")],
+        )
+    )
+    validator.add(
+        MatriculaData(
+            [],
+            [],
+            [make_image(3, file_path="/a/1.jpg"), make_image(4, file_path="/a/3.jpg")],
+        )
+    )
+    report = validator.finish()
+    assert report["counts"]["duplicate file path"] == 1
+    [issue] = report["checks"]["duplicate file path"]
+    assert issue["row"]["augias_id"] == 3
+    # The images reference a register that was never converted
+    assert report["counts"]["orphaned image"] == 8
@@ -0,0 +1,84 @@
+import os
+
+from conftest import make_image, make_register
+
+from modules.models.matricula_data import MatriculaData
+from modules.models.reference_keys import register_reference
+from modules.verification import ImageVerifier
+
+
+def partition(
+    image_dir: str, names: list[str], archival_identifier: str = "A/1"
+) -> MatriculaData:
+    register = make_register(
+        1, archival_identifier=archival_identifier, image_dir_path=image_dir
+    )
+    reference = register_reference("parish", archival_identifier)
+    images = [
+        make_image(index, register=reference, file_path=os.path.join(image_dir, name))
+        for index, name in enumerate(names)
+    ]
+    return MatriculaData([], [register], images)
+
+
+def verify(cache_path, *partitions) -> dict:
+    verifier = ImageVerifier(str(cache_path))
+    verifier.start()
+    for data in partitions:
+        verifier.add(data)
+    return verifier.finish()
+
+
+def test_missing_and_extra_files(tmp_path):
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    for name in ["0001.jpg", "0002.jpg", "stray.jpg", "Thumbs.db"]:
+        (scans / name).touch()
+    report = verify(
+        tmp_path / "cache.json",
+        partition(str(scans), ["0001.jpg", "0002.jpg", "0003.jpg"]),
+    )
+    assert report["missing_files"] == 1
+    assert report["extra_files"] == 1
+    [register] = report["registers"]
+    assert register["missing_files"] == [os.path.join(str(scans), "0003.jpg")]
+    assert register["extra_files"] == [os.path.join(str(scans), "stray.jpg")]
+
+
+def test_missing_directory(tmp_path):
+    report = verify(
+        tmp_path / "cache.json",
+        partition(str(tmp_path / "nowhere"), ["0001.jpg"]),
+    )
+    assert report["missing_directories"] == 1
+    assert report["registers"][0]["missing_files"] == [
+        os.path.join(str(tmp_path / "nowhere"), "0001.jpg")
+    ]
+
+
+def test_cached_checks_follow_the_referenced_files(tmp_path):
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    (scans / "0001.jpg").touch()
+    cache = tmp_path / "cache.json"
+    assert verify(cache, partition(str(scans), ["0001.jpg"]))["registers"] == []
+    # Same directory, but a different image is referenced
+    report = verify(cache, partition(str(scans), ["0002.jpg"]))
+    assert report["missing_files"] == 1
+    assert report["extra_files"] == 1
+
+
+def test_many_partitions(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageVerifier, "pending_partitions", 1)
+    partitions = []
+    for index in range(10):
+        scans = tmp_path / f"scans_{index}"
+        scans.mkdir()
+        (scans / "0001.jpg").touch()
+        partitions.append(partition(str(scans), ["0001.jpg", "0002.jpg"], f"A/{index}"))
+    report = verify(tmp_path / "cache.json", *partitions)
+    assert report["directories"] == 10
+    assert report["missing_files"] == 10
+    assert [register["archival_identifier"] for register in report["registers"]] == [
+        f"A/{index}" for index in range(10)
+    ]